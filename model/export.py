@@ -0,0 +1,170 @@
+"""
+Builds an optimized CPU inference artifact from the StanfordCarsModel weights.
+
+Usage:
+    python -m model.export --output model/stanfordcars.ts --holdout DIR [--weights PATH]
+                           [--quantize none|dynamic|static] [--calibration DIR] [--min-agreement 0.99]
+
+The model is fused (batch normalization folded into the preceding convolutions), optionally
+quantized to int8, traced and frozen with TorchScript. Its predictions are then compared with
+those of the float model on the held-out images, and the artifact is only written if they agree
+often enough. Serve it by setting STANFORDCARS_MODEL to its path, see model.supportModel.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import torch
+import torch.nn as nn
+from torch.fx.experimental.optimization import fuse
+from model.supportModel import StanfordCarsModel, preprocess, WEIGHTS_PATH, NUM_CLASSES, ARTIFACT_METADATA
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp')
+QUANTIZATIONS = ('none', 'dynamic', 'static')
+
+def load_float_model(weights_path=WEIGHTS_PATH, num_classes=NUM_CLASSES):
+    model = StanfordCarsModel(num_classes, pretrained=False)
+    model.load_state_dict(torch.load(weights_path, map_location=torch.device('cpu')))
+    return model.eval()
+
+def load_images(directory, batch_size=32):
+    """
+    Preprocess the images of a directory in batches.
+
+    Yields:
+        Tensor: The next batch of images.
+    """
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(IMAGE_SUFFIXES))
+    if not paths:
+        raise ValueError(f'No images in {directory}')
+    for start in range(0, len(paths), batch_size):
+        yield torch.stack([preprocess(path) for path in paths[start:start + batch_size]])
+
+def quantization_engine():
+    # fbgemm has the int8 kernels for x86, qnnpack those for ARM
+    return 'qnnpack' if platform.machine().lower() in ('arm64', 'aarch64') else 'fbgemm'
+
+def optimize(model, quantize='none', calibration=None):
+    """
+    Fuse, optionally quantize, trace and freeze a float model.
+
+    Dynamic quantization only applies to the final linear layer of the ResNet, as convolutions
+    cannot be quantized dynamically. Static quantization covers the convolutions as well, with
+    activation ranges calibrated on sample images.
+
+    Args:
+        model (nn.Module): The float model in evaluation mode.
+        quantize (str): 'none', 'dynamic' or 'static'.
+        calibration (str): The directory of the calibration images, required for 'static'.
+
+    Returns:
+        torch.jit.ScriptModule: The frozen TorchScript module.
+    """
+    example = torch.zeros(1, 3, 224, 224)
+    with torch.no_grad():
+        if quantize == 'static':
+            from torch.ao.quantization import get_default_qconfig_mapping
+            from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+            if calibration is None:
+                raise ValueError('Static quantization needs calibration images')
+            engine = quantization_engine()
+            torch.backends.quantized.engine = engine
+            prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (example,)) # Fuses conv, bn and relu
+            for images in load_images(calibration):
+                prepared(images)
+            model = convert_fx(prepared)
+        else:
+            model = fuse(model) # Folds batch normalization into the convolutions
+            if quantize == 'dynamic':
+                torch.backends.quantized.engine = quantization_engine()
+                model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        traced = torch.jit.trace(model, example)
+    return torch.jit.freeze(traced.eval())
+
+def check_parity(reference, candidate, holdout):
+    """
+    Compare the predictions of an optimized model with those of the float model.
+
+    Args:
+        reference (nn.Module): The float model.
+        candidate (nn.Module): The optimized model.
+        holdout (str): The directory of the held-out images.
+
+    Returns:
+        dict: The number of images, the share of images with the same top class, the share whose
+            float top class is among the candidate's top 5, the largest absolute difference of
+            the logits and the mean seconds per image of both models.
+    """
+    images = agreed = top5 = 0
+    difference = 0.0
+    seconds = {'reference': 0.0, 'candidate': 0.0}
+    with torch.inference_mode():
+        for batch in load_images(holdout):
+            start = time.perf_counter()
+            expected = reference(batch)
+            seconds['reference'] += time.perf_counter() - start
+            start = time.perf_counter()
+            actual = candidate(batch)
+            seconds['candidate'] += time.perf_counter() - start
+            images += len(batch)
+            agreed += (expected.argmax(dim=1) == actual.argmax(dim=1)).sum().item()
+            top5 += (actual.topk(5, dim=1).indices == expected.argmax(dim=1, keepdim=True)).any(dim=1).sum().item()
+            difference = max(difference, (expected - actual).abs().max().item())
+    return {'images': images, 'agreement': agreed / images, 'top5_agreement': top5 / images,
+            'max_logit_difference': difference,
+            'reference_seconds_per_image': seconds['reference'] / images,
+            'candidate_seconds_per_image': seconds['candidate'] / images}
+
+def export(output, holdout, weights_path=WEIGHTS_PATH, quantize='none', calibration=None, min_agreement=0.99):
+    """
+    Build, check and save an optimized inference artifact.
+
+    Args:
+        output (str): The path of the artifact.
+        holdout (str): The directory of the held-out images for the parity check.
+        weights_path (str): The weights of the float model.
+        quantize (str): 'none', 'dynamic' or 'static'.
+        calibration (str): The directory of the calibration images, required for 'static'.
+        min_agreement (float): The minimum share of held-out images for which the artifact
+            predicts the same class as the float model.
+
+    Raises:
+        ValueError: If the artifact fails the parity check; it is not written then.
+
+    Returns:
+        dict: The metadata saved with the artifact, including the parity results.
+    """
+    reference = load_float_model(weights_path)
+    # Quantization and fusion rewrite the model they are given, so they work on a copy
+    optimized = optimize(load_float_model(weights_path), quantize, calibration)
+    parity = check_parity(reference, optimized, holdout)
+    print(json.dumps(parity, indent=2))
+    if parity['agreement'] < min_agreement:
+        raise ValueError(f"Artifact agrees with the float model on {parity['agreement']:.2%} of the images, less than {min_agreement:.2%}")
+    metadata = {'num_classes': NUM_CLASSES, 'quantize': quantize, 'parity': parity,
+                'engine': torch.backends.quantized.engine if quantize != 'none' else None,
+                'torch': torch.__version__, 'weights': os.path.basename(weights_path)}
+    torch.jit.save(optimized, output, _extra_files={ARTIFACT_METADATA: json.dumps(metadata)})
+    print(f'Saved {quantize} artifact to {output} ({os.path.getsize(output) / 2**20:.1f} MiB)')
+    return metadata
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m model.export', description='Build an optimized CPU inference artifact of the car classifier.')
+    parser.add_argument('--output', required=True, help='path of the TorchScript artifact')
+    parser.add_argument('--holdout', required=True, help='directory of held-out images for the parity check')
+    parser.add_argument('--weights', default=WEIGHTS_PATH, help='weights of the float model')
+    parser.add_argument('--quantize', choices=QUANTIZATIONS, default='none')
+    parser.add_argument('--calibration', help='directory of calibration images for static quantization')
+    parser.add_argument('--min-agreement', type=float, default=0.99, help='minimum share of matching predictions')
+    args = parser.parse_args(argv)
+    try:
+        export(args.output, args.holdout, args.weights, args.quantize, args.calibration, args.min_agreement)
+    except ValueError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
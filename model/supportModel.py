@@ -1,9 +1,13 @@
+import json
+import os
+import threading
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torchvision.transforms as transforms
 from torchvision import models
 from PIL import Image
+from patterns.batcher import MicroBatcher
 
 class ImageClassificationBase(nn.Module):
     def training_step(self, batch):
@@ -45,18 +49,178 @@ def accuracy(outputs, labels):
     _, preds = torch.max(outputs, dim=1)
     return torch.tensor(torch.sum(preds == labels).item() / len(preds))
 
+# The trained weights, override with the environment variable STANFORDCARS_WEIGHTS
+WEIGHTS_PATH = os.environ.get('STANFORDCARS_WEIGHTS', 'C:/Users/diabomba/Desktop/ETH_SEF_Daunting_Doves/team05/model/stanfordcars-cnn.pth')
+NUM_CLASSES = 196
+# An optimized TorchScript artifact built by model.export, served instead of the weights if set
+MODEL_PATH = os.environ.get('STANFORDCARS_MODEL')
+ARTIFACT_METADATA = 'metadata.json'
+
+# Concurrent classifications are batched: at most IDENTIFY_BATCH_SIZE images per forward pass,
+# the first waiting at most IDENTIFY_MAX_WAIT seconds for others, and IDENTIFY_QUEUE_DEPTH queued
+BATCH_SIZE = int(os.environ.get('IDENTIFY_BATCH_SIZE', 16))
+MAX_WAIT = float(os.environ.get('IDENTIFY_MAX_WAIT', 0.01))
+QUEUE_DEPTH = int(os.environ.get('IDENTIFY_QUEUE_DEPTH', 64))
+
+transformation = transforms.Compose([
+    transforms.Resize(256),
+    transforms.CenterCrop(224),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+def preprocess(image_path):
+    """
+    Load an image and convert it to the input of the classifier.
+
+    Args:
+        image_path (str): The path of the image file.
+
+    Returns:
+        Tensor: The normalized 3x224x224 image.
+    """
+    with Image.open(image_path) as image:
+        return transformation(image.convert('RGB'))
+
+class ModelManager:
+    """
+    Keeps the classifier loaded and ready for inference, once per process.
+
+    The weights are loaded on first use (or by `warm_up`) and kept in evaluation mode.
+    Before each inference the modification time of the weights file is checked, so
+    replaced weights are picked up without a restart. Instead of weights, a TorchScript
+    artifact built by model.export can be loaded, which needs no model construction.
+
+    Attributes:
+        path (str): The path of the weights file or artifact.
+        num_classes (int): The number of classes the model predicts.
+        scripted (bool): Whether the file is a TorchScript artifact rather than weights.
+        model (nn.Module | None): The loaded model.
+        metadata (dict): The metadata stored with an artifact, e.g. its quantization.
+        mtime (int | None): The modification time of the file when it was loaded.
+    """
+
+    def __init__(self, path=WEIGHTS_PATH, num_classes=NUM_CLASSES, scripted=False):
+        self.path = path
+        self.num_classes = num_classes
+        self.scripted = scripted
+        self.metadata = {}
+        self.model = None
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns:
+            nn.Module: The model, (re)loaded if the weights file is new or has changed.
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        if self.model is None or mtime != self.mtime:
+            with self.lock:
+                if self.model is None or mtime != self.mtime:
+                    self.load(mtime)
+        return self.model
+
+    def load(self, mtime):
+        if self.scripted:
+            extra_files = {ARTIFACT_METADATA: ''}
+            model = torch.jit.load(self.path, map_location=torch.device('cpu'), _extra_files=extra_files)
+            self.metadata = json.loads(extra_files[ARTIFACT_METADATA] or '{}')
+            if self.metadata.get('engine'):
+                torch.backends.quantized.engine = self.metadata['engine'] # Quantized kernels of the platform built for
+        else:
+            # The pretrained backbone is replaced by the stored weights anyway, so it is not downloaded
+            model = StanfordCarsModel(self.num_classes, pretrained=False)
+            model.load_state_dict(torch.load(self.path, map_location=torch.device('cpu')))
+        model.eval()
+        self.model, self.mtime = model, mtime
+        print(f'Loaded classifier from {self.path}')
+
+    def warm_up(self):
+        """
+        Load the model and run it once, so that the first request does not pay for it.
+        """
+        self.predict_batch(torch.zeros(1, 3, 224, 224))
+
+    def predict_batch(self, images):
+        """
+        Classify a batch of preprocessed images, without tracking gradients.
+
+        Args:
+            images (Tensor): The images, stacked along the first dimension.
+
+        Returns:
+            list[int]: The predicted class of each image.
+        """
+        model = self.get()
+        with torch.inference_mode():
+            return model(images).argmax(dim=1).tolist()
+
+    def predict(self, image):
+        """
+        Classify a preprocessed image.
+
+        Returns:
+            int: The predicted class.
+        """
+        return self.predict_batch(image.unsqueeze(0))[0]
+
+manager_lock = threading.Lock()
+manager = None
+batcher = None
+
+def get_manager():
+    """
+    Returns:
+        ModelManager: The model manager of this process, created on first use.
+    """
+    global manager
+    if manager is None:
+        with manager_lock:
+            if manager is None:
+                manager = ModelManager(MODEL_PATH, scripted=True) if MODEL_PATH else ModelManager()
+    return manager
+
+def get_batcher():
+    """
+    Returns:
+        MicroBatcher: Classifies the preprocessed images submitted concurrently in batches,
+            with the model of this process, created on first use.
+    """
+    global batcher
+    if batcher is None:
+        with manager_lock:
+            if batcher is None:
+                batcher = MicroBatcher(lambda images: get_manager().predict_batch(torch.stack(images)),
+                                       BATCH_SIZE, MAX_WAIT, QUEUE_DEPTH, name='classifier-batcher')
+    return batcher
+
 def ValuePredictor(to_predict_image_path):
-    model = StanfordCarsModel(196)
-    model.load_state_dict(torch.load('C:/Users/diabomba/Desktop/ETH_SEF_Daunting_Doves/team05/model/stanfordcars-cnn.pth', map_location=torch.device('cpu')))
-    transformation = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    image_to_predict = Image.open(to_predict_image_path)
-    image = transformation(image_to_predict).unsqueeze(0)
-    model.eval()   
-    result = model(image)
-    _, preds  = torch.max(result, dim=1)
-    return preds.item()
\ No newline at end of file
+    return get_batcher()(preprocess(to_predict_image_path))
+
+def init_worker(threads=1):
+    """
+    Prepare a worker process classifying images, see `classify_batch`: limit the threads PyTorch
+    uses, so that the workers do not compete for the cores, and load the model.
+
+    Args:
+        threads (int): The number of threads PyTorch may use within the worker.
+    """
+    torch.set_num_threads(threads)
+    try:
+        get_manager().warm_up()
+    except Exception as e:
+        print(f'Classifier not loaded: {e}')
+
+def classify_batch(image_paths):
+    """
+    Classify a batch of images in one forward pass with the model of this process, e.g. in a
+    worker process, to which the web process hands the batches collected by a MicroBatcher.
+
+    Args:
+        image_paths (list[str]): The paths of the images.
+
+    Returns:
+        list[int]: The predicted class of each image.
+    """
+    return get_manager().predict_batch(torch.stack([preprocess(path) for path in image_paths]))
@@ -0,0 +1,214 @@
+from __future__ import annotations
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from queue import Full
+
+class MicroBatcher:
+  """
+  Groups items submitted concurrently into batches, processed by a single call on a worker thread.
+
+  The worker waits for the first queued item, then keeps collecting items until the batch
+  holds `max_batch` items or the first one has waited `max_wait` seconds, whichever comes
+  first. It passes the whole batch to the processing function, which returns one result
+  per item, and hands each result to the submitter of its item through a future. Under
+  load, batches fill up before the deadline; a lone item waits at most `max_wait`.
+
+  The processing function may also return a future of the results, e.g. of a call submitted
+  to a process pool. The worker then collects the next batch right away, so that several
+  batches are processed concurrently, and the items are resolved when the future is.
+
+  Attributes:
+      process (Callable[[list], list | Future]): Processes a batch of items, returning their results in order.
+      max_batch (int): The maximum number of items per batch.
+      max_wait (float): The maximum number of seconds the first item of a batch waits for more.
+      max_queue (int): The maximum number of queued items, beyond which submissions are rejected.
+  """
+
+  def __init__(self, process, max_batch: int = 16, max_wait: float = 0.01, max_queue: int = 256, name: str = 'micro-batcher'):
+    """
+    Creates a new MicroBatcher and starts its worker thread.
+
+    Args:
+        process (Callable[[list], list | Future]): Processes a batch of items, returning their results
+            in order or a future of them.
+        max_batch (int): The maximum number of items per batch.
+        max_wait (float): The maximum number of seconds the first item of a batch waits for more.
+        max_queue (int): The maximum number of queued items.
+        name (str): The name of the worker thread.
+
+    Raises:
+        ValueError: If the batch or queue size is not positive.
+    """
+    if max_batch < 1 or max_queue < 1:
+      raise ValueError('Batch and queue size must be positive')
+    self.process = process
+    self.max_batch = max_batch
+    self.max_wait = max_wait
+    self.max_queue = max_queue
+    self.queue: deque[tuple] = deque() # Item, future and time of submission
+    self.closed = False
+    self.submitted = 0
+    self.rejected = 0
+    self.cancelled = 0
+    self.batches = 0
+    self.processed = 0
+    self.waited = 0.0
+    self.busy = 0.0
+    self.peak = 0
+    self.condition = threading.Condition()
+    self.worker = threading.Thread(target=self.run, name=name, daemon=True)
+    self.worker.start()
+
+  def submit(self, item) -> Future:
+    """
+    Queue an item to be processed in the next batch.
+
+    Args:
+        item (object): The item.
+
+    Raises:
+        queue.Full: If `max_queue` items are queued already.
+        ValueError: If the batcher has been closed.
+
+    Returns:
+        Future: Resolves to the result of the item, or the exception raised processing its batch.
+    """
+    future = Future()
+    with self.condition:
+      if self.closed:
+        raise ValueError('Batcher has been closed')
+      if len(self.queue) >= self.max_queue:
+        self.rejected += 1
+        raise Full(f'{len(self.queue)} items are queued already')
+      self.queue.append((item, future, time.monotonic()))
+      self.submitted += 1
+      self.peak = max(self.peak, len(self.queue))
+      self.condition.notify_all()
+    return future
+
+  def __call__(self, item, timeout: float = None):
+    """
+    Process an item in a batch and wait for its result.
+
+    Args:
+        item (object): The item.
+        timeout (float): The maximum number of seconds to wait, or None to wait indefinitely.
+
+    Returns:
+        object: The result of the item.
+    """
+    return self.submit(item).result(timeout)
+
+  def run(self) -> None:
+    """
+    Process batches until the batcher is closed and the queue is drained.
+    """
+    while True:
+      with self.condition:
+        self.condition.wait_for(lambda: self.queue or self.closed)
+        if not self.queue:
+          return
+        deadline = self.queue[0][2] + self.max_wait
+        self.condition.wait_for(lambda: len(self.queue) >= self.max_batch or self.closed, deadline - time.monotonic())
+        batch = [self.queue.popleft() for _ in range(min(self.max_batch, len(self.queue)))]
+      # Futures cancelled by their submitters are dropped, the others can no longer be cancelled
+      queued = len(batch)
+      batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+      if len(batch) < queued:
+        with self.condition:
+          self.cancelled += queued - len(batch)
+      if not batch:
+        continue
+      started = time.monotonic()
+      try:
+        results = self.process([item for item, _, _ in batch])
+      except Exception as e:
+        self.complete(batch, started, error=e)
+        continue
+      if isinstance(results, Future):
+        results.add_done_callback(lambda future, batch=batch, started=started: self.complete(batch, started, future=future))
+      else:
+        self.complete(batch, started, results)
+
+  def complete(self, batch: list, started: float, results: list = None, error: Exception = None, future: Future = None) -> None:
+    """
+    Hand the results of a processed batch, or the error processing it, to the submitters of
+    its items.
+
+    Args:
+        batch (list[tuple]): The items of the batch, their futures and times of submission.
+        started (float): The time processing the batch started.
+        results (list): The results of the items, in order.
+        error (Exception): The exception raised processing the batch, if any.
+        future (Future): The future of the results, if processing returned one.
+    """
+    if future != None:
+      if future.cancelled():
+        error = CancelledError()
+      else:
+        error = future.exception()
+        results = future.result() if error == None else None
+    if error == None and len(results) != len(batch):
+      error = ValueError(f'{len(results)} results for a batch of {len(batch)} items')
+    with self.condition:
+      self.batches += 1
+      self.processed += len(batch)
+      self.waited += sum(started - submitted for _, _, submitted in batch)
+      self.busy += time.monotonic() - started
+    if error != None:
+      traceback.print_exception(type(error), error, error.__traceback__)
+      for _, item_future, _ in batch:
+        self.resolve(item_future, error=error)
+    else:
+      for (_, item_future, _), result in zip(batch, results):
+        self.resolve(item_future, result)
+
+  @staticmethod
+  def resolve(future: Future, result=None, error: Exception = None) -> None:
+    """
+    Hand the result of an item, or the error processing it, to its submitter. A failure to do
+    so affects this item only, not the worker.
+    """
+    try:
+      if error != None:
+        future.set_exception(error)
+      else:
+        future.set_result(result)
+    except Exception:
+      traceback.print_exc()
+
+  def metrics(self) -> dict:
+    """
+    Returns:
+        dict[str, int | float]: The current queue depth and its peak, the numbers of submitted,
+            rejected, cancelled and processed items and of batches, the mean batch size, the mean seconds
+            an item waited in the queue and the mean seconds spent processing a batch.
+    """
+    with self.condition:
+      return {
+        'queue_depth': len(self.queue),
+        'peak_queue_depth': self.peak,
+        'submitted': self.submitted,
+        'rejected': self.rejected,
+        'cancelled': self.cancelled,
+        'processed': self.processed,
+        'batches': self.batches,
+        'mean_batch_size': self.processed / self.batches if self.batches else 0.0,
+        'mean_wait': self.waited / self.processed if self.processed else 0.0,
+        'mean_batch_seconds': self.busy / self.batches if self.batches else 0.0,
+      }
+
+  def close(self, timeout: float = None) -> None:
+    """
+    Process the queued items and stop the worker thread. Later submissions are rejected.
+
+    Args:
+        timeout (float): The maximum number of seconds to wait for the worker, or None to wait indefinitely.
+    """
+    with self.condition:
+      self.closed = True
+      self.condition.notify_all()
+    self.worker.join(timeout)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+import threading
+import traceback
+from collections import deque
+from patterns.observer import Subject, Change
+
+class AsyncDispatcher:
+  """
+  Delivers the updates of subjects to their observers on a background worker thread.
+
+  Updates are queued in a bounded queue. When the queue is full, the policy decides
+  what happens to a new update:
+
+  * 'block': wait until the worker has made room.
+  * 'drop': discard the update (counted in `dropped`).
+  * 'coalesce': merge the changes into the update of the same subject which is still
+    queued; block if there is none.
+
+  Attributes:
+      maxsize (int): The maximum number of queued updates.
+      policy (str): The backpressure policy, one of `POLICIES`.
+      dropped (int): The number of updates discarded by the 'drop' policy.
+      coalesced (int): The number of updates merged by the 'coalesce' policy.
+  """
+
+  POLICIES = ('block', 'drop', 'coalesce')
+
+  def __init__(self, maxsize: int = 1000, policy: str = 'block'):
+    """
+    Creates a new AsyncDispatcher and starts its worker thread.
+
+    Args:
+        maxsize (int): The maximum number of queued updates.
+        policy (str): The backpressure policy, one of 'block', 'drop' or 'coalesce'.
+
+    Raises:
+        ValueError: If the policy is unknown or the maxsize is not positive.
+    """
+    if policy not in self.POLICIES:
+      raise ValueError(f'Unknown backpressure policy {policy}')
+    if maxsize < 1:
+      raise ValueError(f'Queue size must be positive')
+    self.maxsize = maxsize
+    self.policy = policy
+    self.dropped = 0
+    self.coalesced = 0
+    self.queue: deque[list] = deque()
+    self.latest: dict[int, list] = {} # Last queued update of each subject, by id(subject)
+    self.active = 0
+    self.closed = False
+    self.condition = threading.Condition()
+    self.worker = threading.Thread(target=self.run, name='observer-dispatcher', daemon=True)
+    self.worker.start()
+
+  def submit(self, subject: Subject, changes: list[Change]) -> None:
+    """
+    Queue an update of a subject for delivery to its observers.
+
+    After `close`, updates are delivered synchronously.
+
+    Args:
+        subject (Subject): The subject that changed.
+        changes (list[Change]): The changes since its last update.
+    """
+    with self.condition:
+      if not self.closed:
+        if len(self.queue) >= self.maxsize:
+          if self.policy == 'drop':
+            self.dropped += 1
+            return
+          entry = self.latest.get(id(subject))
+          if self.policy == 'coalesce' and entry != None:
+            entry[1].extend(changes)
+            self.coalesced += 1
+            return
+          self.condition.wait_for(lambda: len(self.queue) < self.maxsize or self.closed)
+      if not self.closed:
+        entry = [subject, list(changes)]
+        self.queue.append(entry)
+        self.latest[id(subject)] = entry
+        self.condition.notify_all()
+        return
+    subject.deliver(changes)
+
+  def run(self) -> None:
+    """
+    Deliver queued updates until the dispatcher is closed and the queue is drained.
+    """
+    while True:
+      with self.condition:
+        self.condition.wait_for(lambda: self.queue or self.closed)
+        if not self.queue:
+          return
+        entry = self.queue.popleft()
+        subject, changes = entry
+        if self.latest.get(id(subject)) is entry:
+          del self.latest[id(subject)]
+        self.active += 1
+        self.condition.notify_all()
+      try:
+        subject.deliver(changes)
+      except Exception:
+        traceback.print_exc()
+      finally:
+        with self.condition:
+          self.active -= 1
+          self.condition.notify_all()
+
+  def flush(self, timeout: float = None) -> bool:
+    """
+    Wait until all queued updates have been delivered.
+
+    Args:
+        timeout (float): The maximum number of seconds to wait, or None to wait indefinitely.
+
+    Returns:
+        bool: True if all updates have been delivered, False if the timeout expired.
+    """
+    with self.condition:
+      return self.condition.wait_for(lambda: not self.queue and self.active == 0, timeout)
+
+  def close(self, timeout: float = None) -> None:
+    """
+    Deliver the remaining updates and stop the worker thread.
+
+    Args:
+        timeout (float): The maximum number of seconds to wait for the worker, or None to wait indefinitely.
+    """
+    with self.condition:
+      self.closed = True
+      self.condition.notify_all()
+    self.worker.join(timeout)
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor, CancelledError, Executor, Future, TimeoutError
+from queue import Full
+
+class Job:
+  """
+  A call running in the background, identified by an ID to ask for its result later.
+
+  Attributes:
+      id (str): The ID of the job.
+      args (tuple): The positional arguments of the call.
+      future (Future): The future of the call.
+      submitted (float): The time the job was submitted (seconds since the epoch).
+      finished (float | None): The time the call finished, None while it runs.
+  """
+
+  def __init__(self, id: str, args: tuple, future: Future):
+    self.id = id
+    self.args = args
+    self.future = future
+    self.submitted = time.time()
+    self.finished = None
+
+  @property
+  def status(self) -> str:
+    """
+    Returns:
+        str: 'pending' until the call starts, then 'running', and finally 'done' or 'failed'.
+    """
+    if not self.future.done():
+      return 'running' if self.future.running() else 'pending'
+    return 'failed' if self.future.cancelled() or self.future.exception() != None else 'done'
+
+  @property
+  def result(self):
+    """
+    Returns:
+        object: The result of the call if it is done, otherwise None.
+    """
+    return self.future.result() if self.status == 'done' else None
+
+  @property
+  def error(self):
+    """
+    Returns:
+        str | None: The exception raised by the call if it failed, otherwise None.
+    """
+    if self.status != 'failed':
+      return None
+    return 'Cancelled' if self.future.cancelled() else repr(self.future.exception())
+
+  def wait(self, timeout: float = None) -> bool:
+    """
+    Wait until the call has finished.
+
+    Args:
+        timeout (float): The maximum number of seconds to wait, or None to wait indefinitely.
+
+    Returns:
+        bool: True if the call has finished, False if the timeout expired.
+    """
+    try:
+      self.future.exception(timeout)
+    except TimeoutError:
+      return False
+    except CancelledError:
+      pass
+    return True
+
+  def to_dict(self) -> dict:
+    """
+    Returns:
+        dict: The ID, status, result, error and times of the job, e.g. to serialize it as JSON.
+    """
+    return {'id': self.id, 'status': self.status, 'result': self.result, 'error': self.error,
+            'submitted': self.submitted, 'finished': self.finished}
+
+class Jobs:
+  """
+  Runs calls of a function as jobs on an executor, e.g. a pool of worker processes.
+
+  Submitting returns a job right away, whose ID can be used to look it up and ask for its
+  result. The number of unfinished jobs is bounded, as is the number of finished ones kept
+  for their results: beyond `retention`, the jobs which finished first are forgotten.
+
+  An executor can break, e.g. a process pool whose worker crashed; see RestartingExecutor.
+
+  Attributes:
+      function (Callable): The function to call, picklable if the executor runs processes.
+      executor (Executor): Runs the calls.
+      retention (int): The maximum number of finished jobs kept.
+      max_pending (int): The maximum number of unfinished jobs.
+      submitted (int): The number of jobs submitted so far.
+      rejected (int): The number of submissions rejected because too many jobs were unfinished.
+  """
+
+  def __init__(self, function, executor: Executor, retention: int = 100, max_pending: int = 100):
+    """
+    Creates a new Jobs instance.
+
+    Args:
+        function (Callable): The function to call, picklable if the executor runs processes.
+        executor (Executor): Runs the calls, shut down by `close`.
+        retention (int): The maximum number of finished jobs kept.
+        max_pending (int): The maximum number of unfinished jobs.
+    """
+    self.function = function
+    self.executor = executor
+    self.retention = retention
+    self.max_pending = max_pending
+    self.submitted = 0
+    self.rejected = 0
+    self.jobs: OrderedDict[str, Job] = OrderedDict() # In order of submission
+    self.done: OrderedDict[str, Job] = OrderedDict() # Finished jobs, in order of completion
+    self.lock = threading.Lock()
+
+  def submit(self, *args, **kwargs) -> Job:
+    """
+    Start a job calling the function with the given arguments.
+
+    Raises:
+        queue.Full: If `max_pending` jobs are unfinished.
+        concurrent.futures.BrokenExecutor: If the executor is broken.
+
+    Returns:
+        Job: The new job.
+    """
+    with self.lock:
+      if len(self.jobs) - len(self.done) >= self.max_pending:
+        self.rejected += 1
+        raise Full(f'{self.max_pending} jobs are unfinished')
+      job = Job(uuid.uuid4().hex, args, self.executor.submit(self.function, *args, **kwargs))
+      self.jobs[job.id] = job
+      self.submitted += 1
+    job.future.add_done_callback(lambda future: self.finished(job))
+    return job
+
+  def finished(self, job: Job):
+    """
+    Keep a finished job, forgetting the jobs which finished first beyond the retention.
+    """
+    with self.lock:
+      job.finished = time.time()
+      self.done[job.id] = job
+      while len(self.done) > self.retention:
+        id, _ = self.done.popitem(last=False)
+        del self.jobs[id]
+
+  def get(self, id: str):
+    """
+    Returns:
+        Job | None: The job with an ID, None if there is none or it has been forgotten.
+    """
+    with self.lock:
+      return self.jobs.get(id)
+
+  def metrics(self) -> dict:
+    """
+    Returns:
+        dict[str, int]: The numbers of unfinished and of retained finished jobs, and of
+            submitted and rejected jobs.
+    """
+    with self.lock:
+      return {
+        'unfinished': len(self.jobs) - len(self.done),
+        'finished': len(self.done),
+        'submitted': self.submitted,
+        'rejected': self.rejected,
+      }
+
+  def close(self, wait: bool = True):
+    """
+    Shut the executor down.
+
+    Args:
+        wait (bool): Whether to wait for the unfinished jobs.
+    """
+    self.executor.shutdown(wait)
+
+class RestartingExecutor(Executor):
+  """
+  Runs calls on an executor which can break, e.g. a process pool whose worker crashed, and
+  replaces it by a new one on the next submission. The calls it was running fail.
+
+  Attributes:
+      factory (Callable[[], Executor]): Creates the executor.
+      executor (Executor): The current executor.
+      restarts (int): The number of times the executor has been replaced.
+  """
+
+  def __init__(self, factory):
+    """
+    Creates a new RestartingExecutor and its first executor.
+
+    Args:
+        factory (Callable[[], Executor]): Creates the executor.
+    """
+    self.factory = factory
+    self.executor = factory()
+    self.restarts = 0
+    self.lock = threading.Lock()
+
+  def submit(self, fn, /, *args, **kwargs) -> Future:
+    with self.lock:
+      try:
+        return self.executor.submit(fn, *args, **kwargs)
+      except BrokenExecutor:
+        self.executor.shutdown(wait=False)
+        self.executor = self.factory()
+        self.restarts += 1
+        return self.executor.submit(fn, *args, **kwargs)
+
+  def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+    with self.lock:
+      executor = self.executor
+    executor.shutdown(wait, cancel_futures=cancel_futures)
@@ -1,13 +1,49 @@
-from __future__ import annotations 
-from abc import ABC, abstractmethod  
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+@dataclass
+class Change:
+  """
+  Describes a single change of a subject, passed on to its observers.
+
+  Attributes:
+      kind (str): The kind of change, e.g. 'add', 'delete' or 'points'.
+      entity (object): The entity that changed.
+      data (object): Additional, kind-specific details, e.g. the difference in points.
+  """
+  kind: str
+  entity: object = None
+  data: object = None
 
 class Subject:
   """
   The Subject declares a set of methods for managing observers.
+
+  Notifications can be batched: within `batch()` they are deferred and coalesced,
+  and observers receive a single update with all changes once the outermost batch ends.
+  Updates are delivered synchronously, unless a dispatcher (e.g. an AsyncDispatcher)
+  is set, which then decides when and on which thread they are delivered.
+
+  Recorders, unlike observers, receive every change immediately and in order as it is
+  notified, regardless of batches and dispatchers.
   """
 
   def __init__(self):
     self.observers: list[Observer] = []
+    self.recorders: list[Recorder] = []
+    self.changes: list[Change] = []
+    self.batch_depth = 0
+    self.dirty = False
+    self.dispatcher = None
+
+  def __getstate__(self):
+    # Dispatchers hold threads and locks, recorders open files, which cannot be pickled
+    state = self.__dict__.copy()
+    state['dispatcher'] = None
+    state['recorders'] = []
+    return state
 
   def attach(self, observer: Observer) -> None:
     """
@@ -21,26 +57,101 @@ class Subject:
     """
     self.observers.remove(observer)
 
-  def notify(self) -> None:
+  def notify(self, *changes: Change) -> None:
     """
-    Notify all observers about an event. 
+    Notify all observers about an event.
     This method must be called at apropriate places in the Subject
+
+    Args:
+        *changes (Change): The changes which caused the event, if known.
+    """
+    if changes:
+      for recorder in self.recorders:
+        recorder.record(self, changes)
+    self.changes.extend(changes)
+    self.dirty = True
+    if self.batch_depth == 0:
+      self.dispatch()
+
+  def notify_points(self, *changes: Change) -> None:
+    self.notify(*changes)
+
+  def dispatch(self) -> None:
+    """
+    Pass all pending changes to the observers in a single update.
+    """
+    changes, self.changes, self.dirty = self.changes, [], False
+    if self.dispatcher != None:
+      self.dispatcher.submit(self, changes)
+    else:
+      self.deliver(changes)
+
+  def deliver(self, changes: list[Change]) -> None:
+    """
+    Call all observers with the given changes.
+
+    Args:
+        changes (list[Change]): The changes since the last update.
     """
-    for observer in self.observers:  
-        observer.update(self)
+    for observer in self.observers:
+        observer.changed(self, changes)
 
-  def notify_points(self) -> None:
-    for observer in self.observers:  
-        observer.update(self)
+  @contextmanager
+  def batch(self):
+    """
+    Defer notifications until the outermost batch ends.
+
+    Batches can be nested. Pending changes are dispatched when the outermost batch
+    ends, also if it ends with an exception, since the changes made so far remain.
+    """
+    self.batch_depth += 1
+    try:
+      yield self
+    finally:
+      self.batch_depth -= 1
+      if self.batch_depth == 0 and self.dirty:
+        self.dispatch()
 
-class Observer(ABC): 
+class Observer(ABC):
   """
   The Observer interface declares the update method, called by subjects.
   """
 
-  @abstractmethod 
+  @abstractmethod
   def update(self, subject: Subject) -> None:
     """
     Receive update from subject.
     """
-    pass
\ No newline at end of file
+    pass
+
+  def changed(self, subject: Subject, changes: list[Change]) -> None:
+    """
+    Receive a (possibly coalesced) update together with the changes causing it.
+
+    Observers interested in the individual changes override this method. By default
+    it simply calls `update`.
+
+    Args:
+        subject (Subject): The subject that changed.
+        changes (list[Change]): The changes since the last update, in order. Empty if unknown.
+    """
+    self.update(subject)
+
+class Recorder(ABC):
+  """
+  The Recorder interface declares the record method, called by subjects for each notification.
+
+  Recorders see the changes synchronously and in the order they are made, which observers do
+  not: their updates may be deferred by batches, coalesced or dropped by dispatchers.
+  """
+
+  @abstractmethod
+  def record(self, subject: Subject, changes: tuple[Change, ...]) -> None:
+    """
+    Receive the changes of a notification, right when it is made.
+
+    Args:
+        subject (Subject): The subject that changed.
+        changes (tuple[Change, ...]): The changes of the notification, in order.
+    """
+    pass
@@ -0,0 +1,105 @@
+import threading
+from contextlib import contextmanager
+
+class ReadWriteLock:
+  """
+  A lock held either by any number of readers or by a single writer.
+
+  Both sides are reentrant: a reader may read again, even while a writer waits, and a writer
+  may write or read again, e.g. when an operation calls other operations. A waiting writer
+  keeps new readers out, so that a steady stream of reads cannot starve writes. A reader
+  cannot become a writer without releasing its reads first, since two readers doing so at
+  once would wait for each other forever.
+
+  Attributes:
+      readers (int): The number of threads holding the lock for reading.
+      writer (int | None): The ident of the thread holding the lock for writing.
+      waiting (int): The number of threads waiting to write.
+  """
+
+  def __init__(self):
+    self.condition = threading.Condition(threading.Lock())
+    self.readers = 0
+    self.writer = None
+    self.writes = 0
+    self.waiting = 0
+    self.local = threading.local()
+
+  def acquire_read(self) -> None:
+    """
+    Acquire the lock for reading, waiting while another thread writes or waits to write.
+    """
+    reads = getattr(self.local, 'reads', 0)
+    self.local.reads = reads + 1
+    if reads > 0 or self.writer == threading.get_ident():
+      return # Already a reader or the writer, only this thread can change that
+    with self.condition:
+      self.condition.wait_for(lambda: self.writer == None and self.waiting == 0)
+      self.readers += 1
+
+  def release_read(self) -> None:
+    """
+    Release one read acquired by this thread.
+    """
+    self.local.reads -= 1
+    if self.local.reads > 0 or self.writer == threading.get_ident():
+      return
+    with self.condition:
+      self.readers -= 1
+      if self.readers == 0:
+        self.condition.notify_all()
+
+  def acquire_write(self) -> None:
+    """
+    Acquire the lock for writing, waiting until no other thread reads or writes.
+
+    Raises:
+        RuntimeError: If this thread holds the lock for reading only.
+    """
+    me = threading.get_ident()
+    if self.writer == me:
+      self.writes += 1
+      return
+    if getattr(self.local, 'reads', 0) > 0:
+      raise RuntimeError('A read lock cannot be upgraded to a write lock')
+    with self.condition:
+      self.waiting += 1
+      try:
+        self.condition.wait_for(lambda: self.writer == None and self.readers == 0)
+      finally:
+        self.waiting -= 1
+      self.writer = me
+      self.writes = 1
+
+  def release_write(self) -> None:
+    """
+    Release one write acquired by this thread.
+    """
+    self.writes -= 1
+    if self.writes > 0:
+      return
+    with self.condition:
+      self.writer = None
+      self.condition.notify_all()
+
+  @contextmanager
+  def read(self):
+    """
+    Hold the lock for reading during a block.
+    """
+    self.acquire_read()
+    try:
+      yield
+    finally:
+      self.release_read()
+
+  @contextmanager
+  def write(self):
+    """
+    Hold the lock for writing during a block.
+    """
+    self.acquire_write()
+    try:
+      yield
+    finally:
+      self.release_write()
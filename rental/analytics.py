@@ -0,0 +1,240 @@
+from __future__ import annotations
+from datetime import date
+import numpy as np
+from rental.company import Company
+from rental.columns import BookingColumns
+
+class FleetAnalytics:
+  """
+  Computes fleet utilization over booking or rental histories with vectorized NumPy code.
+
+  Periods are held as arrays of date ordinals (both ends inclusive) next to the index of
+  their car in the fleet. Daily occupancy is computed with a sweep line: +1 on the first
+  day of each period, -1 on the day after its last one, followed by a prefix sum.
+
+  Attributes:
+      car_ids (np.ndarray): The IDs of the cars in the fleet, sorted.
+      car_categories (np.ndarray): For each car, the index of its category in `categories`.
+      categories (list[object]): The distinct categories of the fleet.
+      cars (np.ndarray): For each period, the index of its car in `car_ids`.
+      starts (np.ndarray): For each period, the ordinal of its first day.
+      ends (np.ndarray): For each period, the ordinal of its last day.
+  """
+
+  def __init__(self, fleet: list[tuple[int, object]], periods: list[tuple[int, date, date]]):
+    """
+    Creates a new FleetAnalytics instance.
+
+    Args:
+        fleet (list[tuple[int, object]]): The ID and category of each car.
+        periods (list[tuple[int, date, date]]): The car ID, first and last day of each period.
+            Periods of cars which are not in the fleet are ignored.
+    """
+    fleet = sorted(fleet, key=lambda car: car[0])
+    codes = {}
+    self.car_ids = np.fromiter((id for id, _ in fleet), dtype=np.int64, count=len(fleet))
+    self.car_categories = np.fromiter((codes.setdefault(c, len(codes)) for _, c in fleet), dtype=np.int64, count=len(fleet))
+    self.categories = list(codes)
+
+    periods = list(periods)
+    self.set_periods(np.fromiter((p[0] for p in periods), dtype=np.int64, count=len(periods)),
+                     np.fromiter((p[1].toordinal() for p in periods), dtype=np.int64, count=len(periods)),
+                     np.fromiter((p[2].toordinal() for p in periods), dtype=np.int64, count=len(periods)))
+
+  def set_periods(self, car_ids: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+    """
+    Replace the periods by arrays of car IDs and first and last days as ordinals.
+
+    Args:
+        car_ids (np.ndarray): The car ID of each period. Periods of cars which are not in the fleet are ignored.
+        starts (np.ndarray): The ordinal of the first day of each period.
+        ends (np.ndarray): The ordinal of the last day of each period.
+    """
+    cars = np.searchsorted(self.car_ids, car_ids)
+    known = cars < len(self.car_ids)
+    known[known] = self.car_ids[cars[known]] == car_ids[known]
+    self.cars, self.starts, self.ends = cars[known], starts[known], ends[known]
+
+  @classmethod
+  def from_company(cls, company: Company, rentals: bool = False) -> FleetAnalytics:
+    """
+    Export the fleet and the bookings (or rentals) of a company.
+
+    Args:
+        company (Company): The company to analyse.
+        rentals (bool): Analyse the rented instead of the booked periods.
+
+    Returns:
+        FleetAnalytics: The analytics over the exported periods.
+    """
+    fleet = [(c.id, c.category) for c in company.cars.get()]
+    if rentals:
+      periods = [(r.car.id, *company.rentals.period_of(r)) for r in company.rentals.get()]
+    elif isinstance(company.bookings.bookings, BookingColumns):
+      # Read the columns directly instead of materializing every booking
+      columns = company.bookings.bookings
+      live = np.frombuffer(columns.ids, dtype=np.int64) != BookingColumns.DELETED
+      analytics = cls(fleet, [])
+      analytics.set_periods(np.frombuffer(columns.car_ids, dtype=np.int64)[live],
+                            np.frombuffer(columns.starts, dtype=np.int32)[live].astype(np.int64),
+                            np.frombuffer(columns.ends, dtype=np.int32)[live].astype(np.int64))
+      return analytics
+    else:
+      periods = [(b.car.id, b.period_start, b.period_end) for b in company.bookings.get()]
+    return cls(fleet, periods)
+
+  def window(self, first: date, last: date):
+    """
+    Clip the periods to a window of days.
+
+    Args:
+        first (date): The first day of the window.
+        last (date): The last day of the window.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: For each period overlapping the window,
+        the car index and the first and last day as offsets from `first`.
+    """
+    origin = first.toordinal()
+    starts = np.maximum(self.starts, origin) - origin
+    ends = np.minimum(self.ends, last.toordinal()) - origin
+    inside = starts <= ends
+    return self.cars[inside], starts[inside], ends[inside]
+
+  def days(self, first: date, last: date) -> int:
+    """
+    Returns:
+        int: The number of days in the window from `first` to `last`.
+    """
+    return max(last.toordinal() - first.toordinal() + 1, 0)
+
+  def occupancy(self, first: date, last: date) -> np.ndarray:
+    """
+    Count the occupied cars on each day of a window.
+
+    Args:
+        first (date): The first day of the window.
+        last (date): The last day of the window.
+
+    Returns:
+        np.ndarray: The number of occupied cars per day.
+    """
+    _, starts, ends = self.window(first, last)
+    days = self.days(first, last)
+    sweep = np.bincount(starts, minlength=days + 1) - np.bincount(ends + 1, minlength=days + 1)
+    return np.cumsum(sweep[:days])
+
+  def occupancy_by_category(self, first: date, last: date) -> np.ndarray:
+    """
+    Count the occupied cars of each category on each day of a window.
+
+    Args:
+        first (date): The first day of the window.
+        last (date): The last day of the window.
+
+    Returns:
+        np.ndarray: A (categories x days) array, rows ordered like `categories`.
+    """
+    cars, starts, ends = self.window(first, last)
+    days = self.days(first, last)
+    sweep = np.zeros((len(self.categories), days + 1), dtype=np.int64)
+    rows = self.car_categories[cars]
+    np.add.at(sweep, (rows, starts), 1)
+    np.add.at(sweep, (rows, ends + 1), -1)
+    return np.cumsum(sweep[:, :days], axis=1)
+
+  def fleet_by_category(self) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: The number of cars per category, ordered like `categories`.
+    """
+    return np.bincount(self.car_categories, minlength=len(self.categories))
+
+  def utilization(self, first: date, last: date) -> np.ndarray:
+    """
+    Compute the share of the fleet occupied on each day of a window.
+
+    Args:
+        first (date): The first day of the window.
+        last (date): The last day of the window.
+
+    Returns:
+        np.ndarray: The utilization ratio per day, 0 for an empty fleet.
+    """
+    if len(self.car_ids) == 0:
+      return np.zeros(self.days(first, last))
+    return self.occupancy(first, last) / len(self.car_ids)
+
+  def utilization_by_category(self, first: date, last: date) -> np.ndarray:
+    """
+    Compute the share of each category's cars occupied on each day of a window.
+
+    Args:
+        first (date): The first day of the window.
+        last (date): The last day of the window.
+
+    Returns:
+        np.ndarray: A (categories x days) array of utilization ratios, rows ordered like `categories`.
+    """
+    return self.occupancy_by_category(first, last) / self.fleet_by_category()[:, np.newaxis]
+
+  def utilization_by_car(self, first: date, last: date) -> np.ndarray:
+    """
+    Compute the share of days each car is occupied during a window.
+
+    Args:
+        first (date): The first day of the window.
+        last (date): The last day of the window.
+
+    Returns:
+        np.ndarray: The utilization ratio per car, ordered like `car_ids`.
+    """
+    cars, starts, ends = self.window(first, last)
+    occupied = np.bincount(cars, weights=ends - starts + 1, minlength=len(self.car_ids))
+    return occupied / max(self.days(first, last), 1)
+
+  def peak_concurrency(self, first: date, last: date):
+    """
+    Find the highest number of cars occupied at the same time during a window.
+
+    Args:
+        first (date): The first day of the window.
+        last (date): The last day of the window.
+
+    Returns:
+        tuple[int, date | None]: The peak and the first day it is reached (None for an empty window).
+    """
+    occupancy = self.occupancy(first, last)
+    if len(occupancy) == 0:
+      return 0, None
+    day = int(np.argmax(occupancy))
+    return int(occupancy[day]), date.fromordinal(first.toordinal() + day)
+
+  def idle_gaps(self) -> np.ndarray:
+    """
+    Measure the idle days between consecutive periods of each car.
+
+    Returns:
+        np.ndarray: The number of idle days of each gap, in no particular order.
+        Overlapping or adjacent periods leave no gap and are left out.
+    """
+    if len(self.cars) < 2:
+      return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((self.starts, self.cars))
+    cars, starts, ends = self.cars[order], self.starts[order], self.ends[order]
+    same_car = cars[1:] == cars[:-1]
+    # Latest end so far per car (a running maximum restarting for each car), so that
+    # periods contained in earlier ones leave no gap. Each car is shifted above the
+    # previous one to let a single running maximum stay within car boundaries.
+    groups = np.concatenate(([0], np.cumsum(~same_car)))
+    base, span = ends.min(), ends.max() - ends.min() + 1
+    reach = np.maximum.accumulate(ends - base + groups * span) - groups * span + base
+    gaps = starts[1:] - reach[:-1] - 1
+    return gaps[same_car & (gaps > 0)]
+
+  def idle_gap_distribution(self) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: The number of idle gaps by their length in days (index 0 is always 0).
+    """
+    return np.bincount(self.idle_gaps(), minlength=1)
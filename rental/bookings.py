@@ -1,14 +1,17 @@
-from dataclasses import dataclass, field
-from patterns.observer import Subject
+from dataclasses import field
+from rental.entity import Entity, entity
+from patterns.observer import Subject, Change
 from rental import controller
 from rental.exceptions import RentalException
-from rental.company import Company
+from rental.company import Company, reads, writes, transactional
+from rental.registry import Registry
+from rental.intervals import IntervalIndex
 from rental.customers import Customer
 from rental.cars import Car
 from datetime import date
 
-@dataclass
-class Booking:
+@entity
+class Booking(Entity):
   """
   Represents a booking for a rental car.
 
@@ -31,80 +34,170 @@ class Bookings(Subject):
   Manages a collection of bookings.
 
   Attributes:
-      bookings (list[Booking]): List that stores the Booking instances.
+      bookings (Registry | BookingColumns): Stores the Booking instances by ID, or their fields
+          in columns if the collection is columnar.
+      periods (IntervalIndex): The booked periods of each car, keyed by car ID.
+      category_periods (IntervalIndex): The booked periods of the cars of each category, keyed
+          by category with the car ID in place of the booking ID.
       company (Company): The rental company associated with the bookings.
   """
 
-  def __init__(self, company: Company):
+  def __init__(self, company: Company, columnar: bool = False):
     """
     Creates a new Bookings instance for a given company.
-    The list of bookings is initially empty.
+    The collection of bookings is initially empty.
 
     Args:
         company (Company): The rental company associated with the bookings.
+        columnar (bool): Store the bookings in typed columns (see BookingColumns) instead of as
+            objects, which takes far less memory for large histories.
     """
     super().__init__()
-    self.bookings: list[Booking] = []
+    if columnar:
+      # Lazy import to avoid circular imports
+      from rental.columns import BookingColumns
+      self.bookings = BookingColumns(company)
+    else:
+      self.bookings = Registry(customer='customer.id', car='car.id')
+    self.periods = IntervalIndex()
+    self.category_periods = IntervalIndex()
     self.company = company
 
+  @reads
   def get(self):
     """
     Retrieves all current bookings.
 
-    This method provides a safe way to access a copy of the list of all bookings, ensuring the original list is not
-    altered inadvertently.
+    This method provides a safe way to access all bookings: the read-only view cannot alter the internal
+    registry, and it is shared between calls until bookings are added or removed.
 
     Returns:
-        list[Booking]: Copy of the list of all the bookings.
+        View[Booking]: Snapshot view of all the bookings.
     """
-    return self.bookings.copy()
+    return self.bookings.values()
 
+  @transactional
   def add_by_category_id(self, customer_id: int, period_start: date, period_end: date, category_id: int) -> Booking:
+    """
+    Create a booking for any car of a category and add it to the collection.
+
+    The car is chosen among the available cars of the category by `best_fit_car`, with the
+    company locked for reading only. The booking is then added if neither the customer nor
+    the car has changed meanwhile. Both steps run in one database transaction if the company
+    is stored in a database.
+
+    Args:
+        customer_id (int): The ID of the customer making the booking.
+        period_start (date): The start date of the booking.
+        period_end (date): The end date of the booking.
+        category_id (int): The ID of the requested category.
+
+    Raises:
+        RentalException: If no car of the category is available for the period.
+        ConflictException: If the customer or the chosen car changed while the car was chosen.
+
+    Returns:
+        Booking: The newly create Booking instance, added to the list of bookings.
+    """
     if period_start > period_end:
       raise RentalException(f"End Date is before the start date")
-    customer = self.company.customers.find_by_id(customer_id)
-    car = self.company.cars.find_by_category_id(category_id)
-    booking = Booking(controller.nextId(), customer, car[0], period_start, period_end, category_id)
-    if(period_start > period_end):
-      raise RentalException(f"Start Date cannot be in the past to end date")
-    
-    print(f'Adding {booking}')
-    self.bookings.append(booking)
-    self.notify()
+    with self.company.lock.read():
+      customer = self.company.customers.find_by_id(customer_id)
+      car = self.best_fit_car(category_id, period_start, period_end)
+      observed = self.company.versions.read(customer, car)
+
+    with self.company.batch():
+      self.company.versions.check(observed)
+      booking = Booking(controller.nextId(Booking), customer, car, period_start, period_end, category_id)
+      print(f'Adding {booking}')
+      self.insert(booking)
+      self.notify(Change('add', booking))
 
     return booking
 
+  @transactional
   def add(self, customer_id: int, period_start: date, period_end: date, car_id: int) -> Booking:
     """
     Create a booking and add it to the collection.
 
-    Creates a new booking based on the provided details and adds it to the internal list of bookings.
+    Creates a new booking based on the provided details and adds it to the internal registry of bookings.
     It requires the customer's ID and the start and end dates of the rental period. A specific car must
     be specified for the booking.
 
+    The booking is validated with the company locked for reading only, and added if neither the
+    customer nor the car has changed meanwhile, e.g. by a concurrent booking of the same car.
+    Both steps run in one database transaction if the company is stored in a database.
+
     Args:
         customer_id (int): The ID of the customer making the booking.
         period_start (date): The start date of the booking.
         period_end (date): The end date of the booking.
         car_id (int): The ID of the specific car requested.
 
+    Raises:
+        RentalException: If the car is already booked for an overlapping period.
+        ConflictException: If the customer or the car changed while the booking was validated.
+
     Returns:
         Booking: The newly create Booking instance, added to the list of bookings.
     """
     if period_start > period_end:
       raise RentalException(f"End Date is before the start date")
-    customer = self.company.customers.find_by_id(customer_id)
-    car = self.company.cars.find_by_id(car_id)
-    booking = Booking(controller.nextId(), customer, car, period_start, period_end, car.category)
-    if(period_start > period_end):
-      raise RentalException(f"Start Date cannot be in the past to end date")
-    
-    print(f'Adding {booking}')
-    self.bookings.append(booking)
-    self.notify()
+    with self.company.lock.read():
+      customer = self.company.customers.find_by_id(customer_id)
+      car = self.company.cars.find_by_id(car_id)
+      self.check_available(car, period_start, period_end)
+      observed = self.company.versions.read(customer, car)
+
+    with self.company.batch():
+      self.company.versions.check(observed)
+      booking = Booking(controller.nextId(Booking), customer, car, period_start, period_end, car.category)
+      print(f'Adding {booking}')
+      self.insert(booking)
+      self.notify(Change('add', booking))
 
     return booking
 
+  @writes
+  def add_many(self, bookings: list) -> list:
+    """
+    Create a batch of bookings and add them to the collection.
+
+    The whole batch is validated before anything is added, so either all or none of the
+    bookings are created. IDs are reserved at once and observers are notified a single time.
+
+    Args:
+        bookings (list[tuple[int, date, date, int]]): The customer ID, start date, end date and car ID of each booking.
+
+    Raises:
+        RentalException: If a period is invalid, a customer or car does not exist, or a car is
+            already booked for an overlapping period (by an existing booking or within the batch).
+
+    Returns:
+        list[Booking]: The newly created Booking instances.
+    """
+    batch = IntervalIndex()
+    validated = []
+    for i, (customer_id, period_start, period_end, car_id) in enumerate(bookings):
+      if period_start > period_end:
+        raise RentalException(f"End Date is before the start date")
+      customer = self.company.customers.find_by_id(customer_id)
+      car = self.company.cars.find_by_id(car_id)
+      self.check_available(car, period_start, period_end)
+      if batch.overlapping(car.id, period_start, period_end):
+        raise RentalException(f'Car {car.getLabel()} cannot be booked for period {period_start} - {period_end}, because it is booked twice in the batch.')
+      batch.add(car.id, i, period_start, period_end)
+      validated.append((customer, car, period_start, period_end))
+
+    new_bookings = [Booking(id, customer, car, period_start, period_end, car.category)
+                    for id, (customer, car, period_start, period_end) in zip(controller.reserveIds(len(validated), Booking), validated)]
+    print(f'Adding {len(new_bookings)} bookings')
+    for booking in new_bookings:
+      self.insert(booking)
+    self.notify(*[Change('add', b) for b in new_bookings])
+    return new_bookings
+
+  @writes
   def delete(self, id: int):
     """
     Delete a booking based on its ID. 
@@ -119,19 +212,108 @@ class Bookings(Subject):
     """
     booking = self.find_by_id(id)
 
-    for rental in self.company.rentals.get():
-      if rental.booking == booking:
+    with self.company.batch():
+      rental = self.company.rentals.find_by_booking_id(booking.id)
+      if rental != None:
         self.company.rentals.delete(rental.id)
-        
-    print(f'Deleting {booking}')
-    self.bookings.remove(booking)
-    self.notify()
 
+      print(f'Deleting {booking}')
+      self.discard(booking)
+      self.notify(Change('delete', booking))
+
+  def insert(self, booking: Booking):
+    """
+    Store a booking in the registry and record its period as booked.
+
+    Args:
+        booking (Booking): The booking to store.
+    """
+    self.bookings.add(booking)
+    self.periods.add(booking.car.id, booking.id, booking.period_start, booking.period_end)
+    self.category_periods.add(booking.category, booking.car.id, booking.period_start, booking.period_end)
+
+  def discard(self, booking: Booking):
+    """
+    Remove a booking from the registry and release its period, without cascading or notifying observers.
+
+    Args:
+        booking (Booking): The booking to remove.
+    """
+    self.bookings.remove(booking.id)
+    self.periods.remove(booking.car.id, booking.id, booking.period_start, booking.period_end)
+    self.category_periods.remove(booking.category, booking.car.id, booking.period_start, booking.period_end)
+
+  @reads
+  def check_available(self, car: Car, period_start: date, period_end: date):
+    """
+    Check that a car is not booked during a period.
+
+    Args:
+        car (Car): The car to check.
+        period_start (date): The start date of the period.
+        period_end (date): The end date of the period.
+
+    Raises:
+        RentalException: If the car is already booked for an overlapping period.
+    """
+    if self.periods.overlapping(car.id, period_start, period_end):
+      raise RentalException(f'Car {car.getLabel()} cannot be booked for period {period_start} - {period_end}, because it has already been booked.')
+
+  @reads
+  def find_available_cars(self, category_id: int, period_start: date, period_end: date):
+    """
+    Find the cars of a category which are not booked during a period.
+
+    A single query of the category's interval index yields the booked cars, instead of
+    one query per car of the category.
+
+    Args:
+        category_id (int): The ID of the category.
+        period_start (date): The start date of the period.
+        period_end (date): The end date of the period.
+
+    Returns:
+        list[Car]: The available cars of the category.
+    """
+    booked = set(self.category_periods.overlapping(category_id, period_start, period_end))
+    return [c for c in self.company.cars.find_by_category_id(category_id) if c.id not in booked]
+
+  @reads
+  def best_fit_car(self, category_id: int, period_start: date, period_end: date) -> Car:
+    """
+    Choose the available car of a category which fits a period best.
+
+    Prefers the car whose free slot around the period is the tightest, i.e. whose
+    bookings leave the fewest idle days before and after the period. Cars without
+    bookings on one or both sides come last, so that they stay free for long bookings.
+
+    Args:
+        category_id (int): The ID of the category.
+        period_start (date): The start date of the period.
+        period_end (date): The end date of the period.
+
+    Raises:
+        RentalException: If no car of the category is available for the period.
+
+    Returns:
+        Car: The chosen car.
+    """
+    def idle_days(car: Car):
+      gaps = self.periods.gaps(car.id, period_start, period_end)
+      bounded = [g for g in gaps if g != None]
+      return (len(gaps) - len(bounded), sum(bounded))
+
+    cars = self.find_available_cars(category_id, period_start, period_end)
+    if cars == []:
+      raise RentalException(f"No car of category {category_id} is available for period {period_start} - {period_end}")
+    return min(cars, key=idle_days)
+
+  @reads
   def find_by_id(self, id: int):
     """
     Find a booking by its ID.
 
-    Searches through the list of bookings to find a booking with the specified ID.
+    Looks up the booking with the specified ID in the registry.
 
     Args:
         id (int): The ID of the booking to find.
@@ -142,12 +324,12 @@ class Bookings(Subject):
     Returns:
         Booking: The booking with the specified ID.
     """
-    bookings = [b for b in self.bookings if b.id == id]
-    assert len(bookings) <= 1, 'Unexpectedly found multiple bookings with id {id}'
-    if bookings == []:
+    booking = self.bookings.lookup(id)
+    if booking == None:
       raise RentalException(f"Couldn't find booking with id {id}")
-    return bookings[0]
+    return booking
   
+  @reads
   def find_by_customer_id(self, customer_id: int):
     """
     Find bookings by customer ID.
@@ -158,4 +340,33 @@ class Bookings(Subject):
     Returns:
         list[Booking]: A list of bookings made by the specified customer.
     """
-    return [b for b in self.bookings if b.customer.id == customer_id]
+    return self.bookings.find('customer', customer_id)
+
+  @reads
+  def find_by_car_id(self, car_id: int):
+    """
+    Find bookings by car ID.
+
+    Args:
+        car_id (int): The ID of the car whose bookings to find.
+
+    Returns:
+        list[Booking]: A list of bookings made for the specified car.
+    """
+    return self.bookings.find('car', car_id)
+
+  @reads
+  def find_by_period(self, period_start: date, period_end: date):
+    """
+    Find the bookings overlapping a period.
+
+    Args:
+        period_start (date): The start date of the period.
+        period_end (date): The end date of the period.
+
+    Returns:
+        list[Booking]: The bookings with at least one day within the period.
+    """
+    if isinstance(self.bookings, Registry):
+      return [b for b in self.bookings if b.period_end >= period_start and b.period_start <= period_end]
+    return [self.bookings.lookup(id) for id in self.bookings.select(period_start=period_start, period_end=period_end)]
@@ -1,11 +1,13 @@
-from dataclasses import dataclass, field
-from patterns.observer import Subject
+from rental.entity import Entity, entity
+from patterns.observer import Subject, Change
 from rental import controller
 from rental.exceptions import RentalException
-from rental.company import Company
+from rental.company import Company, reads, writes
+from rental.registry import Registry
+from rental.cascade import Cascade
 
-@dataclass
-class Car:
+@entity
+class Car(Entity):
   """
   Represents a rental car.
 
@@ -36,39 +38,41 @@ class Cars(Subject):
   Manages a collection (fleet) of cars.
 
   Attributes:
-      cars (list[Car]): List that stores the Car instances.
+      cars (Registry): Registry that stores the Car instances by ID.
       company (Company): The rental company associated with the fleet of cars.
   """
 
   def __init__(self, company: Company):
     """
     Creates a new Cars instance for a given company.
-    The list of cars is initially empty.
+    The fleet of cars is initially empty.
 
     Args:
         company (Company): The rental company associated with the fleet of cars.
     """
     super().__init__()
-    self.cars: list[Car] = []
+    self.cars = Registry(category='category')
     self.company = company
 
+  @reads
   def get(self):
     """
     Retrieve all cars in the fleet.
 
-    Returns a copy of the internal list of cars to ensure the original list is not modified.
+    Returns a read-only view of the cars, shared between calls until cars are added or removed.
 
     Returns:
-        list[Car]: A copy of the list of all cars.
+        View[Car]: A snapshot view of all cars.
     """
-    return self.cars.copy()
+    return self.cars.values()
 
+  @writes
   def add(self, model: str, color: str, category: str) -> Car:
     """
     Add a new car to the fleet.
 
     Creates a new Car instance based on the provided model name 
-    and adds it to the internal list of cars.
+    and adds it to the internal registry of cars.
 
     Args:
         model (str): The model name of the new car.
@@ -76,43 +80,92 @@ class Cars(Subject):
     Returns:
         Car: The newly created Car instance.
     """
-    car = Car(controller.nextId(), model, color, category)
+    car = Car(controller.nextId(Car), model, color, category)
     print(f'Adding {car}')
-    self.cars.append(car)
-    self.notify()
+    self.insert(car)
+    self.notify(Change('add', car))
     return car
 
+  @writes
+  def add_many(self, cars: list) -> list:
+    """
+    Add a batch of new cars to the fleet.
+
+    IDs for the whole batch are reserved at once and observers are notified a single time.
+
+    Args:
+        cars (list[tuple[str, str, str]]): The model, color and category of each new car.
+
+    Returns:
+        list[Car]: The newly created Car instances.
+    """
+    cars = list(cars)
+    new_cars = [Car(id, model, color, category) for id, (model, color, category) in zip(controller.reserveIds(len(cars), Car), cars)]
+    print(f'Adding {len(new_cars)} cars')
+    for car in new_cars:
+      self.insert(car)
+    self.notify(*[Change('add', c) for c in new_cars])
+    return new_cars
+
+  @writes
   def delete(self, id: int):
     """
     Delete a car from the fleet by its ID.
 
-    Also checks and removes any bookings and rentals associated with this car before deleting it.
+    Also removes any bookings and rentals associated with this car in bulk before deleting it.
 
     Args:
         id (int): The ID of the car to delete.
     """
     car = self.find_by_id(id)
 
-    for booking in self.company.bookings.get():
-      if booking.car == car:
-        self.company.bookings.delete(booking.id)
-        
-    print(f'Deleting {car}')
-    self.cars.remove(car)
-    self.notify()
+    with self.company.batch():
+      cascade = Cascade(self.company)
+      for booking in self.company.bookings.find_by_car_id(car.id):
+        cascade.add_booking(booking)
+      cascade.execute()
+
+      print(f'Deleting {car}')
+      self.discard(car)
+      self.notify(Change('delete', car))
+
+  def insert(self, car: Car):
+    """
+    Store a car in the registry.
+
+    Args:
+        car (Car): The car to store.
+    """
+    self.cars.add(car)
+
+  def discard(self, car: Car):
+    """
+    Remove a car from the registry, without cascading or notifying observers.
+
+    Args:
+        car (Car): The car to remove.
+    """
+    self.cars.remove(car.id)
 
+  @reads
   def find_by_category_id(self, category_id: int):
-    cars: list[Car] = []
-    for c in self.cars:
-      if c.category == category_id:
-        cars.append(c)
-    return cars
+    """
+    Find all cars of a category.
+
+    Args:
+        category_id (int): The ID of the category.
+
+    Returns:
+        list[Car]: The cars of the specified category.
+    """
+    return self.cars.find('category', category_id)
 
+  @reads
   def find_by_id(self, id: int):
     """
     Find a car by its ID.
 
-    Searches through the list of cars to find a car with the specified ID.
+    Looks up the car with the specified ID in the registry.
 
     Args:
         id (int): The ID of the car to find.
@@ -123,11 +176,7 @@ class Cars(Subject):
     Returns:
         Car: The car with the specified ID.
     """
-    car = None
-    for c in self.cars:
-      if c.id == id:
-        car = c
-        break
+    car = self.cars.lookup(id)
     if car == None:
       raise RentalException(f"Couldn't find car with id {id}")
     return car
@@ -0,0 +1,88 @@
+from patterns.observer import Change
+from rental.company import Company
+
+class Cascade:
+  """
+  Collects the entities which depend on deleted entities and removes them in bulk.
+
+  Dependents are found through the secondary indexes of the collections: the cars of
+  a category, the bookings of a car or customer and the rental of a booking. The
+  removals are made in a single batch, so every affected collection notifies its
+  observers once, no matter how many of its entities were removed.
+
+  Attributes:
+      company (Company): The rental company the entities belong to.
+      cars (dict[int, Car]): The cars to remove, by ID.
+      bookings (dict[int, Booking]): The bookings to remove, by ID.
+      rentals (dict[int, Rental]): The rentals to remove, by ID.
+  """
+
+  def __init__(self, company: Company):
+    """
+    Creates a new, empty Cascade for a given company.
+
+    Args:
+        company (Company): The rental company the entities belong to.
+    """
+    self.company = company
+    self.cars = {}
+    self.bookings = {}
+    self.rentals = {}
+
+  def add_category(self, category):
+    """
+    Collect the cars of a category and everything depending on them.
+
+    Args:
+        category (Category): The deleted category.
+    """
+    for car in self.company.cars.find_by_category_id(category.id):
+      self.add_car(car)
+
+  def add_car(self, car):
+    """
+    Collect a car and everything depending on it.
+
+    Args:
+        car (Car): The car to remove.
+    """
+    self.cars[car.id] = car
+    for booking in self.company.bookings.find_by_car_id(car.id):
+      self.add_booking(booking)
+
+  def add_customer(self, customer):
+    """
+    Collect the bookings of a customer and everything depending on them.
+
+    Args:
+        customer (Customer): The deleted customer.
+    """
+    for booking in self.company.bookings.find_by_customer_id(customer.id):
+      self.add_booking(booking)
+
+  def add_booking(self, booking):
+    """
+    Collect a booking and its rental.
+
+    Args:
+        booking (Booking): The booking to remove.
+    """
+    self.bookings[booking.id] = booking
+    rental = self.company.rentals.find_by_booking_id(booking.id)
+    if rental != None:
+      self.rentals[rental.id] = rental
+
+  def execute(self):
+    """
+    Remove all collected entities, dependents first, and notify each affected collection once.
+    """
+    removals = [(self.company.rentals, self.rentals, 'rentals'),
+                (self.company.bookings, self.bookings, 'bookings'),
+                (self.company.cars, self.cars, 'cars')]
+    with self.company.batch():
+      for collection, entities, label in removals:
+        if entities:
+          print(f'Deleting {len(entities)} dependent {label}')
+          for entity in entities.values():
+            collection.discard(entity)
+          collection.notify(*[Change('delete', e) for e in entities.values()])
@@ -1,10 +1,13 @@
-from dataclasses import dataclass
+from rental.entity import Entity, entity
+from patterns.observer import Subject, Change
 from rental import controller
 from rental.exceptions import RentalException
-from rental.company import Company
+from rental.company import Company, reads, writes
+from rental.registry import Registry
+from rental.cascade import Cascade
 
-@dataclass
-class Category:
+@entity
+class Category(Entity):
   """
   Represents a category of cars.
 
@@ -24,12 +27,12 @@ class Category:
     """
     return f'{self.name} ({self.id})'
 
-class Categories:
+class Categories(Subject):
   """
   Manages a collection of categories.
 
   Attributes:
-      categories (list[Category]): List that stores the Category instances.
+      categories (Registry): Registry that stores the Category instances by ID.
       company (Company): The rental company associated with the categories.
   """
 
@@ -41,25 +44,28 @@ class Categories:
     Args:
         company (Company): The rental company associated with the categories.
     """
-    self.categories: list[Category] = []
+    super().__init__()
+    self.categories = Registry()
     self.company = company
 
+  @reads
   def get(self):
     """
     Retrieves all categories in the collection.
 
-    Returns a copy of the internal list of categories to prevent modifications to the original list.
+    Returns a read-only view of the categories, shared between calls until categories are added or removed.
 
     Returns:
-        list[Category]: Copy of the list of all categories.
+        View[Category]: Snapshot view of all categories.
     """
-    return self.categories.copy()
+    return self.categories.values()
 
+  @writes
   def add(self, name: str):
     """
     Add a new category to the collection.
 
-    Creates a new Category instance based on the provided name and adds it to the internal list of categories.
+    Creates a new Category instance based on the provided name and adds it to the internal registry of categories.
 
     Args:
         name (str): The name of the new category.
@@ -67,16 +73,39 @@ class Categories:
     Returns:
         Category: The newly created Category instance, added to the list.
     """
-    category = Category(controller.nextId(), name)
+    category = Category(controller.nextId(Category), name)
     print(f'Adding {category}')
-    self.categories.append(category)
+    self.insert(category)
+    self.notify(Change('add', category))
     return category
   
+  @writes
+  def add_many(self, names: list) -> list:
+    """
+    Add a batch of new categories to the collection.
+
+    IDs for the whole batch are reserved at once and observers are notified a single time.
+
+    Args:
+        names (list[str]): The names of the new categories.
+
+    Returns:
+        list[Category]: The newly created Category instances.
+    """
+    names = list(names)
+    categories = [Category(id, name) for id, name in zip(controller.reserveIds(len(names), Category), names)]
+    print(f'Adding {len(categories)} categories')
+    for category in categories:
+      self.insert(category)
+    self.notify(*[Change('add', c) for c in categories])
+    return categories
+
+  @writes
   def delete(self, id: int):
     """
     Delete a category from the collection by its ID.
 
-    Also removes any associated bookings, rentals and cars before deleting the category.
+    Also removes any associated bookings, rentals and cars in bulk before deleting the category.
 
     Raises:
         RentalException: If no category with the given ID is found.
@@ -85,18 +114,34 @@ class Categories:
         id (int): The ID of the category to delete.
     """
     category = self.find_by_id(id) # Category to be deleted
-    cars = self.company.cars.find_by_category_id(category.id) # Cars from the to-be-deleted category
-    bookings = self.company.bookings.get()
 
-    for c in cars:
-      self.company.cars.delete(c.id)
+    with self.company.batch():
+      cascade = Cascade(self.company)
+      cascade.add_category(category) # Cars from the to-be-deleted category, their bookings and rentals
+      cascade.execute()
+
+      self.discard(category)
+      self.notify(Change('delete', category))
+
+  def insert(self, category: Category):
+    """
+    Store a category in the registry.
 
-    for b in bookings:
-      if b.car.category == category:
-        self.company.bookings.delete(b.id)
+    Args:
+        category (Category): The category to store.
+    """
+    self.categories.add(category)
+
+  def discard(self, category: Category):
+    """
+    Remove a category from the registry, without cascading or notifying observers.
 
-    self.categories.remove(category)
+    Args:
+        category (Category): The category to remove.
+    """
+    self.categories.remove(category.id)
   
+  @reads
   def contains(self, name: str):
     """
     Checks if a category with the specified name exists in the collection.
@@ -112,11 +157,12 @@ class Categories:
         return True
     return False
 
+  @reads
   def find_by_id(self, id: int):
     """
     Find a category by its ID.
 
-    Searches the collection for a category with the specified ID.
+    Looks up the category with the specified ID in the registry.
 
     Args:
         id (int): The ID of the category to find.
@@ -127,11 +173,12 @@ class Categories:
     Returns:
         Category: The Category instance with the specified ID.
     """
-    for c in self.categories:
-      if c.id == id:
-        return c
-    raise RentalException(f"Couldn't find car category with id {id}")
+    category = self.categories.lookup(id)
+    if category == None:
+      raise RentalException(f"Couldn't find car category with id {id}")
+    return category
 
+  @reads
   def find_by_name(self, name: str):
     """
     Find a category by its name.
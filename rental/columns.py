@@ -0,0 +1,238 @@
+from array import array
+from datetime import date
+from rental.bookings import Booking
+from rental.registry import View
+
+try:
+  import numpy as np
+except ImportError: # Filters fall back to scanning the columns in Python
+  np = None
+
+class BookingColumns:
+  """
+  Stores bookings column by column in typed arrays instead of as Booking objects.
+
+  Each booking takes one row: its ID, the IDs of its customer and car (64 bit each), its
+  period as date ordinals and a code for its category (32 bit each). Booking objects are
+  only materialized when they are accessed, referencing the live customer and car of the
+  company. Deleted rows are marked and compacted away once they make up half of the table.
+
+  The class offers the same interface as the Registry used by Bookings by default,
+  including the 'customer' and 'car' secondary indexes, so it can replace it as the
+  storage engine of Bookings. Bulk filters (`select`) run over the columns directly, as
+  vectorized comparisons if NumPy is installed.
+
+  Attributes:
+      company (Company): The company whose customers and cars the bookings reference.
+      ids, customer_ids, car_ids, starts, ends, category_codes (array): The columns.
+      categories (list[object]): The distinct categories, indexed by category code.
+      rows (dict[int, int]): The row of each stored booking, by booking ID.
+      indexes (dict[str, dict[int, array]]): The booking IDs per customer ID and per car ID.
+      version (int): The number of adds and removes so far.
+  """
+
+  DELETED = -1
+
+  def __init__(self, company):
+    """
+    Creates a new, empty BookingColumns store.
+
+    Args:
+        company (Company): The company whose customers and cars the bookings reference.
+    """
+    self.company = company
+    self.ids = array('q')
+    self.customer_ids = array('q')
+    self.car_ids = array('q')
+    self.starts = array('i')
+    self.ends = array('i')
+    self.category_codes = array('i')
+    self.categories = []
+    self.codes = {}
+    self.rows = {}
+    self.indexes = {'customer': {}, 'car': {}}
+    self.version = 0
+
+  def __len__(self):
+    return len(self.rows)
+
+  def __iter__(self):
+    for row, id in enumerate(self.ids):
+      if id != self.DELETED:
+        yield self.materialize(row)
+
+  def __contains__(self, booking):
+    return self.lookup(getattr(booking, 'id', None)) == booking
+
+  def add(self, booking: Booking):
+    """
+    Add a booking as a new row.
+
+    Args:
+        booking (Booking): The booking to add.
+
+    Raises:
+        KeyError: If a booking with the same ID is already stored.
+    """
+    if booking.id in self.rows:
+      raise KeyError(f'Duplicate id {booking.id}')
+    code = self.codes.get(booking.category)
+    if code == None:
+      code = self.codes[booking.category] = len(self.categories)
+      self.categories.append(booking.category)
+    self.rows[booking.id] = len(self.ids)
+    self.ids.append(booking.id)
+    self.customer_ids.append(booking.customer.id)
+    self.car_ids.append(booking.car.id)
+    self.starts.append(booking.period_start.toordinal())
+    self.ends.append(booking.period_end.toordinal())
+    self.category_codes.append(code)
+    self.indexes['customer'].setdefault(booking.customer.id, array('q')).append(booking.id)
+    self.indexes['car'].setdefault(booking.car.id, array('q')).append(booking.id)
+    self.version += 1
+
+  def remove(self, id: int) -> Booking:
+    """
+    Remove a booking by its ID.
+
+    Args:
+        id (int): The ID of the booking to remove.
+
+    Raises:
+        KeyError: If no booking with the given ID is stored.
+
+    Returns:
+        Booking: The removed booking.
+    """
+    booking = self.materialize(self.rows[id])
+    row = self.rows.pop(id)
+    self.ids[row] = self.DELETED
+    self.version += 1
+    for name, key in [('customer', self.customer_ids[row]), ('car', self.car_ids[row])]:
+      bucket = self.indexes[name][key]
+      bucket.remove(id)
+      if not bucket:
+        del self.indexes[name][key]
+    if len(self.rows) * 2 < len(self.ids):
+      self.compact()
+    return booking
+
+  def lookup(self, id: int):
+    """
+    Find a booking by its ID.
+
+    Args:
+        id (int): The ID of the booking to find.
+
+    Returns:
+        Booking | None: The booking with the specified ID, or None if there is none.
+    """
+    try:
+      row = self.rows.get(id)
+    except TypeError: # Unhashable ids can never match
+      return None
+    return self.materialize(row) if row != None else None
+
+  def values(self) -> View:
+    """
+    Retrieve all bookings in insertion order.
+
+    The view is not kept, as holding materialized bookings would defeat the columns.
+
+    Returns:
+        View: A read-only view of all bookings.
+    """
+    return View(tuple(self), self.version)
+
+  def find(self, index: str, key):
+    """
+    Find all bookings of a customer ('customer' index) or a car ('car' index).
+
+    Args:
+        index (str): The name of the index, 'customer' or 'car'.
+        key (int): The ID of the customer or car.
+
+    Returns:
+        list[Booking]: The matching bookings in insertion order.
+    """
+    try:
+      ids = self.indexes[index].get(key, ())
+    except TypeError: # Unhashable keys can never match
+      return []
+    return [self.materialize(self.rows[id]) for id in ids]
+
+  def select(self, customer_id: int = None, car_id: int = None, period_start: date = None, period_end: date = None):
+    """
+    Filter the bookings by scanning the columns, without materializing rejected rows.
+
+    All given criteria must hold. The period criteria select the bookings overlapping the
+    period from `period_start` to `period_end`; either end may be left open.
+
+    Args:
+        customer_id (int): Only bookings of this customer.
+        car_id (int): Only bookings of this car.
+        period_start (date): Only bookings ending on or after this day.
+        period_end (date): Only bookings starting on or before this day.
+
+    Returns:
+        list[int]: The IDs of the matching bookings in insertion order.
+    """
+    start = period_start.toordinal() if period_start != None else None
+    end = period_end.toordinal() if period_end != None else None
+    if np == None:
+      return [id for id, customer, car, s, e in zip(self.ids, self.customer_ids, self.car_ids, self.starts, self.ends)
+              if id != self.DELETED
+              and (customer_id == None or customer == customer_id)
+              and (car_id == None or car == car_id)
+              and (start == None or e >= start)
+              and (end == None or s <= end)]
+    if not self.ids or any(not isinstance(key, int) for key in [customer_id, car_id] if key != None):
+      return [] # Keys of other types can never match
+    # The arrays are viewed in place, and the views are released before the columns can grow again
+    ids = np.frombuffer(self.ids, dtype=np.int64)
+    mask = ids != self.DELETED
+    if customer_id != None:
+      mask &= np.frombuffer(self.customer_ids, dtype=np.int64) == customer_id
+    if car_id != None:
+      mask &= np.frombuffer(self.car_ids, dtype=np.int64) == car_id
+    if start != None:
+      mask &= np.frombuffer(self.ends, dtype=np.int32) >= start
+    if end != None:
+      mask &= np.frombuffer(self.starts, dtype=np.int32) <= end
+    return ids[mask].tolist()
+
+  def materialize(self, row: int) -> Booking:
+    """
+    Create the Booking object of a row.
+
+    Args:
+        row (int): The row of the booking.
+
+    Returns:
+        Booking: The booking, referencing the company's customer and car.
+    """
+    return Booking(self.ids[row],
+                   self.company.customers.customers.lookup(self.customer_ids[row]),
+                   self.company.cars.cars.lookup(self.car_ids[row]),
+                   date.fromordinal(self.starts[row]),
+                   date.fromordinal(self.ends[row]),
+                   self.categories[self.category_codes[row]])
+
+  def compact(self):
+    """
+    Drop the rows of deleted bookings from all columns.
+    """
+    names = ['ids', 'customer_ids', 'car_ids', 'starts', 'ends', 'category_codes']
+    if np != None:
+      live = np.frombuffer(self.ids, dtype=np.int64) != self.DELETED
+      for name in names:
+        column = getattr(self, name)
+        compacted = array(column.typecode)
+        compacted.frombytes(np.frombuffer(column, dtype=column.typecode)[live].tobytes())
+        setattr(self, name, compacted)
+    else:
+      keep = [row for row, id in enumerate(self.ids) if id != self.DELETED]
+      for name in names:
+        column = getattr(self, name)
+        setattr(self, name, array(column.typecode, (column[row] for row in keep)))
+    self.rows = {id: row for row, id in enumerate(self.ids)}
@@ -1,3 +1,7 @@
+from contextlib import contextmanager, nullcontext, ExitStack
+from functools import wraps
+from patterns.rwlock import ReadWriteLock
+
 class Company:
   """
   Represents a rental company.
@@ -9,23 +13,135 @@ class Company:
       cars (Cars): The cars in the company's fleet.
       bookings (Bookings): The bookings made with the company.
       rentals (Rentals): The rentals of the company.
+      statistics (dict[str, Observer]): The statistics maintained about the company, by name.
+      columnar_bookings (bool): Whether the bookings are stored in typed columns.
+      lock (ReadWriteLock): Lets lookups run concurrently and operations which change the company
+          run alone, see `reads` and `writes`.
+      versions (Versions): The version of each entity and collection, for the operations which
+          validate with the company locked for reading and write optimistically.
+      backend (SqliteBackend | None): The database storing the collections, if any, see `transaction`.
   """
 
-  def __init__(self, name: str):
+  def __init__(self, name: str, columnar_bookings: bool = False):
     """
     Creates a new Company instance.
 
     Args:
         name (str): The name of the company.
+        columnar_bookings (bool): Store the bookings in typed columns instead of as objects.
     """
 
     # Lazy import to avoid circular imports
-    from rental import customers, cars, bookings, rentals, statistics, categories
+    from rental import customers, cars, bookings, rentals, statistics, categories, versions
     self.name = name
+    self.columnar_bookings = columnar_bookings
+    self.lock = ReadWriteLock()
     self.customers = customers.Customers(self)
     self.cars = cars.Cars(self)
-    self.bookings = bookings.Bookings(self)
+    self.bookings = bookings.Bookings(self, columnar_bookings)
     self.rentals = rentals.Rentals(self)
     self.categories = categories.Categories(self)
   
-    statistics.attachTo(self)
+    self.statistics = statistics.attachTo(self)
+    self.versions = versions.Versions()
+    for subject in self.subjects():
+      subject.recorders.append(self.versions)
+    self.backend = None
+
+  def __getstate__(self):
+    # Locks and database connections cannot be pickled, a copy gets its own lock
+    state = self.__dict__.copy()
+    del state['lock']
+    state['backend'] = None
+    return state
+
+  def __setstate__(self, state):
+    from rental import statistics # Lazy import to avoid circular imports
+    self.__dict__.update(state)
+    self.lock = ReadWriteLock()
+    self.backend = None
+    for subject in self.subjects(): # Recorders are not pickled with the collections
+      subject.recorders.append(self.versions)
+    statistics.recordTo(self, self.statistics)
+
+  def subjects(self):
+    """
+    Retrieves the collections of the company which notify observers.
+
+    Returns:
+        list[Subject]: The categories, customers, cars, bookings and rentals.
+    """
+    return [self.categories, self.customers, self.cars, self.bookings, self.rentals]
+
+  def use_dispatcher(self, dispatcher):
+    """
+    Deliver the updates of all collections through a dispatcher.
+
+    Args:
+        dispatcher (AsyncDispatcher | None): The dispatcher, or None to deliver updates synchronously.
+    """
+    for subject in self.subjects():
+      subject.dispatcher = dispatcher
+
+  def transaction(self):
+    """
+    Run an operation within a write transaction of the database storing the company.
+
+    Operations which change the company enter it before the lock of the company, so that
+    their checks and writes are atomic for other processes sharing the database too.
+    Without a database, this does nothing.
+
+    Returns:
+        ContextManager: The transaction.
+    """
+    return self.backend.transaction() if self.backend != None else nullcontext()
+
+  @contextmanager
+  def batch(self):
+    """
+    Run a whole operation atomically, deferring and coalescing the notifications of all collections.
+
+    The company is locked for writing during the batch, within a database transaction (see
+    `transaction`). Observers of each collection receive a single update, with all changes,
+    when the outermost batch ends.
+    """
+    with ExitStack() as stack:
+      stack.enter_context(self.transaction())
+      stack.enter_context(self.lock.write())
+      for subject in self.subjects():
+        stack.enter_context(subject.batch())
+      yield self
+
+def reads(method):
+  """
+  Decorates a method of a collection which looks up entities, to hold the lock of its company
+  for reading, so that it does not see an operation half done.
+  """
+  @wraps(method)
+  def locked(self, *args, **kwargs):
+    with self.company.lock.read():
+      return method(self, *args, **kwargs)
+  return locked
+
+def writes(method):
+  """
+  Decorates a method of a collection which changes the company, to hold the lock of the company
+  for writing within a database transaction, so that the change and its cascades are atomic.
+  """
+  @wraps(method)
+  def locked(self, *args, **kwargs):
+    with self.company.transaction(), self.company.lock.write():
+      return method(self, *args, **kwargs)
+  return locked
+
+def transactional(method):
+  """
+  Decorates a method of a collection which validates a change with the company locked for
+  reading and then makes it in a batch, to run both within a database transaction. Other
+  processes sharing the database then cannot change what was validated before it is written.
+  """
+  @wraps(method)
+  def transacted(self, *args, **kwargs):
+    with self.company.transaction():
+      return method(self, *args, **kwargs)
+  return transacted
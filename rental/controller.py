@@ -1,7 +1,8 @@
 from datetime import date
+from rental.ids import IdService
 
 today: date = date.today()
-current_id: int = 0
+ids: IdService = IdService()
 
 def setToday(date: date):
     """
@@ -16,16 +17,31 @@ def setToday(date: date):
     print(f'Set "today" to {date}')
     today = date
 
-def nextId():
+def nextId(kind=None):
     """
     Generates and returns the next unique identifier (ID).
 
+    Args:
+      kind (type): The kind of entity the ID is for, e.g. its class. Each kind has its own sequence,
+        drawing blocks from the same high-water mark, so IDs are unique across kinds.
+
     Returns:
       int: The generated ID.
     """
-    global current_id
-    current_id += 1
-    return current_id
+    return ids.next(kind)
+
+def reserveIds(count: int, kind=None):
+    """
+    Reserves a block of consecutive unique identifiers (IDs) at once.
+
+    Args:
+      count (int): The number of IDs to reserve.
+      kind (type): The kind of entity the IDs are for, e.g. its class.
+
+    Returns:
+      range: The reserved IDs.
+    """
+    return ids.reserve(count, kind)
 
 def setId(id: int):
     """
@@ -35,9 +51,21 @@ def setId(id: int):
     Args:
       id (int): The current id to be used when providing unique ids
     """
-    global current_id
-    current_id = id
-
+    ids.set(id)
 
+def useIds(service: IdService):
+    """
+    Sets the service allocating the unique identifiers (IDs), e.g. one shared by several processes.
 
+    Args:
+      service (IdService): The new service, continuing after the current id.
+    """
+    global ids
+    service.set(max(service.current, ids.current))
+    ids = service
 
+def __getattr__(name: str):
+    # `current_id` is the high-water mark of the ID service, no ID above it has been handed out
+    if name == 'current_id':
+        return ids.current
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,11 +1,13 @@
-from dataclasses import dataclass
-from patterns.observer import Subject
+from rental.entity import Entity, entity
+from patterns.observer import Subject, Change
 from rental import controller
 from rental.exceptions import RentalException
-from rental.company import Company
+from rental.company import Company, reads, writes
+from rental.registry import Registry
+from rental.cascade import Cascade
 
-@dataclass
-class Customer:
+@entity
+class Customer(Entity):
   """
   Represents a customer.
 
@@ -32,7 +34,7 @@ class Customers(Subject):
   Manages a collection of customers.
 
   Attributes:
-      customers (list[Customer]): List that stores the Customer instances.
+      customers (Registry): Registry that stores the Customer instances by ID.
       company (Company): The rental company associated with the customers.
   """
 
@@ -45,25 +47,27 @@ class Customers(Subject):
         company (Company): The rental company associated with the customers.
     """
     super().__init__()
-    self.customers: list[Customer] = []
+    self.customers = Registry()
     self.company = company
 
+  @reads
   def get(self):
     """
     Retrieves all customers in the collection.
 
-    Returns a copy of the internal list of customers to prevent modifications to the original list.
+    Returns a read-only view of the customers, shared between calls until customers are added or removed.
 
     Returns:
-        list[Customer]: Copy of the list of all customers.
+        View[Customer]: Snapshot view of all customers.
     """
-    return self.customers.copy()
+    return self.customers.values()
   
+  @writes
   def add(self, name: str):
     """
     Add a new customer to the collection.
 
-    Creates a new Customer instance based on the provided name and adds it to the internal list of customers.
+    Creates a new Customer instance based on the provided name and adds it to the internal registry of customers.
 
     Args:
         name (str): The name of the new customer.
@@ -71,18 +75,40 @@ class Customers(Subject):
     Returns:
         Customer: The newly created Customer instance, added to the list.
     """
-    customer = Customer(controller.nextId(), name)
+    customer = Customer(controller.nextId(Customer), name)
     print(f'Adding {customer}')
-    self.customers.append(customer)
-    self.notify()
+    self.insert(customer)
+    self.notify(Change('add', customer))
     return customer
    
 
+  @writes
+  def add_many(self, names: list) -> list:
+    """
+    Add a batch of new customers to the collection.
+
+    IDs for the whole batch are reserved at once and observers are notified a single time.
+
+    Args:
+        names (list[str]): The names of the new customers.
+
+    Returns:
+        list[Customer]: The newly created Customer instances.
+    """
+    names = list(names)
+    customers = [Customer(id, name) for id, name in zip(controller.reserveIds(len(names), Customer), names)]
+    print(f'Adding {len(customers)} customers')
+    for customer in customers:
+      self.insert(customer)
+    self.notify(*[Change('add', c) for c in customers])
+    return customers
+
+  @writes
   def delete(self, id: int):
     """
     Delete the customer from the collection by its ID.
 
-    Also removes any associated bookings and rentals before deleting the customer.
+    Also removes any associated bookings and rentals in bulk before deleting the customer.
 
     Raises:
         RentalException: If no customer with the given ID is found.
@@ -91,15 +117,35 @@ class Customers(Subject):
         id (int): The ID of the customer to delete.
     """
     customer = self.find_by_id(id)
-       
-    for booking in self.company.bookings.get():
-      if booking.customer == customer:
-        self.company.bookings.delete(booking.id)
-    
-    print(f'Deleting {customer}')
-    self.customers.remove(customer)
-    self.notify()
 
+    with self.company.batch():
+      cascade = Cascade(self.company)
+      cascade.add_customer(customer)
+      cascade.execute()
+
+      print(f'Deleting {customer}')
+      self.discard(customer)
+      self.notify(Change('delete', customer))
+
+  def insert(self, customer: Customer):
+    """
+    Store a customer in the registry.
+
+    Args:
+        customer (Customer): The customer to store.
+    """
+    self.customers.add(customer)
+
+  def discard(self, customer: Customer):
+    """
+    Remove a customer from the registry, without cascading or notifying observers.
+
+    Args:
+        customer (Customer): The customer to remove.
+    """
+    self.customers.remove(customer.id)
+
+  @reads
   def contains(self, name: str):
     """
     Checks if a customer with the specified name exists in the collection.
@@ -117,11 +163,12 @@ class Customers(Subject):
 
     return match
 
+  @reads
   def find_by_id(self, id: int):
     """
     Find a customer by its ID.
 
-    Searches the collection for a customer with the specified ID.
+    Looks up the customer with the specified ID in the registry.
 
     Args:
         id (int): The ID of the customer to find.
@@ -132,70 +179,69 @@ class Customers(Subject):
     Returns:
         Customer: The Customer instance with the specified ID.
     """
-    retrieved_customer = None
-    for customer in self.customers:
-      if customer.id == id:
-        retrieved_customer = customer
-        break
-
+    retrieved_customer = self.customers.lookup(id)
     if retrieved_customer == None:
       raise RentalException(f"Couldn't find customer with id {id}")
     
     return retrieved_customer
 
+  @writes
   def add_points(self, id: int, points: int):
     if points < 0:
       raise RentalException(f"Points cannot be negative")
     
     customer = self.find_by_id(id)
-    customer.points += points
-    self.update_status(id)
-    self.notify_points()
+    with self.batch():
+      customer.points += points
+      self.notify_points(Change('points', customer, points))
+      self.update_status(id)
 
+  @writes
   def subtract_points(self, id: int, points: int):
     if points < 0:
       raise RentalException(f"Points cannot be negative")
     
     customer = self.find_by_id(id)
-    if customer.points-points < 0:
-      customer.points = 0
-    else:
-      customer.points -= points
+    with self.batch():
+      previous_points = customer.points
+      if customer.points-points < 0:
+        customer.points = 0
+      else:
+        customer.points -= points
+      self.notify_points(Change('points', customer, customer.points - previous_points))
 
-    self.update_status(id)
-    self.notify_points()
+      self.update_status(id)
 
+  @reads
   def get_points(self, id: int):
     customer = self.find_by_id(id)
     return customer.points
 
+  @reads
   def get_status(self, id: int):
     customer = self.find_by_id(id)
     
     return customer.status
   
+  @writes
   def update_status(self, id: int):
     customer = self.find_by_id(id)
     current_points = self.get_points(id)
     if (current_points <= 100):
-      if(customer.status != "Basic"):
-        customer.status = "Basic"
-        raise RentalException(f"You reached the Basic status")
+      status = "Basic"
     elif (current_points > 100) & (current_points <= 200):
-      if(customer.status != "Newbie"):
-        customer.status = "Newbie"
-        raise RentalException(f"You reached the Newbie status")
+      status = "Newbie"
     elif (current_points > 200) & (current_points <= 500):
-      if(customer.status != "Expert"):
-        customer.status = "Expert"
-        raise RentalException(f"You reached the Expert status")
+      status = "Expert"
     elif (current_points > 500) & (current_points <= 800):
-      if(customer.status != "Professional"):
-        customer.status = "Professional"
-        raise RentalException(f"You reached the Professional status")
-    elif (current_points > 800):
-      if(customer.status != "Serial Renter"):
-        customer.status = "Serial Renter"
-        raise RentalException(f"You reached the Serial Renter status")
-      
+      status = "Professional"
+    else:
+      status = "Serial Renter"
+
+    if(customer.status != status):
+      previous_status = customer.status
+      customer.status = status
+      self.notify_points(Change('status', customer, (previous_status, status)))
+      raise RentalException(f"You reached the {status} status")
+
     self.notify_points()
\ No newline at end of file
@@ -0,0 +1,577 @@
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager, nullcontext
+from dataclasses import fields
+from datetime import date
+from itertools import islice
+from patterns.observer import Recorder, Subject, Change
+from rental import controller
+from rental.company import Company
+from rental.exceptions import RentalException
+from rental.entity import Entity, encode, decode
+from rental.registry import View
+from rental.categories import Category
+from rental.customers import Customer
+from rental.cars import Car
+from rental.bookings import Booking
+from rental.rentals import Rental
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS company (
+  key TEXT PRIMARY KEY,
+  value
+);
+CREATE TABLE IF NOT EXISTS categories (
+  id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customers (
+  id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  points INTEGER NOT NULL,
+  status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cars (
+  id INTEGER PRIMARY KEY,
+  model TEXT NOT NULL,
+  color TEXT NOT NULL,
+  category
+);
+CREATE INDEX IF NOT EXISTS cars_category ON cars (category);
+CREATE TABLE IF NOT EXISTS bookings (
+  id INTEGER PRIMARY KEY,
+  customer INTEGER NOT NULL REFERENCES customers (id),
+  car INTEGER NOT NULL REFERENCES cars (id),
+  period_start INTEGER NOT NULL,
+  period_end INTEGER NOT NULL,
+  category
+);
+CREATE INDEX IF NOT EXISTS bookings_customer ON bookings (customer);
+CREATE INDEX IF NOT EXISTS bookings_car_period ON bookings (car, period_start, period_end);
+CREATE INDEX IF NOT EXISTS bookings_category_period ON bookings (category, period_start, period_end);
+CREATE TABLE IF NOT EXISTS rentals (
+  id INTEGER PRIMARY KEY,
+  booking INTEGER NOT NULL REFERENCES bookings (id),
+  car INTEGER NOT NULL REFERENCES cars (id)
+);
+CREATE INDEX IF NOT EXISTS rentals_booking ON rentals (booking);
+CREATE INDEX IF NOT EXISTS rentals_car ON rentals (car);
+"""
+
+class SqlRegistry:
+  """
+  Stores the entities of a collection in a table of a SQLite database.
+
+  The class offers the same interface as Registry, so it can replace it as the storage
+  engine of a collection. Secondary indexes are given as SQL conditions on the table,
+  backed by the indexes of the schema. Rows are converted to entities on access, with
+  references resolved through the registries of the other collections.
+
+  With the cache enabled, entities are kept in memory once accessed, so each row maps
+  to a single entity object, and `values` hands out the same View until rows are added or
+  removed. Without it, every access reads the database, so that several processes can share
+  the database, their operations isolated by the transactions of SqliteBackend.
+
+  Attributes:
+      backend (SqliteBackend): The backend holding the database connection.
+      table (str): The name of the table.
+      cls (type): The type of the stored entities.
+      cache (dict[int, Entity] | None): The entities accessed so far by ID, or None if caching is disabled.
+      version (int): The number of rows added and removed through the registry.
+  """
+
+  def __init__(self, backend, table: str, cls: type, cache: bool = True, **indexes: str):
+    """
+    Creates a new SqlRegistry on an existing table.
+
+    Args:
+        backend (SqliteBackend): The backend holding the database connection.
+        table (str): The name of the table, with one column per field of the entity class.
+        cls (type): The type of the stored entities.
+        cache (bool): Keep accessed entities in memory.
+        **indexes (str): Secondary indexes, given as index name and the SQL condition
+            matching the rows of a key, e.g. `customer='customer = ?'`.
+    """
+    self.backend = backend
+    self.table = table
+    self.cls = cls
+    self.cache = {} if cache else None
+    self.version = 0
+    self.view = None
+    columns = [f.name for f in fields(cls)]
+    listed = ', '.join(columns)
+    # Statements are prepared once by the connection's statement cache
+    self.insert_sql = f'INSERT INTO {table} ({listed}) VALUES ({", ".join("?" for _ in columns)})'
+    self.update_sql = f'UPDATE {table} SET {", ".join(f"{c} = ?" for c in columns[1:])} WHERE id = ?'
+    self.delete_sql = f'DELETE FROM {table} WHERE id = ?'
+    self.select_sql = f'SELECT {listed} FROM {table}'
+    self.lookup_sql = f'{self.select_sql} WHERE id = ?'
+    self.count_sql = f'SELECT COUNT(*) FROM {table}'
+    self.find_sql = {name: f'{self.select_sql} WHERE {condition} ORDER BY id' for name, condition in indexes.items()}
+
+  def __len__(self):
+    return self.backend.query(self.count_sql)[0][0]
+
+  def __iter__(self):
+    # Rows are fetched a chunk at a time, so without the cache iterating takes constant memory
+    for row in self.backend.stream(f'{self.select_sql} ORDER BY id'):
+      yield self.materialize(row)
+
+  def __contains__(self, entity):
+    stored = self.lookup(getattr(entity, 'id', None))
+    return stored is not None and (stored is entity or stored == entity)
+
+  def add(self, entity: Entity):
+    """
+    Insert an entity as a new row.
+
+    Args:
+        entity (Entity): The entity to add.
+
+    Raises:
+        KeyError: If an entity with the same ID is already stored.
+    """
+    try:
+      self.backend.execute(self.insert_sql, encode(entity))
+    except sqlite3.IntegrityError as e:
+      if self.lookup(entity.id) == None:
+        raise
+      raise KeyError(f'Duplicate id {entity.id}') from e
+    self.version += 1
+    if self.cache != None:
+      self.cache[entity.id] = entity
+
+  def update(self, entity: Entity):
+    """
+    Write the current field values of a stored entity to its row.
+
+    Args:
+        entity (Entity): The changed entity.
+    """
+    values = encode(entity)
+    self.backend.execute(self.update_sql, values[1:] + values[:1])
+
+  def remove(self, id: int) -> Entity:
+    """
+    Delete an entity by its ID.
+
+    Args:
+        id (int): The ID of the entity to remove.
+
+    Raises:
+        KeyError: If no entity with the given ID is stored.
+
+    Returns:
+        Entity: The removed entity.
+    """
+    entity = self.lookup(id)
+    if entity == None:
+      raise KeyError(id)
+    self.backend.execute(self.delete_sql, (id,))
+    self.version += 1
+    if self.cache != None:
+      self.cache.pop(id, None)
+    return entity
+
+  def lookup(self, id: int):
+    """
+    Find an entity by its ID.
+
+    Args:
+        id (int): The ID of the entity to find.
+
+    Returns:
+        Entity | None: The entity with the specified ID, or None if there is none.
+    """
+    try:
+      if self.cache != None and id in self.cache:
+        return self.cache[id]
+    except TypeError: # Unhashable ids can never match
+      return None
+    rows = self.query(self.lookup_sql, (id,))
+    return rows[0] if rows else None
+
+  def values(self) -> View:
+    """
+    Retrieve all entities, ordered by ID.
+
+    Returns:
+        View: A read-only view of all entities, reused while none are added or removed if caching is enabled.
+    """
+    view = self.view
+    if view == None or view.version != self.version or self.cache == None:
+      view = View(tuple(self.query(f'{self.select_sql} ORDER BY id')), self.version)
+      if self.cache != None:
+        self.view = view
+    return view
+
+  def find(self, index: str, key):
+    """
+    Find all entities sharing a value of a secondary index.
+
+    Args:
+        index (str): The name of the index.
+        key (object): The indexed value.
+
+    Returns:
+        list[Entity]: The matching entities, ordered by ID.
+    """
+    return self.query(self.find_sql[index], (key,))
+
+  def query(self, sql: str, parameters=()):
+    """
+    Run a query and convert the resulting rows to entities.
+
+    Args:
+        sql (str): The query, selecting all columns of the table.
+        parameters (tuple): The parameters of the query.
+
+    Returns:
+        list[Entity]: The entities, reusing cached ones. Empty if a parameter cannot be stored.
+    """
+    try:
+      rows = self.backend.query(sql, parameters)
+    except sqlite3.InterfaceError: # Unsupported parameter types can never match
+      return []
+    return [self.materialize(row) for row in rows]
+
+  def materialize(self, row) -> Entity:
+    """
+    Returns:
+        Entity: The entity of a row, from the cache if it has been accessed before.
+    """
+    if self.cache != None and row[0] in self.cache:
+      return self.cache[row[0]]
+    entity = decode(self.cls, row, self.backend.resolve)
+    if self.cache != None:
+      self.cache[entity.id] = entity
+    return entity
+
+class SqlBookings(SqlRegistry):
+  """
+  Stores bookings in SQLite, filtering them in the database.
+  """
+
+  def select(self, customer_id: int = None, car_id: int = None, period_start: date = None, period_end: date = None):
+    """
+    Filter the bookings in the database.
+
+    All given criteria must hold. The period criteria select the bookings overlapping the
+    period from `period_start` to `period_end`; either end may be left open.
+
+    Args:
+        customer_id (int): Only bookings of this customer.
+        car_id (int): Only bookings of this car.
+        period_start (date): Only bookings ending on or after this day.
+        period_end (date): Only bookings starting on or before this day.
+
+    Returns:
+        list[int]: The IDs of the matching bookings, ordered by ID.
+    """
+    criteria = [('customer = ?', customer_id), ('car = ?', car_id),
+                ('period_end >= ?', period_start and period_start.toordinal()),
+                ('period_start <= ?', period_end and period_end.toordinal())]
+    criteria = [(condition, value) for condition, value in criteria if value != None]
+    where = ' AND '.join(condition for condition, _ in criteria) or '1'
+    return [row[0] for row in self.backend.query(f'SELECT id FROM bookings WHERE {where} ORDER BY id', [v for _, v in criteria])]
+
+class SqlPeriods:
+  """
+  Answers the period queries of IntervalIndex from the rows of a SQLite database.
+
+  The periods are part of the stored rows, so adding and removing them are no-ops.
+
+  Attributes:
+      backend (SqliteBackend): The backend holding the database connection.
+      source (str): The SQL expression listing the periods as (key, id, start, end) rows.
+  """
+
+  def __init__(self, backend, source: str):
+    """
+    Creates a new SqlPeriods instance.
+
+    Args:
+        backend (SqliteBackend): The backend holding the database connection.
+        source (str): The SQL table expression listing the periods with columns key, id, start
+            and end (as date ordinals), e.g. a subquery.
+    """
+    self.backend = backend
+    self.source = source
+    self.overlapping_sql = f'SELECT id FROM {source} WHERE key = ? AND start <= ? AND end >= ? ORDER BY start'
+    self.before_sql = f'SELECT MAX(end) FROM {source} WHERE key = ? AND start < ?'
+    self.after_sql = f'SELECT MIN(start) FROM {source} WHERE key = ? AND start > ?'
+
+  def add(self, key, id: int, period_start: date, period_end: date):
+    pass
+
+  def remove(self, key, id: int, period_start: date, period_end: date):
+    pass
+
+  def overlapping(self, key, period_start: date, period_end: date):
+    """
+    Find the periods of a key which overlap a period. Both ends are inclusive.
+
+    Returns:
+        list[int]: The IDs of the overlapping periods, ordered by start date.
+    """
+    rows = self.backend.query(self.overlapping_sql, (key, period_end.toordinal(), period_start.toordinal()))
+    return [row[0] for row in rows]
+
+  def gaps(self, key, period_start: date, period_end: date):
+    """
+    Measure the idle days between a free period and its neighbouring periods.
+
+    Returns:
+        tuple[int | None, int | None]: The number of free days before and after the period.
+        None if there is no period before or after it, respectively.
+    """
+    start, end = period_start.toordinal(), period_end.toordinal()
+    previous = self.backend.query(self.before_sql, (key, start))[0][0]
+    following = self.backend.query(self.after_sql, (key, end))[0][0]
+    return (start - previous - 1 if previous != None else None,
+            following - end - 1 if following != None else None)
+
+class SqliteBackend(Recorder):
+  """
+  Persists the collections of a company in a SQLite database.
+
+  `open` creates a company whose collections store their entities in the tables of the
+  database (see SqlRegistry) and answer period queries with SQL (see SqlPeriods). Additions
+  and deletions are written by the registries, while the backend records the other changes,
+  e.g. of points, and writes the changed entities through.
+
+  Each thread has its own connection, in autocommit mode. The operations which change the
+  company run in a write transaction of their thread (see `transaction` and Company.transaction),
+  begun before they check anything and committed when they are done or rolled back if they
+  fail. Checks and writes of an operation are therefore atomic even across processes sharing
+  the database file, and a thread never commits the changes of another. An in-memory
+  database cannot be shared, so it has a single connection whose statements commit one by one.
+
+  Referential integrity is maintained by the collections (see Cascade), so foreign keys are
+  declared but not enforced.
+
+  Attributes:
+      path (str): The path of the database file.
+      cache (bool): Whether the registries keep accessed entities in memory.
+      registries (dict[type, SqlRegistry]): The registry of each entity type.
+  """
+
+  COLLECTIONS = {'categories': Category, 'customers': Customer, 'cars': Car, 'bookings': Booking, 'rentals': Rental}
+
+  def __init__(self, path: str, cache: bool = True):
+    """
+    Opens a SQLite database, creating the tables if they do not exist yet.
+
+    Args:
+        path (str): The path of the database file.
+        cache (bool): Keep accessed entities in memory. Disable it when several processes
+            share the database.
+    """
+    self.path = path
+    self.cache = cache
+    self.lock = threading.RLock()
+    self.local = threading.local() # The connection and transaction depth of each thread
+    # Connections are closed with their thread, or by `close`
+    self.connections = weakref.WeakKeyDictionary()
+    self.shared = self.connect() if path == ':memory:' else None
+    self.connection.executescript(SCHEMA)
+    self.registries = {}
+
+  def connect(self) -> sqlite3.Connection:
+    """
+    Returns:
+        sqlite3.Connection: A new connection to the database, in autocommit mode.
+    """
+    connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+    if self.path != ':memory:':
+      connection.execute('PRAGMA journal_mode = WAL')
+    return connection
+
+  @property
+  def connection(self) -> sqlite3.Connection:
+    """
+    Returns:
+        sqlite3.Connection: The connection of the current thread, opened on first use.
+    """
+    if self.shared != None:
+      return self.shared
+    connection = getattr(self.local, 'connection', None)
+    if connection == None:
+      connection = self.local.connection = self.connect()
+      with self.lock:
+        self.connections[threading.current_thread()] = connection
+    return connection
+
+  def execute(self, sql: str, parameters=()):
+    """
+    Run a statement, within the transaction of the current thread if there is one.
+    """
+    if self.shared != None:
+      with self.lock:
+        self.shared.execute(sql, parameters)
+    else:
+      self.connection.execute(sql, parameters)
+
+  def query(self, sql: str, parameters=()) -> list:
+    """
+    Returns:
+        list[tuple]: The rows resulting from a query.
+    """
+    if self.shared != None:
+      with self.lock:
+        return self.shared.execute(sql, parameters).fetchall()
+    return self.connection.execute(sql, parameters).fetchall()
+
+  def stream(self, sql: str, parameters=(), size: int = 1000):
+    """
+    Run a query and fetch the resulting rows a chunk at a time.
+
+    Args:
+        sql (str): The query.
+        parameters (tuple): The parameters of the query.
+        size (int): The number of rows fetched at once.
+
+    Yields:
+        tuple: The next row.
+    """
+    guard = self.lock if self.shared != None else nullcontext()
+    with guard:
+      cursor = self.connection.execute(sql, parameters)
+    while True:
+      with guard:
+        rows = cursor.fetchmany(size)
+      if not rows:
+        return
+      yield from rows
+
+  @contextmanager
+  def transaction(self):
+    """
+    Run the statements of the current thread in a write transaction.
+
+    The outermost transaction of a thread begins immediately, i.e. it waits for the
+    transactions of other connections to end, and commits when it ends. Nested transactions
+    join it. A RentalException also commits, as the collections report some completed changes
+    with one (e.g. a new customer status) and keep what they changed in memory as well. Any
+    other exception rolls the transaction back.
+    """
+    depth = getattr(self.local, 'depth', 0)
+    if depth > 0 or self.shared != None:
+      self.local.depth = depth + 1
+      try:
+        yield
+      finally:
+        self.local.depth = depth
+      return
+    connection = self.connection
+    connection.execute('BEGIN IMMEDIATE')
+    self.local.depth = 1
+    try:
+      try:
+        yield
+      except RentalException:
+        connection.execute('COMMIT')
+        raise
+      connection.execute('COMMIT')
+    except BaseException:
+      if connection.in_transaction:
+        connection.execute('ROLLBACK')
+      raise
+    finally:
+      self.local.depth = 0
+
+  def close(self):
+    """
+    Close the connections to the database.
+    """
+    with self.lock:
+      connections = [self.shared] if self.shared != None else list(self.connections.values())
+      for connection in connections:
+        connection.close()
+      self.connections.clear()
+    self.local = threading.local()
+
+  def clear(self):
+    """
+    Delete all stored entities and company data, e.g. before opening a new company.
+    """
+    with self.transaction():
+      for table in ['rentals', 'bookings', 'cars', 'customers', 'categories', 'company']:
+        self.execute(f'DELETE FROM {table}')
+
+  def resolve(self, kind: type, id: int):
+    """
+    Returns:
+        Entity | None: The entity of a type with an ID, None if it is not stored.
+    """
+    return self.registries[kind].lookup(id)
+
+  def open(self, name: str = None) -> Company:
+    """
+    Create a company on top of the database.
+
+    The current ID of the controller is raised to the one stored, and the statistics of the
+    company are initialized from the stored entities.
+
+    Args:
+        name (str): The name of the company, stored on first use. Defaults to the stored name.
+
+    Returns:
+        Company: The company, whose collections read and write the database.
+    """
+    with self.transaction():
+      stored = dict(self.query('SELECT key, value FROM company'))
+      company = Company(name or stored.get('name', 'Company'))
+      self.registries = {
+        Category: SqlRegistry(self, 'categories', Category, self.cache),
+        Customer: SqlRegistry(self, 'customers', Customer, self.cache),
+        Car: SqlRegistry(self, 'cars', Car, self.cache, category='category = ?'),
+        Booking: SqlBookings(self, 'bookings', Booking, self.cache, customer='customer = ?', car='car = ?'),
+        Rental: SqlRegistry(self, 'rentals', Rental, self.cache, booking='booking = ?', car='car = ?',
+                            customer='booking IN (SELECT id FROM bookings WHERE customer = ?)'),
+      }
+      for attribute, kind in self.COLLECTIONS.items():
+        setattr(getattr(company, attribute), attribute, self.registries[kind])
+      company.bookings.periods = SqlPeriods(self, '(SELECT car AS key, id, period_start AS start, period_end AS end FROM bookings)')
+      company.bookings.category_periods = SqlPeriods(self, '(SELECT category AS key, car AS id, period_start AS start, period_end AS end FROM bookings)')
+      company.rentals.periods = SqlPeriods(self, '(SELECT r.car AS key, r.id, b.period_start AS start, b.period_end AS end'
+                                                 ' FROM rentals r JOIN bookings b ON b.id = r.booking)')
+      controller.setId(max(controller.current_id, stored.get('current_id', 0)))
+      self.execute('INSERT OR REPLACE INTO company (key, value) VALUES (?, ?)', ('name', company.name))
+      company.backend = self
+
+      for subject, attribute in self.names(company).items():
+        entities = iter(getattr(subject, attribute))
+        while True: # In chunks, so that opening takes constant memory without the cache
+          changes = [Change('add', entity) for entity in islice(entities, 1000)]
+          if not changes:
+            break
+          for recorder in subject.recorders:
+            if recorder is not company.versions: # Versions only track the changes made from now on
+              recorder.record(subject, changes)
+          for observer in subject.observers:
+            observer.changed(subject, changes)
+        subject.recorders.append(self)
+      return company
+
+  def names(self, company: Company) -> dict:
+    """
+    Returns:
+        dict[Subject, str]: The name of each collection of a company.
+    """
+    return {getattr(company, name): name for name in self.COLLECTIONS}
+
+  def record(self, subject: Subject, changes: tuple):
+    """
+    Write the entities changed other than by additions and deletions through.
+
+    Args:
+        subject (Subject): The collection that changed.
+        changes (tuple[Change, ...]): The changes, in order.
+    """
+    with self.transaction():
+      for change in changes:
+        if change.kind not in ('add', 'delete'):
+          self.registries[type(change.entity)].update(change.entity)
+      self.execute('INSERT OR REPLACE INTO company (key, value) VALUES (?, ?)', ('current_id', controller.current_id))
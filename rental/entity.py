@@ -0,0 +1,93 @@
+from dataclasses import dataclass, fields
+from datetime import date
+from functools import lru_cache
+from typing import get_type_hints
+
+class Entity:
+  """
+  Base class of the entities of a rental company.
+
+  Entities are identified by their ID: two entities of the same type are equal if their IDs
+  are, and they hash by ID. Comparisons and membership tests therefore cost O(1) instead of
+  comparing every field, including nested entities.
+  """
+  __slots__ = ()
+
+  def __eq__(self, other):
+    if type(other) is not type(self):
+      return NotImplemented
+    return self.id == other.id
+
+  def __hash__(self):
+    return hash(self.id)
+
+def entity(cls):
+  """
+  Turns an Entity subclass into a dataclass whose instances store their fields in slots.
+
+  Slots avoid a `__dict__` per instance. The class is rebuilt with `__slots__` after the
+  dataclass is created, as `dataclass(slots=True)` does from Python 3.10 onwards.
+
+  Args:
+      cls (type): The class to decorate, a subclass of Entity.
+
+  Returns:
+      type: The decorated class.
+  """
+  cls = dataclass(eq=False)(cls)
+  names = tuple(f.name for f in fields(cls))
+  namespace = dict(cls.__dict__)
+  for name in names + ('__dict__', '__weakref__'):
+    namespace.pop(name, None) # Defaults live on in the generated __init__
+  namespace['__slots__'] = names
+  return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+def encode(entity: Entity) -> list:
+  """
+  Convert the field values of an entity to plain values, e.g. to store them.
+
+  Args:
+      entity (Entity): The entity to convert.
+
+  Returns:
+      list: The field values, with entities replaced by their IDs and dates by their ordinals.
+  """
+  values = []
+  for f in fields(entity):
+    value = getattr(entity, f.name)
+    if isinstance(value, Entity):
+      value = value.id
+    elif isinstance(value, date):
+      value = value.toordinal()
+    values.append(value)
+  return values
+
+def decode(cls: type, values, resolve) -> Entity:
+  """
+  Create an entity from field values converted by `encode`.
+
+  Args:
+      cls (type): The type of the entity.
+      values (Iterable): The converted field values.
+      resolve (Callable[[type, int], Entity]): Looks up a referenced entity by its type and ID.
+
+  Returns:
+      Entity: The new entity.
+  """
+  arguments = []
+  for (name, kind), value in zip(field_types(cls), values):
+    if isinstance(kind, type) and issubclass(kind, Entity):
+      value = resolve(kind, value)
+    elif kind is date:
+      value = date.fromordinal(value)
+    arguments.append(value)
+  return cls(*arguments)
+
+@lru_cache(maxsize=None)
+def field_types(cls: type):
+  """
+  Returns:
+      tuple[tuple[str, type], ...]: The name and type of each field of an entity class.
+  """
+  types = get_type_hints(cls)
+  return tuple((f.name, types[f.name]) for f in fields(cls))
@@ -1,2 +1,9 @@
 class RentalException(Exception):
-  pass
\ No newline at end of file
+  pass
+
+class ConflictException(RentalException):
+  """
+  Raised when an operation is rejected because what it read was changed concurrently.
+  Nothing has been changed by the operation, so it can be retried (see rental.versions.retry).
+  """
+  pass
@@ -0,0 +1,157 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+  import fcntl
+except ImportError: # Windows
+  fcntl = None
+  import msvcrt
+
+class Sequence:
+  """
+  Hands out the IDs of one kind of entity from the block it currently holds.
+
+  Attributes:
+      next (int): The next ID to hand out.
+      end (int): The ID after the last one of the block.
+      generation (int): The generation of the IdService the block was allocated in.
+  """
+
+  def __init__(self):
+    self.next = self.end = 0
+    self.generation = -1
+    self.lock = threading.Lock()
+
+class IdService:
+  """
+  Allocates unique identifiers (IDs), safely across threads and, given a file, across processes.
+
+  Each kind of entity has its own sequence with its own lock, so allocations of different
+  kinds do not contend. A sequence takes a block of `block` consecutive IDs at once from the
+  high-water mark, the highest ID allocated so far, and hands them out until the block is
+  exhausted. Only then does it take the shared lock again.
+
+  With a file, the high-water mark is kept in it and every process allocates its blocks under
+  an exclusive file lock, so processes sharing the file never allocate the same ID. The file
+  is written once per block, and since the mark covers whole blocks, a restart continues after
+  any ID which may have been handed out, at the cost of skipping the unused rest of the blocks.
+
+  Attributes:
+      path (str | None): The file holding the high-water mark, None to allocate within this process only.
+      block (int): The number of IDs a sequence takes at once.
+      high_water (int): The highest ID allocated by this service.
+  """
+
+  def __init__(self, path: str = None, block: int = 1):
+    """
+    Creates a new IdService.
+
+    Args:
+        path (str): The file holding the high-water mark, created if needed, or None to
+            allocate within this process only.
+        block (int): The number of IDs a sequence takes at once.
+    """
+    self.path = path
+    self.block = block
+    self.high_water = 0
+    self.generation = 0
+    self.sequences = {}
+    self.lock = threading.Lock()
+
+  @property
+  def current(self) -> int:
+    """
+    Returns:
+        int: The high-water mark, no ID above it has been handed out.
+    """
+    return self.high_water
+
+  def next(self, kind=None) -> int:
+    """
+    Returns:
+        int: The next ID of a kind of entity, e.g. its class.
+    """
+    return self.reserve(1, kind).start
+
+  def reserve(self, count: int, kind=None) -> range:
+    """
+    Reserve consecutive IDs of a kind of entity at once.
+
+    Args:
+        count (int): The number of IDs to reserve.
+        kind (Hashable): The kind of entity, e.g. its class, or None for the shared default sequence.
+
+    Returns:
+        range: The reserved IDs.
+    """
+    with self.lock:
+      sequence = self.sequences.get(kind)
+      if sequence == None:
+        sequence = self.sequences[kind] = Sequence()
+    with sequence.lock:
+      if sequence.generation != self.generation or sequence.end - sequence.next < count:
+        ids, sequence.generation = self.allocate(max(count, self.block))
+        sequence.next, sequence.end = ids.start, ids.stop
+      first = sequence.next
+      sequence.next += count
+      return range(first, first + count)
+
+  def allocate(self, count: int) -> tuple:
+    """
+    Raise the high-water mark by a block of IDs.
+
+    Args:
+        count (int): The number of IDs in the block.
+
+    Returns:
+        tuple[range, int]: The IDs of the block and the generation it belongs to.
+    """
+    with self.lock:
+      start = self.high_water
+      if self.path != None:
+        with self.locked() as fd:
+          os.lseek(fd, 0, os.SEEK_SET)
+          stored = os.read(fd, 32).strip()
+          start = max(start, int(stored) if stored else 0)
+          os.lseek(fd, 0, os.SEEK_SET)
+          os.write(fd, f'{start + count}\n'.encode())
+          os.ftruncate(fd, len(f'{start + count}\n'))
+          os.fsync(fd)
+      self.high_water = start + count
+      return range(start + 1, start + count + 1), self.generation
+
+  def set(self, id: int):
+    """
+    Set the high-water mark, e.g. after a restart from persistence. IDs are allocated after it.
+
+    Blocks held by the sequences are given up. The mark kept in the file is not lowered,
+    so IDs other processes may have handed out are never allocated again.
+
+    Args:
+        id (int): The new high-water mark.
+    """
+    with self.lock:
+      self.high_water = id
+      self.generation += 1
+
+  @contextmanager
+  def locked(self):
+    """
+    Open the file of the high-water mark and lock it exclusively.
+
+    Yields:
+        int: The file descriptor.
+    """
+    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+      if fcntl != None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+      else:
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+      yield fd
+    finally:
+      if fcntl == None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+      os.close(fd) # Releases the flock
@@ -0,0 +1,117 @@
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import date
+
+class IntervalIndex:
+  """
+  Indexes closed date intervals (e.g. booked periods) per key (e.g. per car).
+
+  The intervals of each key are kept in a list sorted by start date. Together with
+  the longest interval currently stored for the key, this bounds the part of the list
+  that can overlap a queried period: an overlap query costs O(log n + m), where m is the
+  number of intervals starting at most that many days before the end of the period.
+  This is O(log n + k) for k overlapping intervals as long as the intervals of a key have
+  similar lengths, but a single long interval widens the scanned window until it is removed.
+
+  Attributes:
+      intervals (dict[object, list[tuple[int, int, int]]]): Per key, the sorted
+          (start, end, id) tuples of the stored intervals, as date ordinals.
+      lengths (dict[object, Counter[int]]): Per key, the number of stored intervals of each length in days.
+      spans (dict[object, int]): Per key, the length in days of the longest stored interval.
+  """
+
+  def __init__(self):
+    """
+    Creates a new, empty IntervalIndex.
+    """
+    self.intervals = {}
+    self.lengths = {}
+    self.spans = {}
+
+  def add(self, key, id: int, period_start: date, period_end: date):
+    """
+    Add an interval to the index.
+
+    Args:
+        key (object): The key the interval belongs to, e.g. a car ID.
+        id (int): The ID of the entity occupying the interval, e.g. a booking ID.
+        period_start (date): The first day of the interval.
+        period_end (date): The last day of the interval.
+    """
+    start, end = period_start.toordinal(), period_end.toordinal()
+    insort(self.intervals.setdefault(key, []), (start, end, id))
+    self.lengths.setdefault(key, Counter())[end - start] += 1
+    self.spans[key] = max(self.spans.get(key, 0), end - start)
+
+  def remove(self, key, id: int, period_start: date, period_end: date):
+    """
+    Remove an interval from the index.
+
+    Args:
+        key (object): The key the interval belongs to.
+        id (int): The ID of the entity occupying the interval.
+        period_start (date): The first day of the interval.
+        period_end (date): The last day of the interval.
+
+    Raises:
+        KeyError: If the interval is not stored in the index.
+    """
+    entry = (period_start.toordinal(), period_end.toordinal(), id)
+    intervals = self.intervals.get(key, [])
+    i = bisect_left(intervals, entry)
+    if i == len(intervals) or intervals[i] != entry:
+      raise KeyError(f'No interval {period_start} - {period_end} for {id}')
+    del intervals[i]
+    if not intervals:
+      del self.intervals[key]
+      del self.lengths[key]
+      del self.spans[key]
+      return
+    lengths, length = self.lengths[key], entry[1] - entry[0]
+    lengths[length] -= 1
+    if not lengths[length]:
+      del lengths[length]
+      if length == self.spans[key]: # The longest interval is gone, narrow the window
+        self.spans[key] = max(lengths)
+
+  def overlapping(self, key, period_start: date, period_end: date):
+    """
+    Find the intervals of a key which overlap a period. Both ends are inclusive.
+
+    Args:
+        key (object): The key to search.
+        period_start (date): The first day of the period.
+        period_end (date): The last day of the period.
+
+    Returns:
+        list[int]: The IDs of the overlapping intervals, ordered by start date.
+    """
+    intervals = self.intervals.get(key, [])
+    start, end = period_start.toordinal(), period_end.toordinal()
+    # Intervals starting before `start - span` cannot reach `start`
+    lo = bisect_left(intervals, (start - self.spans.get(key, 0),))
+    hi = bisect_left(intervals, (end + 1,))
+    return [id for s, e, id in intervals[lo:hi] if e >= start]
+
+  def gaps(self, key, period_start: date, period_end: date):
+    """
+    Measure the idle days between a free period and its neighbouring intervals.
+
+    Assumes that the intervals of the key do not overlap each other or the period.
+
+    Args:
+        key (object): The key to search.
+        period_start (date): The first day of the period.
+        period_end (date): The last day of the period.
+
+    Returns:
+        tuple[int | None, int | None]: The number of free days before and after the period.
+        None if there is no interval before or after it, respectively.
+    """
+    intervals = self.intervals.get(key, [])
+    start, end = period_start.toordinal(), period_end.toordinal()
+    lo = bisect_left(intervals, (start,))
+    hi = bisect_left(intervals, (end + 1,))
+    before = start - intervals[lo - 1][1] - 1 if lo > 0 else None
+    after = intervals[hi][0] - end - 1 if hi < len(intervals) else None
+    return before, after
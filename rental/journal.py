@@ -0,0 +1,340 @@
+import json
+import os
+import threading
+from pathlib import Path
+from patterns.observer import Recorder, Subject, Change
+from rental import controller
+from rental.company import Company
+from rental.entity import encode, decode
+from rental.snapshot import Snapshot, write_snapshot
+from rental.legacy import load_legacy
+from rental.writer import GroupCommitWriter
+from rental.categories import Category
+from rental.customers import Customer
+from rental.cars import Car
+from rental.bookings import Booking
+from rental.rentals import Rental
+
+class Journal(Recorder):
+  """
+  Persists a company as a snapshot plus an append-only journal of the changes made since.
+
+  The journal is attached as a recorder to all collections of the company and appends one
+  line per change (additions, deletions, points and status changes), so that the cost of a
+  write is proportional to the change rather than to the company. Each record holds a
+  sequence number, the current ID of the controller, the collection, the kind of change and
+  the entity (all fields on additions, otherwise its ID), with references to other entities
+  stored as IDs and dates as ordinals.
+
+  `checkpoint` compacts the journal into a new snapshot (see rental.snapshot) once enough
+  records have accumulated. On recovery the latest snapshot is loaded, bookings and rentals
+  lazily, and the records after it are replayed. A torn last record, left by a crash while
+  appending, is discarded.
+
+  By default each record is written synchronously. With a durability window, records are
+  handed to a GroupCommitWriter instead, which commits the records of many changes at once
+  in the background; `wait_durable` waits until the changes made so far are on disk.
+
+  Attributes:
+      directory (Path): The directory holding the snapshot and the journal.
+      snapshot_every (int): The number of records after which `checkpoint` takes a snapshot.
+      sync (bool): Whether records are forced to disk (fsync), not just flushed.
+      window (float | None): The durability window of the group commits in seconds, None to write synchronously.
+      company (Company | None): The company being journaled.
+      seq (int): The sequence number of the last record.
+      pending (int): The number of records since the last snapshot.
+  """
+
+  SNAPSHOT = 'state.snap'
+  LEGACY_SNAPSHOT = 'state.data'
+  JOURNAL = 'journal.log'
+  COLLECTIONS = {'categories': Category, 'customers': Customer, 'cars': Car, 'bookings': Booking, 'rentals': Rental}
+
+  def __init__(self, directory: str = './persistence', snapshot_every: int = 1000, sync: bool = True, window: float = None):
+    """
+    Creates a new Journal, which is not attached to a company yet.
+
+    Args:
+        directory (str): The directory holding the snapshot and the journal.
+        snapshot_every (int): The number of records after which `checkpoint` takes a snapshot.
+        sync (bool): Whether records are forced to disk (fsync), not just flushed.
+        window (float): The durability window of the group commits in seconds, None to write
+            each record synchronously before the change proceeds.
+    """
+    self.directory = Path(directory)
+    self.snapshot_every = snapshot_every
+    self.sync = sync
+    self.window = window
+    self.writer = None
+    self.company = None
+    self.names = {}
+    self.seq = 0
+    self.pending = 0
+    self.file = None
+    self.loaded = None
+    self.lock = threading.RLock()
+
+  @property
+  def snapshot_path(self) -> Path:
+    return self.directory / self.SNAPSHOT
+
+  @property
+  def journal_path(self) -> Path:
+    return self.directory / self.JOURNAL
+
+  def recover(self):
+    """
+    Restore the persisted company and continue journaling its changes.
+
+    Loads the latest snapshot, replays the journal records after it and restores the current
+    ID of the controller. Companies pickled before the snapshot format existed are migrated,
+    see rental.legacy.
+
+    Returns:
+        Company | None: The recovered company, or None if nothing has been persisted.
+    """
+    with self.lock:
+      company, self.seq = None, 0
+      legacy = self.directory / self.LEGACY_SNAPSHOT
+      if self.loaded != None:
+        self.loaded.close()
+        self.loaded = None
+      if self.snapshot_path.exists():
+        self.loaded = Snapshot(str(self.snapshot_path)) # Kept open for the lazily loaded sections
+        company = self.loaded.load()
+        self.seq = self.loaded.metadata['seq']
+        controller.setId(self.loaded.metadata['current_id'])
+      elif legacy.exists():
+        with open(legacy, 'rb') as file:
+          company, id, self.seq = load_legacy(file)
+        controller.setId(id)
+      records = self.read()
+      if records and company == None:
+        raise ValueError(f'Journal {self.journal_path} has no snapshot to be replayed on')
+      self.pending = 0
+      if records:
+        self.replay(company, records)
+      if company != None:
+        self.watch(company)
+      return company
+
+  def read(self) -> list:
+    """
+    Read the journal records after the latest snapshot, discarding a torn last record.
+
+    Returns:
+        list[list]: The records in order.
+    """
+    records = []
+    valid = 0
+    if self.journal_path.exists():
+      with open(self.journal_path, 'rb') as file:
+        for line in file:
+          if not line.endswith(b'\n'):
+            break
+          try:
+            record = json.loads(line)
+          except ValueError:
+            break
+          valid += len(line)
+          if record[0] > self.seq:
+            records.append(record)
+      if valid < self.journal_path.stat().st_size:
+        print(f'Discarding torn journal record at byte {valid}')
+        os.truncate(self.journal_path, valid)
+    return records
+
+  def replay(self, company: Company, records: list):
+    """
+    Apply journal records to a company, notifying its observers but no recorders.
+
+    Args:
+        company (Company): The company to apply the records to.
+        records (list[list]): The records to apply, in order.
+    """
+    names = {name: getattr(company, name) for name in self.COLLECTIONS}
+    types = {kind: name for name, kind in self.COLLECTIONS.items()}
+
+    def resolve(kind: type, id: int):
+      return getattr(names[types[kind]], types[kind]).lookup(id)
+
+    with company.batch():
+      for seq, id, name, kind, payload, data in records:
+        controller.setId(max(controller.current_id, id))
+        self.seq = seq
+        self.pending += 1
+        if name == None:
+          continue
+        collection = names[name]
+        if kind == 'add':
+          entity = decode(self.COLLECTIONS[name], payload, resolve)
+          collection.insert(entity)
+        else:
+          entity = getattr(collection, name).lookup(payload)
+          if kind == 'delete':
+            collection.discard(entity)
+          elif kind == 'points':
+            entity.points += data
+          elif kind == 'status':
+            data = tuple(data)
+            entity.status = data[1]
+        collection.notify(Change(kind, entity, data))
+    print(f'Replayed {len(records)} journal records')
+
+  def attach(self, company: Company):
+    """
+    Journal the changes of a company from now on, starting with a snapshot of its current state.
+
+    Args:
+        company (Company): The company to journal, e.g. a newly created one.
+    """
+    with company.lock.read(), self.lock:
+      self.watch(company)
+      self.snapshot()
+
+  def watch(self, company: Company):
+    """
+    Attach the journal as a recorder to all collections of a company, replacing the previous one.
+
+    Args:
+        company (Company): The company to journal.
+    """
+    self.detach()
+    self.company = company
+    self.names = {getattr(company, name): name for name in self.COLLECTIONS}
+    for subject in self.names:
+      subject.recorders.append(self)
+
+  def detach(self):
+    """
+    Stop journaling the current company, if any.
+    """
+    for subject in self.names:
+      subject.recorders.remove(self)
+    self.company, self.names = None, {}
+
+  def record(self, subject: Subject, changes: tuple):
+    """
+    Append a record for each change of a collection to the journal.
+
+    Args:
+        subject (Subject): The collection that changed.
+        changes (tuple[Change, ...]): The changes, in order.
+    """
+    name = self.names[subject]
+    with self.lock:
+      self.append([[name, c.kind, encode(c.entity) if c.kind == 'add' else c.entity.id, c.data] for c in changes])
+
+  def set_id(self, id: int):
+    """
+    Set the current ID of the controller and journal it, e.g. when IDs are taken by entities
+    which were not created through the controller, such as imported ones.
+
+    Args:
+        id (int): The new current ID.
+    """
+    with self.lock:
+      controller.setId(id)
+      self.append([[None, 'id', None, None]])
+
+  def append(self, entries: list):
+    """
+    Number entries and append them to the journal.
+
+    Args:
+        entries (list[list]): The collection, kind, payload and data of each record.
+    """
+    lines = []
+    for entry in entries:
+      self.seq += 1
+      lines.append(json.dumps([self.seq, controller.current_id, *entry], separators=(',', ':')) + '\n')
+    self.pending += len(entries)
+    if self.writer == None and self.file == None:
+      self.directory.mkdir(parents=True, exist_ok=True)
+    if self.window != None:
+      if self.writer == None:
+        self.writer = GroupCommitWriter(str(self.journal_path), self.window, self.sync)
+      self.writer.write(''.join(lines), self.seq)
+      return
+    if self.file == None:
+      self.file = open(self.journal_path, 'a', encoding='utf-8')
+    self.file.write(''.join(lines))
+    self.file.flush()
+    if self.sync:
+      os.fsync(self.file.fileno())
+
+  def wait_durable(self, timeout: float = None) -> bool:
+    """
+    Wait until all changes journaled so far are on disk.
+
+    Args:
+        timeout (float): The maximum number of seconds to wait, or None to wait indefinitely.
+
+    Raises:
+        OSError: If writing the changes to disk failed.
+
+    Returns:
+        bool: True if the changes are durable, False if the timeout expired.
+    """
+    with self.lock:
+      writer, seq = self.writer, self.seq
+    return writer == None or writer.wait(seq, timeout)
+
+  def checkpoint(self) -> bool:
+    """
+    Take a snapshot if `snapshot_every` records have been written since the last one.
+
+    Call this between operations, when the company is in a consistent state.
+
+    Returns:
+        bool: True if a snapshot was taken.
+    """
+    # The company is locked first, operations hold it while they append records
+    with self.company.lock.read(), self.lock:
+      if self.pending < self.snapshot_every:
+        return False
+      self.snapshot()
+      return True
+
+  def snapshot(self):
+    """
+    Write a snapshot of the company and start a new, empty journal.
+
+    The snapshot is written to a temporary file and renamed, so that a crash leaves either the
+    old or the new snapshot. It holds the sequence number of the last record it includes, so
+    records left in the journal by a crash before it is emptied are skipped on recovery.
+    The company is locked for reading meanwhile, so that it is not changed while written.
+    """
+    with self.company.lock.read(), self.lock:
+      self.directory.mkdir(parents=True, exist_ok=True)
+      temporary = self.snapshot_path.with_suffix('.tmp')
+      with open(temporary, 'wb') as file:
+        write_snapshot(file, self.company, {'current_id': controller.current_id, 'seq': self.seq})
+        file.flush()
+        os.fsync(file.fileno())
+      if self.loaded != None and self.loaded.pending():
+        self.loaded.replace(str(temporary)) # Keeps loading the remaining sections, from the new file
+      else:
+        if self.loaded != None:
+          self.loaded.close()
+          self.loaded = None
+        os.replace(temporary, self.snapshot_path)
+      if self.writer != None:
+        self.writer.truncate(self.seq)
+      else:
+        if self.file != None:
+          self.file.close()
+        self.file = open(self.journal_path, 'w', encoding='utf-8')
+      self.pending = 0
+
+  def close(self):
+    """
+    Close the journal file, committing the records not written yet.
+    """
+    with self.lock:
+      if self.writer != None:
+        self.writer.close()
+        self.writer = None
+      if self.file != None:
+        self.file.close()
+        self.file = None
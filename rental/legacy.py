@@ -0,0 +1,159 @@
+import pickle
+from dataclasses import fields, MISSING
+from patterns.observer import Change
+from rental.company import Company
+from rental.entity import Entity, field_types
+from rental.categories import Category
+from rental.customers import Customer
+from rental.cars import Car
+from rental.bookings import Booking
+from rental.rentals import Rental
+
+# In the order they are restored, entities only reference entities restored before them
+COLLECTIONS = {'categories': Category, 'customers': Customer, 'cars': Car, 'bookings': Booking, 'rentals': Rental}
+
+class Legacy:
+  """
+  Stands in for a class of the rental packages while a legacy pickle is read, keeping whatever
+  the pickle stores for its instances: constructor arguments, state and items.
+
+  The classes have changed since such pickles were written (e.g. entities are slotted now and
+  collections are stored in registries), so their instances cannot be restored as they are.
+  """
+  module = None
+
+  def __init__(self, *args):
+    self.args = args
+
+  def __setstate__(self, state):
+    self.state = state
+
+  def __setitem__(self, key, value):
+    self.contents().append((key, value))
+
+  def append(self, item):
+    self.contents().append(item)
+
+  def extend(self, items):
+    self.contents().extend(items)
+
+  def contents(self) -> list:
+    if 'items' not in self.__dict__:
+      self.items = []
+    return self.items
+
+  def values(self) -> dict:
+    """
+    Returns:
+        dict: The attributes stored for the instance, from its `__dict__` and its slots.
+    """
+    state = self.__dict__.get('state')
+    if isinstance(state, tuple): # Slotted instances store a dict and the slot values
+      return {**(state[0] or {}), **(state[1] or {})}
+    return state if isinstance(state, dict) else {}
+
+  def children(self) -> list:
+    return [*self.__dict__.get('args', ()), self.__dict__.get('state'), *self.__dict__.get('items', ())]
+
+class LegacyUnpickler(pickle.Unpickler):
+  """
+  Reads a pickle with the classes of the rental packages replaced by Legacy stand-ins.
+  """
+
+  def __init__(self, file):
+    super().__init__(file)
+    self.standins = {}
+
+  def find_class(self, module: str, name: str):
+    if module.split('.')[0] not in ('rental', 'patterns'):
+      return super().find_class(module, name)
+    if (module, name) not in self.standins:
+      self.standins[module, name] = type(name, (Legacy,), {'module': module})
+    return self.standins[module, name]
+
+def entities(root) -> dict:
+  """
+  Find the entities reachable from a legacy object, wherever their collection stored them.
+
+  Args:
+      root (object): The object read from the pickle.
+
+  Returns:
+      dict[str, dict[int, Legacy]]: The entities of each collection, by ID.
+  """
+  names = {(cls.__module__, cls.__name__): name for name, cls in COLLECTIONS.items()}
+  found = {name: {} for name in COLLECTIONS}
+  seen = set()
+  stack = [root]
+  while stack:
+    value = stack.pop()
+    if id(value) in seen:
+      continue
+    seen.add(id(value))
+    if isinstance(value, Legacy):
+      name = names.get((value.module, type(value).__name__))
+      if name != None:
+        found[name][value.values()['id']] = value
+      stack.extend(value.children())
+    elif isinstance(value, dict):
+      stack.extend(value.keys())
+      stack.extend(value.values())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+      stack.extend(value)
+  return found
+
+def load_legacy(file):
+  """
+  Read a company pickled before the snapshot format existed and rebuild it.
+
+  The web app pickled `[company, current ID]`, and the first journal `[company, current ID,
+  sequence number]`. The classes have changed since, so the pickled objects are not restored
+  as they are. Instead, the entities are read from them field by field, and added to a new
+  company, notifying its observers, so that indexes and statistics are built as usual.
+  Fields added to an entity class since get their default value.
+
+  Args:
+      file (BinaryIO): The pickle file, open for reading in binary mode.
+
+  Raises:
+      ValueError: If the file does not hold a company, its bookings are stored in columns,
+          or a field without default value is missing.
+
+  Returns:
+      tuple[Company, int, int]: The company, the current ID and the sequence number of the
+          last journal record included, 0 if none is.
+  """
+  state = LegacyUnpickler(file).load()
+  if not isinstance(state, (list, tuple)) or not state or type(state[0]).__name__ != 'Company':
+    raise ValueError('Pickle does not hold a company')
+  legacy = state[0].values()
+  if legacy.get('columnar_bookings', False):
+    raise ValueError('Pickled bookings stored in columns cannot be migrated')
+  company = Company(legacy['name'])
+  found = entities(state[0])
+
+  def resolve(kind: type, value: Legacy):
+    name = next(n for n, c in COLLECTIONS.items() if c is kind)
+    return getattr(getattr(company, name), name).lookup(value.values()['id'])
+
+  with company.batch():
+    for name, cls in COLLECTIONS.items():
+      collection = getattr(company, name)
+      migrated = []
+      for id in sorted(found[name]):
+        values = found[name][id].values()
+        arguments = []
+        for f, (_, kind) in zip(fields(cls), field_types(cls)):
+          if f.name in values:
+            value = values[f.name]
+            arguments.append(resolve(kind, value) if isinstance(kind, type) and issubclass(kind, Entity) else value)
+          elif f.default is not MISSING:
+            arguments.append(f.default)
+          else:
+            raise ValueError(f'Pickled {cls.__name__} {id} lacks the field {f.name}')
+        entity = cls(*arguments)
+        collection.insert(entity)
+        migrated.append(entity)
+      if migrated:
+        collection.notify(*[Change('add', e) for e in migrated])
+  return company, state[1], state[2] if len(state) > 2 else 0
@@ -0,0 +1,183 @@
+from collections.abc import Sequence
+from operator import attrgetter
+
+class View(Sequence):
+  """
+  A read-only view of the entities of a registry at one version.
+
+  Views are immutable, so one view can be handed to any number of readers instead of a copy
+  each, and it stays consistent while the registry changes. It compares equal to lists and
+  tuples holding the same entities in the same order.
+
+  Attributes:
+      items (tuple): The entities in insertion order.
+      version (int): The version of the registry the view was taken at.
+  """
+  __slots__ = ('items', 'version')
+
+  def __init__(self, items: tuple, version: int):
+    self.items = items
+    self.version = version
+
+  def __getitem__(self, index):
+    return self.items[index]
+
+  def __len__(self):
+    return len(self.items)
+
+  def __iter__(self):
+    return iter(self.items)
+
+  def __eq__(self, other):
+    if isinstance(other, View):
+      return self.items == other.items
+    if isinstance(other, (list, tuple)):
+      return self.items == tuple(other)
+    return NotImplemented
+
+  __hash__ = None
+
+  def __repr__(self):
+    return f'View({list(self.items)!r})'
+
+class Registry:
+  """
+  Stores entities keyed by their ID.
+
+  Lookups and deletes by ID are O(1), while iteration keeps the order in which
+  entities were added (dicts preserve insertion order). Secondary indexes map an
+  attribute of the entities (e.g. the ID of a booking's customer) to all entities
+  sharing that value and are kept up to date on every add and remove.
+
+  Every add and remove raises the version. `values` hands out the same immutable View of
+  all entities until the version changes, so repeated reads do not copy the entities.
+
+  Attributes:
+      entities (dict[int, object]): The stored entities, keyed by ID.
+      keys (dict[str, attrgetter]): The key function of each secondary index.
+      indexes (dict[str, dict[object, dict[int, object]]]): The secondary indexes, by name.
+      version (int): The number of adds and removes so far.
+  """
+
+  def __init__(self, **indexes: str):
+    """
+    Creates a new, empty Registry.
+
+    Args:
+        **indexes (str): Secondary indexes to maintain, given as index name and
+            the (dotted) attribute path of the indexed value, e.g. `customer='customer.id'`.
+    """
+    self.entities = {}
+    self.keys = {name: attrgetter(path) for name, path in indexes.items()}
+    self.indexes = {name: {} for name in indexes}
+    self.version = 0
+    self.view = View((), 0)
+
+  def __len__(self):
+    return len(self.entities)
+
+  def __iter__(self):
+    return iter(self.entities.values())
+
+  def __contains__(self, entity):
+    """
+    Checks whether the given entity is stored in the registry.
+
+    Args:
+        entity (object): The entity to look for. It must have an `id` attribute.
+
+    Returns:
+        bool: True if an equal entity is stored under the entity's ID.
+    """
+    stored = self.lookup(getattr(entity, 'id', None))
+    return stored is not None and (stored is entity or stored == entity)
+
+  def add(self, entity):
+    """
+    Add an entity to the registry.
+
+    Args:
+        entity (object): The entity to add. It must have an `id` attribute.
+
+    Raises:
+        KeyError: If an entity with the same ID is already stored.
+    """
+    if entity.id in self.entities:
+      raise KeyError(f'Duplicate id {entity.id}')
+    keys = {name: key(entity) for name, key in self.keys.items()}
+    for value in keys.values():
+      hash(value) # Fail before anything is stored if a value cannot be indexed
+    self.entities[entity.id] = entity
+    for name, value in keys.items():
+      self.indexes[name].setdefault(value, {})[entity.id] = entity
+    self.version += 1
+
+  def remove(self, id):
+    """
+    Remove an entity by its ID.
+
+    Args:
+        id (int): The ID of the entity to remove.
+
+    Raises:
+        KeyError: If no entity with the given ID is stored.
+
+    Returns:
+        object: The removed entity.
+    """
+    entity = self.entities.pop(id)
+    self.version += 1
+    for name, key in self.keys.items():
+      index = self.indexes[name]
+      bucket = index[key(entity)]
+      del bucket[entity.id]
+      if not bucket:
+        del index[key(entity)]
+    return entity
+
+  def lookup(self, id):
+    """
+    Find an entity by its ID.
+
+    Args:
+        id (int): The ID of the entity to find.
+
+    Returns:
+        object | None: The entity with the specified ID, or None if there is none.
+    """
+    try:
+      return self.entities.get(id)
+    except TypeError: # Unhashable ids can never match
+      return None
+
+  def values(self) -> View:
+    """
+    Retrieve all entities in insertion order.
+
+    Costs O(1) unless entities were added or removed since the last call.
+
+    Returns:
+        View: A read-only view of all entities at the current version.
+    """
+    view = self.view
+    if view.version != self.version:
+      view = self.view = View(tuple(self.entities.values()), self.version)
+    return view
+
+  def find(self, index: str, key):
+    """
+    Find all entities with the given value in a secondary index.
+
+    Costs time proportional to the number of entities found.
+
+    Args:
+        index (str): The name of the secondary index.
+        key (object): The indexed value to look for.
+
+    Returns:
+        list[object]: The matching entities in insertion order (empty if there are none).
+    """
+    try:
+      return list(self.indexes[index].get(key, {}).values())
+    except TypeError: # Unhashable keys can never match
+      return []
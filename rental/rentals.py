@@ -1,15 +1,18 @@
-from dataclasses import dataclass, field
-from patterns.observer import Subject
+from dataclasses import field
+from rental.entity import Entity, entity
+from patterns.observer import Subject, Change
 from rental import controller
 from rental.exceptions import RentalException
-from rental.company import Company
+from rental.company import Company, reads, writes, transactional
+from rental.registry import Registry
+from rental.intervals import IntervalIndex
 from rental.cars import Car
 from rental.bookings import Booking
 from rental.categories import Categories
 from datetime import date
 
-@dataclass
-class Rental:
+@entity
+class Rental(Entity):
   """
   Represents an ongoing rental associated with a booking and a car.
 
@@ -27,98 +30,115 @@ class Rentals(Subject):
   Manages a collection of rentals.
 
   Attributes:
-      rentals (list[Rental]): List that stores the Rental instances.
+      rentals (Registry): Registry that stores the Rental instances by ID.
+      periods (IntervalIndex): The rented periods of each car, keyed by car ID.
       company (Company): The rental company associated with the rentals.
   """
 
   def __init__(self, company: Company):
     """
     Creates a new Rentals instance for a given company.
-    The list of rentals is initially empty.
+    The collection of rentals is initially empty.
 
     Args:
         company (Company): The rental company associated with the rentals.
     """
     super().__init__()
-    self.rentals: list[Rental] = []
+    self.rentals = Registry(booking='booking.id', car='car.id', customer='booking.customer.id')
+    self.periods = IntervalIndex()
     self.company = company
 
+  @reads
   def get(self):
     """
     Retrieves all rentals in the collection.
 
-    Returns a copy of the internal list of rentals to prevent modifications to the original list.
+    Returns a read-only view of the rentals, shared between calls until rentals are added or removed.
 
     Returns:
-        list[Rental]: Copy of the list of all rentals.
+        View[Rental]: Snapshot view of all rentals.
     """
-    return self.rentals.copy()
+    return self.rentals.values()
 
+  @transactional
   def add(self, booking_id: int):
     """
     Add a rental to the collection.
 
-    Creates a new Rental instance based on the ID of the booking and adds it to the internal list of rentals. 
+    Creates a new Rental instance based on the ID of the booking and adds it to the internal registry of rentals. 
     This represents a customer trying to pick up a car for the given booking.
 
+    The rental and the points it earns are determined with the company locked for reading only.
+    It is added if neither the booking, its car nor its customer has changed meanwhile. Both
+    steps run in one database transaction if the company is stored in a database.
+
     Args:
         booking_id (int): The ID of the booking.
 
     Raises:
         RentalException: If the start date of the booking does not concide with today's date.
         RentalException: If a booking is for a specific car and that car is already rented.
+        ConflictException: If the booking, its car or its customer changed while the rental was validated.
 
     Returns:
         Rental: The newly created Rental instance, added to the list.
     """
     # NOTE: Could allow
     #         * a different period_start and period_end, e.g. if a sub-period of the original one
-    booking = self.company.bookings.find_by_id(booking_id)
-    car = booking.car
-    period_start = booking.period_start
-    period_end = booking.period_end
-    rental = None
-    if controller.today != period_start:
-      raise RentalException(f'A car can only be picked up on the start-date of the booking ({period_start}). But today is {controller.today}')
-    rentals_for_car = [r for r in self.rentals if r.car.id == car.id]
-    for r in rentals_for_car:
-      if (max(period_start, period_end) >= min(r.booking.period_start, r.booking.period_end) and 
-          min(period_start, period_end) <= max(r.booking.period_start, r.booking.period_end)):
+    with self.company.lock.read():
+      booking = self.company.bookings.find_by_id(booking_id)
+      car = booking.car
+      period_start = booking.period_start
+      period_end = booking.period_end
+      rental = None
+      if controller.today != period_start:
+        raise RentalException(f'A car can only be picked up on the start-date of the booking ({period_start}). But today is {controller.today}')
+      if self.periods.overlapping(car.id, min(period_start, period_end), max(period_start, period_end)):
         raise RentalException(f'Car {car.getLabel()} cannot be rented for period {period_start} - {period_end}, because it has already been rented.')
-    rental = Rental(controller.nextId(), booking, car)
-    assert(rental != None) # Should always hold
-    print(f'Adding {rental}')
-    self.rentals.append(rental)
-    new_points = self.calculate_points(booking.customer.id, car.id, period_start, period_end)
-    print(f'Points {new_points}')
-    self.company.customers.add_points(booking.customer.id, new_points)
-    self.notify()
+      new_points = self.calculate_points(booking.customer.id, car.id, period_start, period_end)
+      observed = self.company.versions.read(booking, car, booking.customer)
+
+    with self.company.batch():
+      self.company.versions.check(observed)
+      rental = Rental(controller.nextId(Rental), booking, car)
+      assert(rental != None) # Should always hold
+      print(f'Adding {rental}')
+      self.insert(rental)
+      self.notify(Change('add', rental))
+      print(f'Points {new_points}')
+      self.company.customers.add_points(booking.customer.id, new_points)
     return rental
   
+  @transactional
   def add_with_upgrades(self, booking_id: int):
-    booking = self.company.bookings.find_by_id(booking_id)
-    period_start = booking.period_start
-    period_end = booking.period_end
+    with self.company.lock.read():
+      booking = self.company.bookings.find_by_id(booking_id)
+      period_start = booking.period_start
+      period_end = booking.period_end
+      observed = self.company.versions.read(booking, booking.customer)
     rental = None
 
     if controller.today != period_start:
       raise RentalException(f'A car can only be picked up on the start-date of the booking ({period_start}). But today is {controller.today}')
     
-    car = self.company.cars.add("special_upgrade2", "silver", "FF")
-
-    new_booking = self.company.bookings.add(booking.customer.id, period_start, period_end, car.id)
-    rental = Rental(controller.nextId(), new_booking, car)
-    assert(rental != None) # Should always hold
-    print(f'Adding {rental}')
-    self.rentals.append(rental)
-    new_points = self.calculate_points(booking.customer.id, car.id, period_start, period_end)
-    print(f'Points {new_points}')
-    self.company.customers.subtract_points(booking.customer.id, new_points)
-    self.company.bookings.delete(booking.id)
-    self.notify()
+    with self.company.batch():
+      self.company.versions.check(observed)
+      car = self.company.cars.add("special_upgrade2", "silver", "FF")
+
+      new_booking = self.company.bookings.add(booking.customer.id, period_start, period_end, car.id)
+      rental = Rental(controller.nextId(Rental), new_booking, car)
+      assert(rental != None) # Should always hold
+      print(f'Adding {rental}')
+      self.insert(rental)
+      self.notify(Change('add', rental))
+      new_points = self.calculate_points(booking.customer.id, car.id, period_start, period_end)
+      print(f'Points {new_points}')
+      self.company.customers.subtract_points(booking.customer.id, new_points)
+      self.company.bookings.delete(booking.id)
     return rental
   
   
+  @writes
   def delete(self, id: int):
     """
     Delete a rental from the collection by its ID.
@@ -131,14 +151,48 @@ class Rentals(Subject):
     """
     rental = self.find_by_id(id)
     print(f'Deleting {rental}')
-    self.rentals.remove(rental)
-    self.notify()
+    self.discard(rental)
+    self.notify(Change('delete', rental))
+
+  def insert(self, rental: Rental):
+    """
+    Store a rental in the registry and record its period as rented.
+
+    Args:
+        rental (Rental): The rental to store.
+    """
+    self.rentals.add(rental)
+    self.periods.add(rental.car.id, rental.id, *self.period_of(rental))
+
+  def discard(self, rental: Rental):
+    """
+    Remove a rental from the registry and release its period, without notifying observers.
+
+    Args:
+        rental (Rental): The rental to remove.
+    """
+    self.rentals.remove(rental.id)
+    self.periods.remove(rental.car.id, rental.id, *self.period_of(rental))
+
+  def period_of(self, rental: Rental):
+    """
+    Determine the rented period of a rental.
 
+    Args:
+        rental (Rental): The rental.
+
+    Returns:
+        tuple[date, date]: The first and the last day of the rental.
+    """
+    period_start, period_end = rental.booking.period_start, rental.booking.period_end
+    return min(period_start, period_end), max(period_start, period_end)
+
+  @reads
   def find_by_id(self, id: int):
     """
     Find a rental by its ID.
 
-    Searches the collection for a rental with the specified ID.
+    Looks up the rental with the specified ID in the registry.
 
     Args:
         id (int): The ID of the rental to find.
@@ -149,12 +203,12 @@ class Rentals(Subject):
     Returns:
         Rental: The Rental instance with the specified ID.
     """
-    rentals = [r for r in self.rentals if r.id == id]
-    assert len(rentals) <= 1, 'Unexpectedly found multiple bookings with id {id}'
-    if rentals == []:
-      raise RentalException(f"Couldn't find rental with id {id}")    
-    return rentals[0]
+    rental = self.rentals.lookup(id)
+    if rental == None:
+      raise RentalException(f"Couldn't find rental with id {id}")
+    return rental
   
+  @reads
   def find_by_booking_id(self, booking_id: int):
     """
     Find a rental by its booking ID.
@@ -171,12 +225,13 @@ class Rentals(Subject):
         Rental | None: Returns the Rental instance that is associated with the specified booking ID. 
         If no rental is found that matches the booking ID, None is returned. 
     """
-    rentals = [r for r in self.rentals if r.booking.id == booking_id]
+    rentals = self.rentals.find('booking', booking_id)
     assert len(rentals) <= 1, 'Unexpectedly found multiple bookings with id {id}'
     if rentals == []:
       return None
     return rentals[0]
   
+  @reads
   def calculate_points(self, id: int, car_id: int, period_start: date, period_end: date):
     points = 0
     multiplier_exp = 0
@@ -209,6 +264,7 @@ class Rentals(Subject):
 
     return points
 
+  @reads
   def find_by_customer_id(self, customer_id: int):
     """
     Find a rental by its customer ID.
@@ -221,4 +277,17 @@ class Rentals(Subject):
     Returns:
         list[Rental]: Returns the Rental instance made by the specified customer ID.
     """
-    return [r for r in self.rentals if r.booking.customer.id == customer_id]
+    return self.rentals.find('customer', customer_id)
+
+  @reads
+  def find_by_car_id(self, car_id: int):
+    """
+    Find the rentals of a car.
+
+    Args:
+        car_id (int): The ID of the rented car.
+
+    Returns:
+        list[Rental]: The rentals of the specified car.
+    """
+    return self.rentals.find('car', car_id)
@@ -0,0 +1,312 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import ExitStack
+from dataclasses import fields, MISSING
+from patterns.observer import Change
+from rental.company import Company
+from rental.entity import encode, decode
+from rental.categories import Category
+from rental.customers import Customer
+from rental.cars import Car
+from rental.bookings import Booking
+from rental.rentals import Rental
+
+MAGIC = b'RENTSNAP'
+VERSION = 1
+HEADER = struct.Struct('>8sHH') # Magic, version, number of sections
+ENTRY = struct.Struct('>16sQQQ') # Section name, offset, length in bytes, number of entities
+
+COLLECTIONS = {'categories': Category, 'customers': Customer, 'cars': Car, 'bookings': Booking, 'rentals': Rental}
+EAGER = ('categories', 'customers', 'cars')
+LAZY = {'bookings': ('bookings', 'periods', 'category_periods'), 'rentals': ('rentals', 'periods')}
+
+def write_snapshot(file, company: Company, metadata: dict):
+  """
+  Write a company to a file in the snapshot format.
+
+  The file starts with a header (magic, format version and number of sections) followed by a
+  table with the name, offset, length and entity count of each section. The 'company' section
+  holds the metadata as JSON. Each collection has a section listing the names of the entity
+  fields as JSON, followed by one JSON line with the field values of each entity. Sections
+  of collections which have not been loaded from a previous snapshot yet are copied verbatim.
+
+  Args:
+      file (BinaryIO): The file to write to, open for writing in binary mode.
+      company (Company): The company to write.
+      metadata (dict): JSON-serializable values to store along, e.g. the current ID.
+  """
+  sections = [('company', json.dumps({'name': company.name, 'columnar_bookings': company.columnar_bookings, **metadata}).encode() + b'\n', 0)]
+  for name, cls in COLLECTIONS.items():
+    registry = getattr(getattr(company, name), name)
+    if isinstance(registry, Lazy) and not registry.section.loaded:
+      sections.append((name, registry.section.snapshot.raw(name), registry.section.snapshot.count(name)))
+      continue
+    lines = [json.dumps([f.name for f in fields(cls)])]
+    lines.extend(json.dumps(encode(entity), separators=(',', ':')) for entity in registry)
+    sections.append((name, ('\n'.join(lines) + '\n').encode(), len(registry)))
+
+  offset = HEADER.size + ENTRY.size * len(sections)
+  file.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+  for name, data, count in sections:
+    file.write(ENTRY.pack(name.encode(), offset, len(data), count))
+    offset += len(data)
+  for _, data, _ in sections:
+    file.write(data)
+
+class Snapshot:
+  """
+  Reads a snapshot file, memory-mapped so that sections are only read when they are loaded.
+
+  Attributes:
+      path (str): The path of the snapshot file.
+      version (int): The format version of the file.
+      sections (dict[str, tuple[int, int, int]]): The offset, length and entity count of each section.
+      metadata (dict): The metadata stored with the company.
+      lazy (list[LazySection]): The sections of the loaded company which are loaded on first access.
+  """
+
+  def __init__(self, path: str):
+    """
+    Opens a snapshot file and reads its header and offsets table.
+
+    Args:
+        path (str): The path of the snapshot file.
+
+    Raises:
+        ValueError: If the file is not a snapshot or has a newer format version.
+    """
+    self.path = path
+    self.lazy = []
+    self.open()
+
+  def open(self):
+    """
+    Map the file and read its header and offsets table.
+
+    Raises:
+        ValueError: If the file is not a snapshot or has a newer format version.
+    """
+    path = self.path
+    self.file = open(path, 'rb')
+    self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, self.version, count = HEADER.unpack_from(self.map, 0)
+    if magic != MAGIC or self.version > VERSION:
+      self.close()
+      if magic != MAGIC:
+        raise ValueError(f'{path} is not a snapshot')
+      raise ValueError(f'Snapshot format version {self.version} of {path} is not supported')
+    self.sections = {}
+    for i in range(count):
+      name, offset, length, entities = ENTRY.unpack_from(self.map, HEADER.size + i * ENTRY.size)
+      self.sections[name.rstrip(b'\0').decode()] = (offset, length, entities)
+    self.metadata = json.loads(self.raw('company'))
+
+  def raw(self, name: str) -> bytes:
+    """
+    Returns:
+        bytes: The data of a section.
+    """
+    offset, length, _ = self.sections[name]
+    return self.map[offset:offset + length]
+
+  def count(self, name: str) -> int:
+    """
+    Returns:
+        int: The number of entities in a section, 0 if there is no such section.
+    """
+    return self.sections.get(name, (0, 0, 0))[2]
+
+  def rows(self, name: str, cls: type):
+    """
+    Read the entities of a section as field values in the order of the fields of their class.
+
+    Fields are matched by name, so fields added to the class since the snapshot was written get
+    their default value and fields removed from it are skipped.
+
+    Args:
+        name (str): The name of the section.
+        cls (type): The class of the entities.
+
+    Raises:
+        ValueError: If a field without default value is missing in the section.
+
+    Yields:
+        list: The field values of each entity.
+    """
+    if name not in self.sections:
+      return
+    offset, length, _ = self.sections[name]
+    end = offset + length
+    # Track the position locally, loading a section may load another one while iterating
+    newline = self.map.find(b'\n', offset, end)
+    stored = json.loads(self.map[offset:newline])
+    columns = []
+    for f in fields(cls):
+      if f.name in stored:
+        columns.append((stored.index(f.name), None))
+      elif f.default is not MISSING:
+        columns.append((None, f.default))
+      else:
+        raise ValueError(f'Snapshot section {name} lacks the field {f.name}')
+    position = newline + 1
+    while position < end:
+      newline = self.map.find(b'\n', position, end)
+      values = json.loads(self.map[position:newline])
+      position = newline + 1
+      yield [values[i] if i != None else default for i, default in columns]
+
+  def load(self) -> Company:
+    """
+    Create the company of the snapshot.
+
+    The categories, customers and cars are loaded right away. Bookings and rentals are only
+    loaded when they are first accessed; until then their observers have been told how many
+    there are, by 'add' changes without entities.
+
+    Returns:
+        Company: The company.
+    """
+    company = Company(self.metadata['name'], self.metadata.get('columnar_bookings', False))
+
+    def resolve(kind: type, id: int):
+      name = next(n for n, c in COLLECTIONS.items() if c is kind)
+      return getattr(getattr(company, name), name).lookup(id)
+
+    with company.batch():
+      for name in EAGER:
+        collection = getattr(company, name)
+        entities = [decode(COLLECTIONS[name], row, resolve) for row in self.rows(name, COLLECTIONS[name])]
+        for entity in entities:
+          collection.insert(entity)
+        if entities:
+          collection.notify(*[Change('add', e) for e in entities])
+      for name, attributes in LAZY.items():
+        collection = getattr(company, name)
+        if self.count(name):
+          collection.notify(*[Change('add')] * self.count(name))
+        section = LazySection(self, name, collection, resolve)
+        self.lazy.append(section)
+        for attribute in attributes:
+          setattr(collection, attribute, Lazy(section, attribute))
+    return company
+
+  def replace(self, path: str):
+    """
+    Replace the snapshot file by a newer one holding the sections not loaded yet as well, and
+    load those from the new file from now on.
+
+    The file is closed while it is replaced, as a mapped file cannot be replaced on Windows.
+
+    Args:
+        path (str): The path of the new snapshot file, moved to the path of this one.
+    """
+    with ExitStack() as stack:
+      # Loading rentals loads the bookings they reference, so their locks are taken in that order
+      for section in reversed(self.lazy):
+        stack.enter_context(section.lock)
+      self.close()
+      os.replace(path, self.path)
+      self.open()
+
+  def pending(self) -> bool:
+    """
+    Returns:
+        bool: True if sections of the loaded company have not been loaded yet.
+    """
+    return any(not section.loaded for section in self.lazy)
+
+  def close(self):
+    """
+    Close the file. Sections not loaded yet can no longer be loaded.
+    """
+    self.map.close()
+    self.file.close()
+
+class LazySection:
+  """
+  Loads a section of a snapshot into its collection when the collection is first accessed.
+
+  Attributes:
+      snapshot (Snapshot): The snapshot holding the section.
+      name (str): The name of the section and of the collection.
+      collection (Subject): The collection to load the entities into.
+      originals (dict[str, object]): The empty storage of the collection (e.g. its registry),
+          replaced by Lazy stand-ins until the section is loaded.
+      loaded (bool): Whether the section has been loaded.
+  """
+
+  def __init__(self, snapshot: Snapshot, name: str, collection, resolve):
+    """
+    Creates a new LazySection.
+
+    Args:
+        snapshot (Snapshot): The snapshot holding the section.
+        name (str): The name of the section and of the collection.
+        collection (Subject): The collection to load the entities into.
+        resolve (Callable[[type, int], Entity]): Looks up a referenced entity by its type and ID.
+    """
+    self.snapshot = snapshot
+    self.name = name
+    self.collection = collection
+    self.resolve = resolve
+    self.originals = {attribute: getattr(collection, attribute) for attribute in LAZY[name]}
+    self.loaded = False
+    self.lock = threading.RLock()
+
+  def load(self):
+    """
+    Insert the entities of the section into the storage of the collection, without notifying
+    observers, which already know about them, and then restore the storage.
+
+    Sections are loaded by readers, which run concurrently. Until the storage is complete the
+    stand-ins stay in place, so other readers wait for the load rather than seeing part of it.
+    """
+    with self.lock:
+      if self.loaded:
+        return
+      self.loaded = True # Inserting accesses the stand-ins, which then pass on to the originals
+      cls = COLLECTIONS[self.name]
+      for row in self.snapshot.rows(self.name, cls):
+        self.collection.insert(decode(cls, row, self.resolve))
+      for attribute, original in self.originals.items():
+        setattr(self.collection, attribute, original)
+      print(f'Loaded {self.snapshot.count(self.name)} {self.name} from snapshot')
+
+class Lazy:
+  """
+  Stands in for the storage of a collection (e.g. its registry) until its section is loaded.
+  Any access loads the section and is then passed on to the real storage.
+
+  Attributes:
+      section (LazySection): The section to load.
+      attribute (str): The name of the attribute of the collection this stands in for.
+  """
+
+  def __init__(self, section: LazySection, attribute: str):
+    self.section = section
+    self.attribute = attribute
+
+  def target(self):
+    """
+    Returns:
+        object: The real storage, after loading the section.
+    """
+    self.section.load()
+    return self.section.originals[self.attribute]
+
+  def __getattr__(self, name):
+    if name.startswith('__') or name in ('section', 'attribute'):
+      raise AttributeError(name)
+    return getattr(self.target(), name)
+
+  def __len__(self):
+    return len(self.target())
+
+  def __iter__(self):
+    return iter(self.target())
+
+  def __contains__(self, entity):
+    return entity in self.target()
@@ -1,37 +1,159 @@
-from patterns.observer import Observer
+from __future__ import annotations
+from patterns.observer import Observer, Recorder, Change
 from rental.bookings import Bookings
 from rental.cars import Cars
 from rental.customers import Customers
 from rental.rentals import Rentals
 from rental.company import Company
 
-class BookingStats(Observer):
-  def update(self, b: Bookings) -> None:
-    print(f'*** STATISTICS ***: Number of Bookings: {len(b.bookings)}')
+class CountStats(Observer, Recorder):
+  """
+  Maintains the number of entities of a collection from the 'add' and 'delete' changes.
 
-class CarStats(Observer):
-  def update(self, c: Cars) -> None:
-    print(f'*** STATISTICS ***: Number of Cars: {len(c.cars)}')
+  The statistics are recorders, so they count every change as it is made, even if updates
+  are coalesced or dropped by a dispatcher. As observers, they print on each update.
 
-class CustomerStats(Observer):
-  def update(self, k: Customers) -> None:
-    print(f'*** STATISTICS ***: Number of Customers: {len(k.customers)}')
+  Attributes:
+      label (str): What is counted, used when printing.
+      count (int): The current number of entities.
+  """
+  label = 'Entities'
+
+  def __init__(self):
+    self.count = 0
+
+  def record(self, subject, changes: tuple[Change, ...]) -> None:
+    for change in changes:
+      if change.kind == 'add':
+        self.count += 1
+      elif change.kind == 'delete':
+        self.count -= 1
+
+  def update(self, subject) -> None:
+    print(f'*** STATISTICS ***: Number of {self.label}: {self.count}')
+
+class BookingStats(CountStats):
+  label = 'Bookings'
+
+class CarStats(CountStats):
+  """
+  Maintains the number of cars, in total and per category.
+
+  Attributes:
+      categories (dict[object, int]): The number of cars per category.
+  """
+  label = 'Cars'
+
+  def __init__(self):
+    super().__init__()
+    self.categories = {}
+
+  def record(self, c: Cars, changes: tuple[Change, ...]) -> None:
+    for change in changes:
+      category = getattr(change.entity, 'category', None)
+      if change.kind == 'add':
+        self.categories[category] = self.categories.get(category, 0) + 1
+      elif change.kind == 'delete':
+        self.categories[category] -= 1
+        if self.categories[category] == 0:
+          del self.categories[category]
+    super().record(c, changes)
+
+class CustomerStats(CountStats):
+  label = 'Customers'
+
+class CustomerPointsStats(Observer, Recorder):
+  """
+  Maintains the points of all customers: their sum and the number of customers per status.
+
+  Each change is reconciled against the last known points and status of the customer,
+  so repeated changes are applied exactly once, in O(1) per change. Like CountStats, this
+  records every change and prints on each update.
+
+  Attributes:
+      count (int): The current number of customers.
+      points (int): The sum of the points of all customers.
+      tiers (dict[str, int]): The number of customers per status.
+      known (dict[int, tuple[int, str]]): The last known points and status of each customer, by ID.
+  """
+
+  def __init__(self):
+    self.count = 0
+    self.points = 0
+    self.tiers = {}
+    self.known = {}
+
+  def average(self) -> float:
+    """
+    Returns:
+        float: The average points of the customers, 0 if there are none.
+    """
+    return self.points / self.count if self.count else 0
+
+  def record(self, k: Customers, changes: tuple[Change, ...]) -> None:
+    for change in changes:
+      customer = change.entity
+      if customer == None:
+        continue
+      if customer.id in self.known:
+        self.forget(customer.id)
+      if change.kind != 'delete':
+        self.remember(customer)
+
+  def remember(self, customer) -> None:
+    self.known[customer.id] = (customer.points, customer.status)
+    self.count += 1
+    self.points += customer.points
+    self.tiers[customer.status] = self.tiers.get(customer.status, 0) + 1
+
+  def forget(self, id: int) -> None:
+    points, status = self.known.pop(id)
+    self.count -= 1
+    self.points -= points
+    self.tiers[status] -= 1
+    if self.tiers[status] == 0:
+      del self.tiers[status]
 
-class CustomerPointsStats(Observer):
   def update(self, k: Customers) -> None:
-    sum = 0
-    for client in k.customers:
-      sum += k.get_points(client.id)
-    print(f'*** STATISTICS ***: Customer average points: {sum/len(k.customers)}')
+    print(f'*** STATISTICS ***: Customer average points: {self.average()}')
 
-class RentalStats(Observer):
-  def update(self, r: Rentals) -> None:
-    print(f'*** STATISTICS ***: Number of Rentals: {len(r.rentals)}')
+class RentalStats(CountStats):
+  label = 'Rentals'
+
+# The collection each statistic is maintained from, by name
+SUBJECTS = {'bookings': 'bookings', 'cars': 'cars', 'customers': 'customers', 'points': 'customers', 'rentals': 'rentals'}
 
 def attachTo(company: Company):
-  company.bookings.attach(BookingStats())
-  company.cars.attach(CarStats())
-  company.customers.attach(CustomerStats())
-  company.customers.attach(CustomerPointsStats())
-  company.rentals.attach(RentalStats())
-  # TODO Register more observer classes here ...
\ No newline at end of file
+  """
+  Attach the statistics to the collections of a company, as observers and recorders.
+
+  Args:
+      company (Company): The company, whose collections are still empty.
+
+  Returns:
+      dict[str, Observer]: The attached statistics, by name.
+  """
+  stats = {
+    'bookings': BookingStats(),
+    'cars': CarStats(),
+    'customers': CustomerStats(),
+    'points': CustomerPointsStats(),
+    'rentals': RentalStats(),
+  }
+  for name, stat in stats.items():
+    getattr(company, SUBJECTS[name]).attach(stat)
+  # TODO Register more observer classes here ...
+  recordTo(company, stats)
+  return stats
+
+def recordTo(company: Company, stats: dict):
+  """
+  Attach statistics to the collections of a company as recorders, e.g. again after unpickling,
+  as recorders are not pickled with the collections.
+
+  Args:
+      company (Company): The company.
+      stats (dict[str, Observer]): The statistics, by name.
+  """
+  for name, stat in stats.items():
+    getattr(company, SUBJECTS[name]).recorders.append(stat)
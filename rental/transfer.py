@@ -0,0 +1,298 @@
+"""
+Streams the entities of a company to and from CSV or JSON Lines files.
+
+Usage:
+    python -m rental.transfer export DIRECTORY [--format csv|jsonl] [--persistence DIR | --database FILE]
+    python -m rental.transfer import DIRECTORY [--format csv|jsonl] [--persistence DIR | --database FILE]
+                                               [--company NAME] [--chunk-size N]
+
+Each collection is written to its own file in the directory, e.g. `bookings.jsonl`, with one
+row per entity. References to other entities are written as their IDs and dates in ISO format.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from dataclasses import fields
+from datetime import date
+from itertools import islice
+from pathlib import Path
+from patterns.observer import Change
+from rental import controller
+from rental.company import Company
+from rental.entity import Entity, field_types
+from rental.exceptions import RentalException
+from rental.categories import Category
+from rental.customers import Customer
+from rental.cars import Car
+from rental.bookings import Booking
+from rental.rentals import Rental
+
+COLLECTIONS = {'categories': Category, 'customers': Customer, 'cars': Car, 'bookings': Booking, 'rentals': Rental}
+FORMATS = ('csv', 'jsonl')
+# Fields declared as str which hold category IDs (or names, in older data)
+CATEGORY_FIELDS = {'category'}
+
+class Progress:
+  """
+  Reports the number of processed rows and the throughput while transferring a collection.
+
+  Attributes:
+      label (str): What is processed, e.g. 'Imported bookings'.
+      interval (float): The minimum number of seconds between two reports.
+      count (int): The number of rows processed so far.
+  """
+
+  def __init__(self, label: str, interval: float = 1.0, out=sys.stderr):
+    self.label = label
+    self.interval = interval
+    self.out = out
+    self.count = 0
+    self.start = self.reported = time.monotonic()
+
+  def advance(self, rows: int = 1) -> None:
+    """
+    Count processed rows and report them if the interval has passed.
+
+    Args:
+        rows (int): The number of rows processed since the last call.
+    """
+    self.count += rows
+    now = time.monotonic()
+    if now - self.reported >= self.interval:
+      self.reported = now
+      self.report(now)
+
+  def done(self) -> int:
+    """
+    Report the final count and throughput.
+
+    Returns:
+        int: The number of processed rows.
+    """
+    self.report(time.monotonic())
+    return self.count
+
+  def report(self, now: float) -> None:
+    elapsed = max(now - self.start, 1e-9)
+    print(f'{self.label}: {self.count} rows ({self.count / elapsed:.0f} rows/s)', file=self.out)
+
+def chunks(iterable, size: int):
+  """
+  Split an iterable into lists of at most `size` items, without reading ahead further.
+
+  Yields:
+      list: The next chunk.
+  """
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
+
+def to_row(entity: Entity) -> dict:
+  """
+  Returns:
+      dict: The fields of an entity by name, with entities replaced by their IDs and dates by ISO strings.
+  """
+  row = {}
+  for f in fields(entity):
+    value = getattr(entity, f.name)
+    if isinstance(value, Entity):
+      value = value.id
+    elif isinstance(value, date):
+      value = value.isoformat()
+    row[f.name] = value
+  return row
+
+def from_row(company: Company, cls: type, row: dict, typed: bool) -> Entity:
+  """
+  Create an entity from a row written by `to_row`, resolving references in a company.
+
+  Args:
+      company (Company): The company holding the referenced entities.
+      cls (type): The type of the entity.
+      row (dict): The fields of the entity by name.
+      typed (bool): Whether the values are typed (JSON) or all strings (CSV).
+
+  Raises:
+      RentalException: If a referenced entity does not exist.
+
+  Returns:
+      Entity: The new entity.
+  """
+  names = {kind: name for name, kind in COLLECTIONS.items()}
+  arguments = []
+  for name, kind in field_types(cls):
+    value = row[name]
+    if kind in names:
+      collection = names[kind]
+      referenced = getattr(getattr(company, collection), collection).lookup(int(value))
+      if referenced == None:
+        raise RentalException(f'{cls.__name__} {row["id"]} references the unknown {kind.__name__} {value}')
+      value = referenced
+    elif kind is date:
+      value = date.fromisoformat(value)
+    elif not typed:
+      if kind is int:
+        value = int(value)
+      elif name in CATEGORY_FIELDS and value.lstrip('-').isdigit():
+        value = int(value)
+    arguments.append(value)
+  return cls(*arguments)
+
+def write_rows(path: Path, format: str, names: list, rows):
+  """
+  Write rows to a CSV or JSON Lines file as they are produced.
+
+  Args:
+      path (Path): The file to write.
+      format (str): 'csv' or 'jsonl'.
+      names (list[str]): The field names, written as CSV header.
+      rows (Iterable[dict]): The rows to write.
+  """
+  with open(path, 'w', newline='', encoding='utf-8') as file:
+    if format == 'csv':
+      writer = csv.DictWriter(file, fieldnames=names)
+      writer.writeheader()
+      writer.writerows(rows)
+    else:
+      for row in rows:
+        file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+def read_rows(path: Path, format: str):
+  """
+  Read the rows of a CSV or JSON Lines file one at a time.
+
+  Yields:
+      dict: The fields of the next row by name.
+  """
+  with open(path, newline='', encoding='utf-8') as file:
+    if format == 'csv':
+      yield from csv.DictReader(file)
+    else:
+      for line in file:
+        if line.strip():
+          yield json.loads(line)
+
+def export_company(company: Company, directory: str, format: str = 'jsonl', interval: float = 1.0) -> dict:
+  """
+  Stream all entities of a company to one file per collection.
+
+  Args:
+      company (Company): The company to export.
+      directory (str): The directory to write the files to, created if needed.
+      format (str): 'csv' or 'jsonl'.
+      interval (float): The minimum number of seconds between two progress reports.
+
+  Returns:
+      dict[str, int]: The number of exported entities per collection.
+  """
+  directory = Path(directory)
+  directory.mkdir(parents=True, exist_ok=True)
+  counts = {}
+  for name, cls in COLLECTIONS.items():
+    progress = Progress(f'Exported {name}', interval)
+
+    def rows():
+      for entity in getattr(getattr(company, name), name):
+        progress.advance()
+        yield to_row(entity)
+
+    write_rows(directory / f'{name}.{format}', format, [f.name for f in fields(cls)], rows())
+    counts[name] = progress.done()
+  return counts
+
+def import_company(company: Company, directory: str, format: str = 'jsonl', chunk_size: int = 10000, interval: float = 1.0, journal=None) -> dict:
+  """
+  Stream entities from one file per collection into a company, in chunks.
+
+  Each chunk is added within a batch and notified at once, so that recorders, e.g. a journal
+  or a database, commit it as a whole. The current ID of the controller is raised to the
+  highest imported ID before each chunk is notified, so IDs stay unique afterwards.
+  Missing files are skipped.
+
+  Args:
+      company (Company): The company to import into.
+      directory (str): The directory holding the files.
+      format (str): 'csv' or 'jsonl'.
+      chunk_size (int): The number of entities added per chunk.
+      interval (float): The minimum number of seconds between two progress reports.
+      journal (Journal): The journal of the company, if any, which then records the raised current ID.
+
+  Raises:
+      RentalException: If an entity references an unknown entity or its ID is taken.
+
+  Returns:
+      dict[str, int]: The number of imported entities per collection.
+  """
+  counts = {}
+  set_id = journal.set_id if journal != None else controller.setId
+  for name, cls in COLLECTIONS.items():
+    path = Path(directory) / f'{name}.{format}'
+    if not path.exists():
+      continue
+    collection = getattr(company, name)
+    progress = Progress(f'Imported {name}', interval)
+    for chunk in chunks(read_rows(path, format), chunk_size):
+      with company.batch():
+        entities = [from_row(company, cls, row, format == 'jsonl') for row in chunk]
+        for entity in entities:
+          try:
+            collection.insert(entity)
+          except KeyError:
+            raise RentalException(f'{cls.__name__} {entity.id} cannot be imported, its ID is taken')
+        set_id(max(controller.current_id, max(e.id for e in entities)))
+        collection.notify(*[Change('add', e) for e in entities])
+      progress.advance(len(entities))
+    counts[name] = progress.done()
+  return counts
+
+def main(argv: list = None):
+  """
+  Run the command line interface, see the module documentation.
+
+  Args:
+      argv (list[str]): The arguments, defaulting to those of the process.
+  """
+  parser = argparse.ArgumentParser(prog='python -m rental.transfer', description='Export or import the entities of a company.')
+  parser.add_argument('command', choices=['export', 'import'])
+  parser.add_argument('directory', help='directory of the files, one per collection')
+  parser.add_argument('--format', choices=FORMATS, default='jsonl')
+  parser.add_argument('--persistence', default='./persistence', help='directory of the journal (default: ./persistence)')
+  parser.add_argument('--database', help='SQLite database to use instead of the journal')
+  parser.add_argument('--company', default='Company', help='name of the company if none is persisted yet')
+  parser.add_argument('--chunk-size', type=int, default=10000, help='entities added per chunk when importing')
+  args = parser.parse_args(argv)
+
+  # Lazy imports, only the chosen storage is needed
+  if args.database:
+    from rental.database import SqliteBackend
+    storage = SqliteBackend(args.database, cache=False)
+    company = storage.open(args.company)
+  else:
+    from rental.journal import Journal
+    storage = Journal(args.persistence)
+    company = storage.recover()
+    if company == None:
+      company = Company(args.company)
+      storage.attach(company)
+
+  try:
+    if args.command == 'export':
+      export_company(company, args.directory, args.format)
+    else:
+      import_company(company, args.directory, args.format, args.chunk_size, journal=None if args.database else storage)
+      if not args.database:
+        storage.snapshot() # Compact the imported records
+  except RentalException as e:
+    print(f'Error: {e}', file=sys.stderr)
+    return 1
+  finally:
+    storage.close()
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
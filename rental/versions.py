@@ -0,0 +1,126 @@
+from dataclasses import fields
+from patterns.observer import Recorder, Subject
+from rental.entity import Entity
+from rental.exceptions import ConflictException
+
+class Observed(dict):
+  """
+  The versions noted by `Versions.read`, by entity or collection.
+
+  Attributes:
+      deletions (dict[type, int]): The number of deleted entities of each noted type.
+  """
+
+class Versions(Recorder):
+  """
+  Counts the changes of each entity and collection of a company, for optimistic concurrency control.
+
+  Attached as a recorder to all collections, it raises the version of every changed entity,
+  of the entities it references (e.g. the car and customer of a booking, whose schedule or
+  points depend on it) and of the collection. An operation notes the versions of what it
+  reads, e.g. with the company locked for reading only, and checks them when it writes:
+  if any has changed meanwhile, its reads are stale and it fails with a ConflictException
+  instead of acting on them, without having changed anything.
+
+  Entities are versioned by type and ID, and the version of a deleted entity is dropped, so
+  the counters only cover the live entities. Deletions are counted per type instead: noting
+  the version of an entity notes the deletions of its type, so that an operation also fails
+  if what it read has been deleted meanwhile. Deleting an entity does not change the entities
+  it references, it only frees them.
+
+  The versions live in the memory of one process. Processes sharing a database rely on its
+  transactions instead, see SqliteBackend.
+
+  Attributes:
+      counters (dict[object, int]): The version of each live entity (by type and ID) and
+          collection changed so far.
+      deletions (dict[type, int]): The number of deleted entities of each type.
+  """
+
+  def __init__(self):
+    self.counters = {}
+    self.deletions = {}
+
+  @staticmethod
+  def key(key):
+    return (type(key), key.id) if isinstance(key, Entity) else key
+
+  def of(self, key) -> int:
+    """
+    Returns:
+        int: The version of an entity or collection, 0 if it has never changed.
+    """
+    return self.counters.get(self.key(key), 0)
+
+  def read(self, *keys) -> dict:
+    """
+    Note the current versions of entities or collections.
+
+    Returns:
+        Observed: The version of each key, along with the number of deletions of each type of entity.
+    """
+    observed = Observed((key, self.of(key)) for key in keys)
+    observed.deletions = {type(key): self.deletions.get(type(key), 0) for key in keys if isinstance(key, Entity)}
+    return observed
+
+  def check(self, observed: dict):
+    """
+    Compare noted versions with the current ones. Call this with the company locked for writing.
+
+    Args:
+        observed (Observed | dict[object, int]): The versions noted by `read`.
+
+    Raises:
+        ConflictException: If an entity or collection has changed since its version was noted,
+            or an entity of a noted type has been deleted.
+    """
+    for kind, count in getattr(observed, 'deletions', {}).items():
+      if self.deletions.get(kind, 0) != count:
+        raise ConflictException(f'A {kind.__name__} has been deleted concurrently, please retry')
+    for key, version in observed.items():
+      if self.of(key) != version:
+        label = f'{type(key).__name__} {key.id}' if isinstance(key, Entity) else type(key).__name__
+        raise ConflictException(f'{label} has been changed concurrently, please retry')
+
+  def bump(self, *keys):
+    """
+    Raise the versions of entities or collections.
+    """
+    for key in keys:
+      key = self.key(key)
+      self.counters[key] = self.counters.get(key, 0) + 1
+
+  def record(self, subject: Subject, changes: tuple):
+    self.bump(subject)
+    for change in changes:
+      if change.entity == None:
+        continue
+      if change.kind == 'delete':
+        self.counters.pop(self.key(change.entity), None)
+        self.deletions[type(change.entity)] = self.deletions.get(type(change.entity), 0) + 1
+        continue
+      self.bump(change.entity)
+      self.bump(*[value for value in (getattr(change.entity, f.name) for f in fields(change.entity)) if isinstance(value, Entity)])
+
+def retry(operation, *args, attempts: int = 3, **kwargs):
+  """
+  Run an operation, running it again if it conflicts with a concurrent one.
+
+  Args:
+      operation (Callable): The operation, e.g. `company.bookings.add`.
+      *args: The arguments of the operation.
+      attempts (int): The maximum number of runs.
+      **kwargs: The keyword arguments of the operation.
+
+  Raises:
+      ConflictException: If the last run conflicted as well.
+
+  Returns:
+      object: The result of the operation.
+  """
+  for attempt in range(attempts):
+    try:
+      return operation(*args, **kwargs)
+    except ConflictException:
+      if attempt == attempts - 1:
+        raise
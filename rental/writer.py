@@ -0,0 +1,197 @@
+from __future__ import annotations
+import os
+import threading
+import time
+import traceback
+
+class GroupCommitWriter:
+  """
+  Appends data to a file on a background thread, committing it to disk in groups.
+
+  Writes are queued and return immediately. The worker thread waits for the durability
+  window to pass after the first queued write, then writes everything queued so far and
+  forces it to disk with a single fsync. Under load, many writes thus share one commit.
+  Callers which need their data on disk wait for it with `wait`.
+
+  A failed commit does not count as durable: its data stays queued ahead of later writes, the
+  file is cut back to its last committed size, and the commit is retried every `RETRY` seconds.
+  Meanwhile `wait` raises the error, so that callers do not report lost changes as saved.
+
+  Attributes:
+      path (str): The path of the file.
+      window (float): The maximum number of seconds a write waits to be committed.
+      sync (bool): Whether commits are forced to disk (fsync), not just flushed.
+      queued (int): The sequence number of the last queued write.
+      durable (int): The sequence number of the last committed write.
+      commits (int): The number of group commits so far.
+      error (Exception | None): The error of the last commit if it failed.
+  """
+
+  RETRY = 1.0
+
+  def __init__(self, path: str, window: float = 0.01, sync: bool = True):
+    """
+    Creates a new GroupCommitWriter appending to a file and starts its worker thread.
+
+    Args:
+        path (str): The path of the file.
+        window (float): The maximum number of seconds a write waits to be committed.
+        sync (bool): Whether commits are forced to disk (fsync), not just flushed.
+    """
+    self.path = path
+    self.window = window
+    self.sync = sync
+    self.file = open(path, 'a', encoding='utf-8')
+    self.size = os.fstat(self.file.fileno()).st_size # Bytes committed
+    self.error = None
+    self.pending: list[str] = []
+    self.since = None
+    self.queued = 0
+    self.durable = 0
+    self.commits = 0
+    self.writing = False
+    self.urgent = False
+    self.closed = False
+    self.condition = threading.Condition()
+    self.worker = threading.Thread(target=self.run, name='journal-writer', daemon=True)
+    self.worker.start()
+
+  def write(self, data: str, seq: int) -> None:
+    """
+    Queue data to be appended to the file.
+
+    Args:
+        data (str): The data to append.
+        seq (int): The sequence number of the write, increasing with each write.
+
+    Raises:
+        ValueError: If the writer has been closed.
+    """
+    with self.condition:
+      if self.closed:
+        raise ValueError('Writer has been closed')
+      if not self.pending:
+        self.since = time.monotonic()
+      self.pending.append(data)
+      self.queued = seq
+      self.condition.notify_all()
+
+  def run(self) -> None:
+    """
+    Commit queued writes in groups until the writer is closed and the queue is drained, or a
+    commit fails after it has been closed.
+    """
+    while True:
+      with self.condition:
+        self.condition.wait_for(lambda: self.pending or self.closed)
+        if not self.pending:
+          return
+        if self.error == None:
+          self.condition.wait_for(lambda: self.closed or self.urgent, self.since + self.window - time.monotonic())
+        else: # Back off after a failed commit
+          self.condition.wait_for(lambda: self.closed or self.urgent or not self.pending, self.RETRY)
+          if not self.pending: # Dropped by truncate
+            continue
+        pending, self.pending = self.pending, []
+        self.urgent = False
+        seq = self.queued
+        self.writing = True
+      try:
+        self.file.write(''.join(pending))
+        self.file.flush()
+        if self.sync:
+          os.fsync(self.file.fileno())
+        size = os.fstat(self.file.fileno()).st_size
+      except Exception as e:
+        traceback.print_exc()
+        self.reopen()
+        with self.condition:
+          self.writing = False
+          self.error = e
+          self.pending[:0] = pending # Keep the order of the writes
+          self.condition.notify_all()
+          if self.closed:
+            return
+        continue
+      with self.condition:
+        self.writing = False
+        self.error = None
+        self.size = size
+        self.durable = seq
+        self.commits += 1
+        self.condition.notify_all()
+
+  def reopen(self) -> None:
+    """
+    Cut the file back to its committed data after a failed commit, dropping any part of the
+    commit which was written, and open it again.
+    """
+    try:
+      self.file.close() # Discards the buffered data, even if flushing it fails again
+    except Exception:
+      pass
+    try:
+      os.truncate(self.path, self.size)
+      self.file = open(self.path, 'a', encoding='utf-8')
+    except OSError:
+      traceback.print_exc() # The next commit fails on the closed file and tries again
+
+  def wait(self, seq: int = None, timeout: float = None) -> bool:
+    """
+    Wait until a write has been committed.
+
+    Args:
+        seq (int): The sequence number of the write, or None for the last queued write.
+        timeout (float): The maximum number of seconds to wait, or None to wait indefinitely.
+
+    Raises:
+        OSError: If the write has not been committed because committing it failed.
+
+    Returns:
+        bool: True if the write has been committed, False if the timeout expired.
+    """
+    with self.condition:
+      seq = self.queued if seq == None else seq
+      if not self.condition.wait_for(lambda: self.durable >= seq or self.error != None, timeout):
+        return False
+      if self.durable >= seq:
+        return True
+      raise OSError(f'Writing {self.path} failed: {self.error}') from self.error
+
+  def truncate(self, seq: int) -> None:
+    """
+    Empty the file, e.g. once its content has been compacted elsewhere.
+
+    Queued writes are committed first, without waiting for the durability window. If
+    committing them fails, they are dropped, as their data is durable elsewhere.
+
+    Args:
+        seq (int): The sequence number up to which all writes are durable elsewhere.
+    """
+    with self.condition:
+      self.urgent = bool(self.pending)
+      self.condition.notify_all()
+      self.condition.wait_for(lambda: (not self.pending or self.error != None) and not self.writing)
+      self.pending = []
+      self.error = None
+      self.file.truncate(0)
+      self.file.seek(0)
+      self.size = 0
+      self.queued = max(self.queued, seq)
+      self.durable = max(self.durable, seq)
+      self.condition.notify_all()
+
+  def close(self, timeout: float = None) -> None:
+    """
+    Commit the queued writes, stop the worker thread and close the file.
+
+    Args:
+        timeout (float): The maximum number of seconds to wait for the worker, or None to wait indefinitely.
+    """
+    with self.condition:
+      if self.closed:
+        return
+      self.closed = True
+      self.condition.notify_all()
+    self.worker.join(timeout)
+    self.file.close()
@@ -0,0 +1,72 @@
+import unittest
+import datetime as dt
+from rental.company import Company
+from rental import controller
+
+try:
+  import numpy as np
+  from rental.analytics import FleetAnalytics
+except ImportError:
+  np = None
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class FleetAnalyticsTests(unittest.TestCase):
+  def setUp(self):
+    fleet = [(1, 'A'), (2, 'A'), (3, 'B')]
+    periods = [(1, dt.date(2024, 3, 1), dt.date(2024, 3, 3)),
+               (1, dt.date(2024, 3, 6), dt.date(2024, 3, 7)),
+               (2, dt.date(2024, 3, 2), dt.date(2024, 3, 2)),
+               (3, dt.date(2024, 2, 20), dt.date(2024, 3, 2)),
+               (3, dt.date(2024, 3, 5), dt.date(2024, 3, 5)),
+               (9, dt.date(2024, 3, 1), dt.date(2024, 3, 9))] # Car not in fleet
+    self.analytics = FleetAnalytics(fleet, periods)
+    self.first, self.last = dt.date(2024, 3, 1), dt.date(2024, 3, 7)
+
+  def test_occupancy(self):
+    np.testing.assert_array_equal(self.analytics.occupancy(self.first, self.last), [2, 3, 1, 0, 1, 1, 1])
+
+  def test_occupancy_by_category(self):
+    self.assertEqual(self.analytics.categories, ['A', 'B'])
+    np.testing.assert_array_equal(self.analytics.occupancy_by_category(self.first, self.last),
+                                  [[1, 2, 1, 0, 0, 1, 1], [1, 1, 0, 0, 1, 0, 0]])
+
+  def test_utilization(self):
+    np.testing.assert_allclose(self.analytics.utilization(self.first, self.last), np.array([2, 3, 1, 0, 1, 1, 1]) / 3)
+    np.testing.assert_allclose(self.analytics.utilization_by_category(self.first, self.last)[0], [0.5, 1, 0.5, 0, 0, 0.5, 0.5])
+    np.testing.assert_allclose(self.analytics.utilization_by_car(self.first, self.last), np.array([5, 1, 3]) / 7)
+
+  def test_peak_concurrency(self):
+    self.assertEqual(self.analytics.peak_concurrency(self.first, self.last), (3, dt.date(2024, 3, 2)))
+    self.assertEqual(self.analytics.peak_concurrency(self.last, self.first), (0, None))
+
+  def test_idle_gaps(self):
+    self.assertCountEqual(self.analytics.idle_gaps().tolist(), [2, 2])
+    np.testing.assert_array_equal(self.analytics.idle_gap_distribution(), [0, 0, 2])
+
+  def test_idle_gaps_nested(self):
+    analytics = FleetAnalytics([(1, 'A'), (2, 'A')], [(1, dt.date(2024, 3, 1), dt.date(2024, 3, 10)),
+                                                      (1, dt.date(2024, 3, 2), dt.date(2024, 3, 3)),
+                                                      (1, dt.date(2024, 3, 12), dt.date(2024, 3, 12)),
+                                                      (2, dt.date(2024, 3, 1), dt.date(2024, 3, 1))])
+    self.assertEqual(analytics.idle_gaps().tolist(), [1])
+
+  def test_empty(self):
+    analytics = FleetAnalytics([], [])
+    np.testing.assert_array_equal(analytics.occupancy(self.first, self.last), [0] * 7)
+    np.testing.assert_array_equal(analytics.utilization(self.first, self.last), [0] * 7)
+    self.assertEqual(len(analytics.idle_gaps()), 0)
+
+  def test_from_company(self):
+    company = Company('Šmertz')
+    customer = company.customers.add('Random House')
+    car = company.cars.add('D12', 'blue', 'A')
+    company.cars.add('D13', 'blue', 'A')
+    booking = company.bookings.add(customer.id, controller.today, controller.today + dt.timedelta(days=1), car.id)
+    company.bookings.add(customer.id, controller.today + dt.timedelta(days=5), controller.today + dt.timedelta(days=6), car.id)
+    company.rentals.add(booking.id)
+    today = controller.today
+    np.testing.assert_array_equal(FleetAnalytics.from_company(company).occupancy(today, today + dt.timedelta(days=6)), [1, 1, 0, 0, 0, 1, 1])
+    np.testing.assert_array_equal(FleetAnalytics.from_company(company, rentals=True).occupancy(today, today + dt.timedelta(days=6)), [1, 1, 0, 0, 0, 0, 0])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full
+from patterns.batcher import MicroBatcher
+
+class MicroBatcherTests(unittest.TestCase):
+  def setUp(self):
+    self.batches = []
+    self.release = threading.Event()
+    self.release.set()
+
+  def double(self, items: list) -> list:
+    self.release.wait(5)
+    self.batches.append(list(items))
+    return [item * 2 for item in items]
+
+  def test_single(self):
+    batcher = MicroBatcher(self.double, max_wait=0.001)
+    self.assertEqual(batcher(21, timeout=5), 42)
+    batcher.close()
+    self.assertEqual(self.batches, [[21]])
+
+  def test_batches(self):
+    self.release.clear() # Hold the worker while items queue up behind the first batch
+    batcher = MicroBatcher(self.double, max_batch=4, max_wait=0.001)
+    first = batcher.submit(0)
+    while batcher.metrics()['queue_depth']:
+      pass
+    futures = [batcher.submit(i) for i in range(1, 10)]
+    self.release.set()
+    self.assertEqual([f.result(5) for f in futures], [i * 2 for i in range(1, 10)])
+    self.assertEqual(first.result(5), 0)
+    batcher.close()
+    self.assertEqual(self.batches, [[0], [1, 2, 3, 4], [5, 6, 7, 8], [9]])
+    metrics = batcher.metrics()
+    self.assertEqual((metrics['batches'], metrics['processed'], metrics['submitted']), (4, 10, 10))
+    self.assertEqual(metrics['mean_batch_size'], 2.5)
+    self.assertEqual(metrics['peak_queue_depth'], 9)
+
+  def test_deadline(self):
+    batcher = MicroBatcher(self.double, max_batch=100, max_wait=0.05)
+    futures = [batcher.submit(i) for i in range(3)]
+    self.assertEqual([f.result(5) for f in futures], [0, 2, 4])
+    batcher.close()
+    self.assertEqual(self.batches, [[0, 1, 2]], 'batch not filled within the deadline')
+
+  def test_queue_depth(self):
+    self.release.clear()
+    batcher = MicroBatcher(self.double, max_batch=1, max_wait=0, max_queue=2)
+    batcher.submit(0)
+    while batcher.metrics()['queue_depth']:
+      pass
+    batcher.submit(1)
+    batcher.submit(2)
+    with self.assertRaises(Full):
+      batcher.submit(3)
+    self.assertEqual(batcher.metrics()['rejected'], 1)
+    self.release.set()
+    batcher.close()
+
+  def test_cancelled(self):
+    self.release.clear()
+    batcher = MicroBatcher(self.double, max_batch=4, max_wait=0.001)
+    first = batcher.submit(0)
+    while batcher.metrics()['queue_depth']:
+      pass
+    cancelled, kept = batcher.submit(1), batcher.submit(2)
+    self.assertTrue(cancelled.cancel())
+    self.release.set()
+    self.assertEqual((first.result(5), kept.result(5)), (0, 4))
+    self.assertEqual(batcher(3, timeout=5), 6, 'worker stopped after a cancellation')
+    batcher.close()
+    self.assertEqual(self.batches, [[0], [2], [3]])
+    self.assertEqual(batcher.metrics()['cancelled'], 1)
+
+  def test_failure(self):
+    def fail(items):
+      raise RuntimeError('broken model')
+
+    batcher = MicroBatcher(fail, max_wait=0)
+    with self.assertRaises(RuntimeError):
+      batcher(1, timeout=5)
+    batcher.close()
+    with self.assertRaises(ValueError):
+      batcher.submit(2)
+
+  def test_concurrent_batches(self):
+    both = threading.Barrier(2)
+
+    def double(items):
+      both.wait(5) # Only passes if two batches are processed at once
+      return [item * 2 for item in items]
+
+    pool = ThreadPoolExecutor(2)
+    batcher = MicroBatcher(lambda items: pool.submit(double, items), max_batch=2, max_wait=0.01)
+    futures = [batcher.submit(i) for i in range(4)]
+    self.assertEqual([f.result(5) for f in futures], [0, 2, 4, 6])
+    batcher.close()
+    pool.shutdown()
+    self.assertEqual((batcher.metrics()['batches'], batcher.metrics()['processed']), (2, 4))
+
+  def test_future_failure(self):
+    def fail():
+      raise RuntimeError('worker crashed')
+
+    pool = ThreadPoolExecutor(1)
+    batcher = MicroBatcher(lambda items: pool.submit(fail), max_wait=0)
+    with self.assertRaises(RuntimeError):
+      batcher(1, timeout=5)
+    self.assertEqual(batcher.metrics()['batches'], 1)
+    batcher.close()
+    pool.shutdown()
@@ -33,7 +33,7 @@ class BookingsTests(unittest.TestCase):
 
   def test_add_car_id(self):
     booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
-    self.assertEqual(booking, self.bookings.bookings[0], "booking not added")
+    self.assertEqual(booking, self.bookings.get()[0], "booking not added")
 
   def test_add_car_id_with_exception(self):
     with self.assertRaises(RentalException):
@@ -58,12 +58,13 @@ class BookingsTests(unittest.TestCase):
 
   def test_get_not_empty(self):
     booking1 = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
-    booking2 = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
+    booking2 = self.bookings.add(self.customer.id, dt.date(2024, 4, 8), dt.date(2024, 5, 8), self.car.id)
     self.assertCountEqual(self.bookings.get(), [booking1, booking2], "bookings not retrieved")
 
-  def test_get_copy(self):
+  def test_get_read_only(self):
     bookings = self.bookings.get()
-    bookings.append(Booking(1, self.customer, self.car, dt.date(2024, 3, 7), dt.date(2024, 4, 7), "A"))
+    with self.assertRaises(AttributeError):
+      bookings.append(Booking(1, self.customer, self.car, dt.date(2024, 3, 7), dt.date(2024, 4, 7), "A"))
     self.assertEqual(len(self.bookings.get()), 0, "bookings not retrieved")
 
   def test_add_by_category_id(self):
@@ -77,10 +78,73 @@ class BookingsTests(unittest.TestCase):
     self.assertEqual(booking.period_end, end_date, "Incorrect end date in booking")
     self.assertEqual(booking.category, self.category.id, "Incorrect category in booking")
 
+  def test_add_by_category_id_empty_category(self):
+    with self.assertRaises(RentalException):
+      self.bookings.add_by_category_id(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 14), category_id=-1)
+
+  def test_add_by_category_id_fully_booked(self):
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 1), dt.date(2024, 3, 31), self.car.id)
+    with self.assertRaises(RentalException):
+      self.bookings.add_by_category_id(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 14), category_id=self.category.id)
+
+  def test_add_by_category_id_spreads_over_cars(self):
+    car2 = self.bookings.company.cars.add('D13', 'red', self.category.id)
+    booking1 = self.bookings.add_by_category_id(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 14), category_id=self.category.id)
+    booking2 = self.bookings.add_by_category_id(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 14), category_id=self.category.id)
+    self.assertCountEqual([booking1.car, booking2.car], [self.car, car2], "category bookings not spread over cars")
+
+  def test_best_fit_car(self):
+    car2 = self.bookings.company.cars.add('D13', 'red', self.category.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 1), dt.date(2024, 3, 5), self.car.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 15), dt.date(2024, 3, 20), self.car.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 1), dt.date(2024, 3, 6), car2.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 12), dt.date(2024, 3, 20), car2.id)
+    # car2 leaves no idle day around 7 - 11 March, self.car leaves 4
+    self.assertEqual(self.bookings.best_fit_car(self.category.id, dt.date(2024, 3, 7), dt.date(2024, 3, 11)), car2, "wrong car chosen")
+    # Only self.car is free from 8 to 13 March
+    self.assertEqual(self.bookings.best_fit_car(self.category.id, dt.date(2024, 3, 8), dt.date(2024, 3, 13)), self.car, "wrong car chosen")
+
+  def test_best_fit_car_prefers_used_car(self):
+    car2 = self.bookings.company.cars.add('D13', 'red', self.category.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 1), dt.date(2024, 3, 5), car2.id)
+    self.assertEqual(self.bookings.best_fit_car(self.category.id, dt.date(2024, 3, 6), dt.date(2024, 3, 9)), car2, "wrong car chosen")
+
+  def test_find_available_cars(self):
+    car2 = self.bookings.company.cars.add('D13', 'red', self.category.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 1), dt.date(2024, 3, 5), car2.id)
+    self.assertEqual(self.bookings.find_available_cars(self.category.id, dt.date(2024, 3, 4), dt.date(2024, 3, 9)), [self.car], "wrong cars available")
+
+  def test_find_available_cars_after_delete(self):
+    car2 = self.bookings.company.cars.add('D13', 'red', self.category.id)
+    booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 1), dt.date(2024, 3, 5), car2.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 2), dt.date(2024, 3, 3), self.car.id)
+    self.assertEqual(self.bookings.find_available_cars(self.category.id, dt.date(2024, 3, 3), dt.date(2024, 3, 4)), [], "booked cars available")
+    self.bookings.delete(booking.id)
+    self.assertEqual(self.bookings.find_available_cars(self.category.id, dt.date(2024, 3, 3), dt.date(2024, 3, 4)), [car2], "released car not available")
+
+  def test_add_many(self):
+    bookings = self.bookings.add_many([(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 14), self.car.id),
+                                       (self.customer.id, dt.date(2024, 3, 15), dt.date(2024, 3, 20), self.car.id)])
+    self.assertEqual(self.bookings.get(), bookings, "bookings not added")
+    with self.assertRaises(RentalException):
+      self.bookings.add(self.customer.id, dt.date(2024, 3, 10), dt.date(2024, 3, 11), self.car.id)
+
+  def test_add_many_overlapping_in_batch(self):
+    with self.assertRaises(RentalException):
+      self.bookings.add_many([(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 14), self.car.id),
+                              (self.customer.id, dt.date(2024, 3, 14), dt.date(2024, 3, 20), self.car.id)])
+    self.assertEqual(self.bookings.get(), [], "partial batch added")
+
+  def test_add_many_invalid_customer(self):
+    with self.assertRaises(RentalException):
+      self.bookings.add_many([(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 14), self.car.id),
+                              (-1, dt.date(2024, 3, 15), dt.date(2024, 3, 20), self.car.id)])
+    self.assertEqual(self.bookings.get(), [], "partial batch added")
+
   def test_delete(self):
     booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
     self.bookings.delete(booking.id)
-    self.assertEqual(self.bookings.bookings, [], "booking not deleted")
+    self.assertEqual(self.bookings.get(), [], "booking not deleted")
   
   def test_find_by_id(self):
     booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
@@ -99,9 +163,27 @@ class BookingsTests(unittest.TestCase):
 
   def test_find_by_customer_id(self):
     booking1 = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
-    booking2 = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
+    booking2 = self.bookings.add(self.customer.id, dt.date(2024, 4, 8), dt.date(2024, 5, 8), self.car.id)
     self.assertCountEqual(self.bookings.find_by_customer_id(self.customer.id), [booking1, booking2], "booking not found by customer id")
 
+  def test_add_overlapping_exception(self):
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
+    with self.assertRaises(RentalException):
+      self.bookings.add(self.customer.id, dt.date(2024, 4, 7), dt.date(2024, 4, 10), self.car.id)
+    self.assertEqual(len(self.bookings.get()), 1, "overlapping booking added")
+
+  def test_add_after_delete(self):
+    booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
+    self.bookings.delete(booking.id)
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
+    self.assertEqual(len(self.bookings.get()), 1, "period not released on delete")
+
+  def test_find_by_car_id(self):
+    booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 4, 7), self.car.id)
+    self.assertEqual(self.bookings.find_by_car_id(self.car.id), [booking], "booking not found by car id")
+    self.bookings.delete(booking.id)
+    self.assertEqual(self.bookings.find_by_car_id(self.car.id), [], "deleted booking found by car id")
+
   def test_add_car_id_with_false_date_exception(self):
     with self.assertRaises(Exception):
       self.bookings.add(self.customer.id, dt.date(2024, 4), dt.date(2024, 3), self.car.id)
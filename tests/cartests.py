@@ -26,6 +26,12 @@ class CarsTests(unittest.TestCase):
     car2 = self.cars.add('VW Jetta', 'green', "B")
     self.assertCountEqual([car1, car2], self.cars.cars, "cars not added")
 
+  def test_add_many(self):
+    cars = self.cars.add_many([('Bon Voyage', 'red', "A"), ('VW Jetta', 'green', "B")])
+    self.assertEqual([c.model for c in cars], ['Bon Voyage', 'VW Jetta'], "cars not created")
+    self.assertEqual(cars[1].id, cars[0].id + 1, "ids not reserved as a block")
+    self.assertEqual(self.cars.find_by_category_id("B"), [cars[1]], "cars not added")
+
   def test_get_empty(self):
     self.assertEqual(self.cars.get(), [], "cars not retrieved")
 
@@ -34,9 +40,10 @@ class CarsTests(unittest.TestCase):
     self.cars.add('VW Jetta', 'green', "B")
     self.assertEqual(len(self.cars.get()), 2, "cars not retrieved")
   
-  def test_get_copy(self):
+  def test_get_read_only(self):
     cars = self.cars.get()
-    cars.append(Car(1, 'Random House', 'strange color', "A"))
+    with self.assertRaises(AttributeError):
+      cars.append(Car(1, 'Random House', 'strange color', "A"))
     self.assertEqual(len(self.cars.get()), 0, "cars not retrieved")
 
   def test_delete(self):
@@ -0,0 +1,74 @@
+import unittest
+import datetime as dt
+from rental.company import Company
+from rental.cascade import Cascade
+from rental import controller
+from patterns.observer import Observer
+
+class CountingObserver(Observer):
+  def __init__(self):
+    self.updates = 0
+
+  def update(self, subject) -> None:
+    self.updates += 1
+
+class CascadeTests(unittest.TestCase):
+  def setUp(self):
+    company = Company('Šmertz')
+    self.category = company.categories.add('A')
+    self.other = company.categories.add('B')
+    self.car1 = company.cars.add('D12', 'blue', self.category.id)
+    self.car2 = company.cars.add('D13', 'green', self.category.id)
+    self.car3 = company.cars.add('VW Jetta', 'green', self.other.id)
+    self.customer1 = company.customers.add('Random House')
+    self.customer2 = company.customers.add('Mega Corp')
+    self.booking1 = company.bookings.add(self.customer1.id, controller.today, controller.today + dt.timedelta(days=3), self.car1.id)
+    self.booking2 = company.bookings.add(self.customer2.id, controller.today, controller.today + dt.timedelta(days=3), self.car2.id)
+    self.booking3 = company.bookings.add(self.customer1.id, controller.today, controller.today + dt.timedelta(days=3), self.car3.id)
+    self.rental1 = company.rentals.add(self.booking1.id)
+    self.company = company
+
+  def attach_counters(self):
+    counters = {}
+    for name in ['cars', 'bookings', 'rentals', 'customers']:
+      counters[name] = CountingObserver()
+      getattr(self.company, name).attach(counters[name])
+    return counters
+
+  def test_collect_category(self):
+    cascade = Cascade(self.company)
+    cascade.add_category(self.category)
+    self.assertCountEqual(cascade.cars.values(), [self.car1, self.car2], 'wrong cars collected')
+    self.assertCountEqual(cascade.bookings.values(), [self.booking1, self.booking2], 'wrong bookings collected')
+    self.assertCountEqual(cascade.rentals.values(), [self.rental1], 'wrong rentals collected')
+
+  def test_delete_category(self):
+    counters = self.attach_counters()
+    self.company.categories.delete(self.category.id)
+    self.assertEqual(self.company.cars.get(), [self.car3], 'cars of category not deleted')
+    self.assertEqual(self.company.bookings.get(), [self.booking3], 'bookings of category not deleted')
+    self.assertEqual(self.company.rentals.get(), [], 'rentals of category not deleted')
+    self.assertEqual(counters['cars'].updates, 1, 'cars notified more than once')
+    self.assertEqual(counters['bookings'].updates, 1, 'bookings notified more than once')
+    self.assertEqual(counters['rentals'].updates, 1, 'rentals notified more than once')
+
+  def test_delete_customer(self):
+    counters = self.attach_counters()
+    self.company.customers.delete(self.customer1.id)
+    self.assertEqual(self.company.bookings.get(), [self.booking2], 'bookings of customer not deleted')
+    self.assertEqual(self.company.rentals.get(), [], 'rentals of customer not deleted')
+    self.assertEqual(counters['bookings'].updates, 1, 'bookings notified more than once')
+    self.assertEqual(counters['cars'].updates, 0, 'cars notified without change')
+
+  def test_delete_customer_releases_period(self):
+    self.company.customers.delete(self.customer2.id)
+    booking = self.company.bookings.add(self.customer1.id, controller.today, controller.today + dt.timedelta(days=3), self.car2.id)
+    self.assertIn(booking, self.company.bookings.get(), 'period of deleted booking not released')
+
+  def test_execute_empty(self):
+    counters = self.attach_counters()
+    Cascade(self.company).execute()
+    self.assertEqual(sum(c.updates for c in counters.values()), 0, 'observers notified without change')
+
+if __name__ == '__main__':
+  unittest.main()
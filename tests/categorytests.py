@@ -27,6 +27,11 @@ class CategoryTests(unittest.TestCase):
     cat2 = self.categories.add("B")
     self.assertCountEqual([cat1, cat2], self.categories.categories, "categories not added")
 
+  def test_add_many(self):
+    categories = self.categories.add_many(["A", "B"])
+    self.assertEqual(self.categories.get(), categories, "categories not added")
+    self.assertEqual(self.categories.find_by_name("B"), categories[1], "categories not added")
+
   def test_delete(self):
     category = self.categories.add("A")
     self.categories.add("B")
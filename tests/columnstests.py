@@ -0,0 +1,100 @@
+import unittest
+import datetime as dt
+from unittest import mock
+from rental.company import Company
+from rental import controller
+from rental.bookings import Booking
+from rental.columns import BookingColumns
+from rental.exceptions import RentalException
+
+class BookingColumnsTests(unittest.TestCase):
+  def setUp(self):
+    self.company = Company('Šmertz', columnar_bookings=True)
+    self.category = self.company.categories.add('A')
+    self.car = self.company.cars.add('D12', 'blue', self.category.id)
+    self.car2 = self.company.cars.add('D13', 'red', self.category.id)
+    self.customer = self.company.customers.add('Dandy McDuck')
+    self.customer2 = self.company.customers.add('Random House')
+    self.bookings = self.company.bookings
+
+  def test_columnar(self):
+    self.assertIsInstance(self.bookings.bookings, BookingColumns)
+    booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car.id)
+    columns = self.bookings.bookings
+    self.assertEqual(list(columns.ids), [booking.id])
+    self.assertEqual(list(columns.car_ids), [self.car.id])
+    self.assertEqual(list(columns.starts), [dt.date(2024, 3, 7).toordinal()])
+
+  def test_materialize(self):
+    booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car.id)
+    found = self.bookings.find_by_id(booking.id)
+    self.assertEqual(found, booking)
+    self.assertIs(found.customer, self.customer)
+    self.assertIs(found.car, self.car)
+    self.assertEqual((found.period_start, found.period_end), (dt.date(2024, 3, 7), dt.date(2024, 3, 9)))
+    self.assertEqual(found.category, self.category.id)
+    self.assertEqual(self.bookings.get(), [booking])
+
+  def test_find(self):
+    b1 = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car.id)
+    b2 = self.bookings.add(self.customer2.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car2.id)
+    b3 = self.bookings.add(self.customer.id, dt.date(2024, 3, 10), dt.date(2024, 3, 12), self.car2.id)
+    self.assertEqual(self.bookings.find_by_customer_id(self.customer.id), [b1, b3])
+    self.assertEqual(self.bookings.find_by_car_id(self.car2.id), [b2, b3])
+    self.assertEqual(self.bookings.find_by_car_id(99), [])
+    with self.assertRaises(RentalException):
+      self.bookings.find_by_id('90')
+
+  def test_select(self):
+    b1 = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car.id)
+    b2 = self.bookings.add(self.customer2.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car2.id)
+    b3 = self.bookings.add(self.customer.id, dt.date(2024, 3, 10), dt.date(2024, 3, 12), self.car2.id)
+    columns = self.bookings.bookings
+    self.assertEqual(columns.select(customer_id=self.customer.id), [b1.id, b3.id])
+    self.assertEqual(columns.select(car_id=self.car2.id, period_start=dt.date(2024, 3, 10)), [b3.id])
+    self.assertEqual(columns.select(period_end=dt.date(2024, 3, 7)), [b1.id, b2.id])
+    self.assertEqual(self.bookings.find_by_period(dt.date(2024, 3, 9), dt.date(2024, 3, 10)), [b1, b2, b3])
+    self.assertEqual(self.bookings.find_by_period(dt.date(2024, 3, 11), dt.date(2024, 3, 20)), [b3])
+    self.assertEqual(columns.select(customer_id='1'), [])
+    self.bookings.delete(b1.id)
+    self.assertEqual(columns.select(period_end=dt.date(2024, 3, 7)), [b2.id])
+
+  def test_select_without_numpy(self):
+    b1 = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car.id)
+    b2 = self.bookings.add(self.customer2.id, dt.date(2024, 3, 10), dt.date(2024, 3, 12), self.car2.id)
+    created = self.bookings.add_many([(self.customer.id, dt.date(2024, 4, d), dt.date(2024, 4, d), self.car.id) for d in range(1, 4)])
+    columns = self.bookings.bookings
+    with mock.patch('rental.columns.np', None):
+      self.assertEqual(columns.select(customer_id=self.customer.id, period_end=dt.date(2024, 3, 31)), [b1.id])
+      for booking in created:
+        self.bookings.delete(booking.id)
+      self.assertEqual(list(columns.ids), [b1.id, b2.id], 'deleted rows not compacted')
+
+  def test_delete_and_compact(self):
+    created = self.bookings.add_many([(self.customer.id, dt.date(2024, 3, d), dt.date(2024, 3, d), self.car.id) for d in range(1, 7)])
+    for booking in created[:4]:
+      self.bookings.delete(booking.id)
+    columns = self.bookings.bookings
+    self.assertEqual(len(columns), 2)
+    self.assertEqual(len(columns.ids), 2, 'deleted rows not compacted')
+    self.assertEqual(self.bookings.get(), created[4:])
+    self.assertEqual(self.bookings.find_by_customer_id(self.customer.id), created[4:])
+    self.assertEqual(self.bookings.find_by_id(created[5].id).period_start, dt.date(2024, 3, 6))
+    self.bookings.add(self.customer.id, dt.date(2024, 3, 1), dt.date(2024, 3, 1), self.car.id)
+
+  def test_duplicate(self):
+    booking = self.bookings.add(self.customer.id, dt.date(2024, 3, 7), dt.date(2024, 3, 9), self.car.id)
+    with self.assertRaises(KeyError):
+      self.bookings.bookings.add(booking)
+    self.assertIn(booking, self.bookings.bookings)
+
+  def test_cascade(self):
+    booking = self.bookings.add(self.customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+    self.company.rentals.add(booking.id)
+    self.company.cars.delete(self.car.id)
+    self.assertEqual(self.bookings.get(), [])
+    self.assertEqual(self.company.rentals.get(), [])
+    self.assertEqual(self.company.statistics['bookings'].count, 0)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -5,6 +5,7 @@ from rental.exceptions import RentalException
 from rental import controller
 from rental.categories import Categories
 from contextlib import suppress
+from patterns.observer import Observer
 
 class CompanyTests(unittest.TestCase):
   def setUp(self):
@@ -50,10 +51,38 @@ class CompanyTests(unittest.TestCase):
       controller.setToday(dt.date(2024, 3, 5))
       rental = self.company.rentals.add(booking.id)
 
-      booking = self.company.bookings.add(customer.id, dt.date(2024, 3, 10), dt.date(2024, 3, 16), car.id)
-      controller.setToday(dt.date(2024, 3, 10))
       with self.assertRaises(RentalException):
-        self.company.rentals.add(booking.id)    
+        self.company.bookings.add(customer.id, dt.date(2024, 3, 10), dt.date(2024, 3, 16), car.id)
+
+
+  def test_batch(self):
+    updates = []
+    class Recorder(Observer):
+      def update(self, subject) -> None:
+        pass
+      def changed(self, subject, changes) -> None:
+        updates.append((subject, [c.kind for c in changes]))
+    for subject in [self.company.customers, self.company.bookings, self.company.rentals]:
+      subject.attach(Recorder())
+
+    customer = self.company.customers.get()[0]
+    car = self.company.cars.get()[0]
+    booking = self.company.bookings.add(customer.id, controller.today, controller.today + dt.timedelta(days=2), car.id)
+    updates.clear()
+    self.company.rentals.add(booking.id)
+    self.assertCountEqual(updates, [(self.company.rentals, ['add']), (self.company.customers, ['points'])], 'notifications not coalesced')
+
+  def test_batch_nested_operations(self):
+    updates = []
+    class Recorder(Observer):
+      def update(self, subject) -> None:
+        updates.append(subject)
+    self.company.customers.attach(Recorder())
+    with self.company.batch():
+      self.company.customers.add('Gabi Gaspedal')
+      self.company.customers.add('Keith Elam')
+      self.assertEqual(updates, [], 'observer notified inside batch')
+    self.assertEqual(updates, [self.company.customers], 'notifications not coalesced')
 
 
 if __name__ == '__main__':
@@ -18,6 +18,11 @@ class BookingsTests(unittest.TestCase):
     controller.setId(1)
     self.assertEqual(controller.current_id, 1)
 
+  def test_reserve_ids(self):
+    controller.setId(1)
+    self.assertEqual(list(controller.reserveIds(3)), [2, 3, 4])
+    self.assertEqual(controller.nextId(), 5)
+
   def test_set_today(self):
     controller.setToday(date.today())
     self.assertEqual(controller.today, date.today())
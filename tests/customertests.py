@@ -21,6 +21,11 @@ class CustomersTests(unittest.TestCase):
     customer = self.customers.add('Özhan Oktan')
     self.assertEqual(customer.name, 'Özhan Oktan', 'incorrect name after construction')
 
+  def test_add_many(self):
+    customers = self.customers.add_many(['Gabi Gaspedal', 'Keith Elam'])
+    self.assertEqual(self.customers.get(), customers, 'customers not added')
+    self.assertEqual(customers[1].id, customers[0].id + 1, 'ids not reserved as a block')
+
   def test_get_empty(self):
     self.assertEqual(self.customers.get(), [], 'customers not retrieved')
 
@@ -29,10 +34,13 @@ class CustomersTests(unittest.TestCase):
     self.customers.add('Keith Elam')
     self.assertEqual(len(self.customers.get()), 2, 'customers not retrieved')
 
-  def test_get_copy(self):
+  def test_get_read_only(self):
     customers = self.customers.get()
-    customers.append(Customer(1, 'Random House'))
-    self.assertEqual(len(self.customers.get()), 0, 'customers not retrieved')
+    with self.assertRaises(AttributeError):
+      customers.append(Customer(1, 'Random House'))
+    self.customers.add('Random House')
+    self.assertEqual(len(customers), 0, 'view changed with the customers')
+    self.assertEqual(len(self.customers.get()), 1, 'customers not retrieved')
 
   def test_delete(self):
     c1 = self.customers.add('Gabi Gaspedal')
@@ -0,0 +1,127 @@
+import unittest
+import tempfile
+import threading
+import os
+import datetime as dt
+from rental.database import SqliteBackend, SqlRegistry
+from rental.exceptions import RentalException
+from rental import controller
+
+class SqliteBackendTests(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'rental.db')
+    self.backend = SqliteBackend(self.path)
+    self.company = self.backend.open('Šmertz')
+    self.category = self.company.categories.add('A')
+    self.car = self.company.cars.add('D12', 'blue', self.category.id)
+    self.car2 = self.company.cars.add('D13', 'red', self.category.id)
+    self.customer = self.company.customers.add('Dandy McDuck')
+
+  def tearDown(self):
+    self.backend.close()
+    self.directory.cleanup()
+
+  def reopen(self, cache=True):
+    self.backend.close()
+    self.backend = SqliteBackend(self.path, cache)
+    return self.backend.open()
+
+  def test_registries(self):
+    self.assertIsInstance(self.company.customers.customers, SqlRegistry)
+    self.assertIs(self.company.customers.find_by_id(self.customer.id), self.customer, 'cache not used')
+    self.assertEqual(self.company.cars.find_by_category_id(self.category.id), [self.car, self.car2])
+    with self.assertRaises(RentalException):
+      self.company.customers.find_by_id(99999)
+    with self.assertRaises(KeyError):
+      self.company.customers.customers.add(self.customer)
+
+  def test_reopen(self):
+    booking = self.company.bookings.add(self.customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+    self.company.rentals.add(booking.id)
+    id = controller.current_id
+    controller.setId(0)
+    company = self.reopen()
+    self.assertEqual(controller.current_id, id, 'current id not restored')
+    self.assertEqual(company.name, 'Šmertz')
+    recovered = company.bookings.find_by_id(booking.id)
+    self.assertEqual((recovered.period_start, recovered.period_end), (booking.period_start, booking.period_end))
+    self.assertIs(recovered.customer, company.customers.find_by_id(self.customer.id))
+    self.assertEqual(company.rentals.find_by_customer_id(self.customer.id)[0].booking, booking)
+    self.assertEqual(company.statistics['cars'].count, 2)
+    self.assertEqual(company.statistics['rentals'].count, 1)
+
+  def test_points(self):
+    with self.assertRaises(RentalException):
+      self.company.customers.add_points(self.customer.id, 150)
+    customer = self.reopen(cache=False).customers.find_by_id(self.customer.id)
+    self.assertEqual((customer.points, customer.status), (150, 'Newbie'))
+
+  def test_periods(self):
+    today = controller.today
+    self.company.bookings.add(self.customer.id, today, today + dt.timedelta(days=2), self.car.id)
+    self.company.bookings.add(self.customer.id, today + dt.timedelta(days=10), today + dt.timedelta(days=12), self.car.id)
+    with self.assertRaises(RentalException):
+      self.company.bookings.add(self.customer.id, today + dt.timedelta(days=2), today + dt.timedelta(days=3), self.car.id)
+    self.assertEqual(self.company.bookings.periods.gaps(self.car.id, today + dt.timedelta(days=4), today + dt.timedelta(days=5)), (1, 4))
+    booking = self.company.bookings.add_by_category_id(self.customer.id, today + dt.timedelta(days=4), today + dt.timedelta(days=8), self.category.id)
+    self.assertEqual(booking.car, self.car, 'best fitting car not chosen')
+    self.assertEqual(self.company.bookings.find_available_cars(self.category.id, today + dt.timedelta(days=5), today + dt.timedelta(days=6)), [self.car2])
+    self.assertEqual(self.company.bookings.find_by_period(today + dt.timedelta(days=9), today + dt.timedelta(days=10)), [self.company.bookings.find_by_car_id(self.car.id)[1]])
+
+  def test_cascade(self):
+    booking = self.company.bookings.add(self.customer.id, controller.today, controller.today, self.car.id)
+    self.company.rentals.add(booking.id)
+    self.company.customers.delete(self.customer.id)
+    company = self.reopen(cache=False)
+    self.assertEqual(company.customers.get(), [])
+    self.assertEqual(company.bookings.get(), [])
+    self.assertEqual(company.rentals.get(), [])
+    self.assertEqual(len(company.cars.get()), 2)
+
+  def test_shared(self):
+    other = SqliteBackend(self.path, cache=False)
+    company = other.open()
+    self.assertEqual(company.customers.get(), [self.customer])
+    self.company.customers.add('Random House')
+    self.assertEqual(len(company.customers.get()), 2, 'change not visible to other connection')
+    other.close()
+
+  def test_rollback(self):
+    with self.assertRaises(ValueError):
+      with self.company.transaction():
+        self.company.customers.add('Random House')
+        raise ValueError('failed operation')
+    self.assertEqual(self.backend.query('SELECT name FROM customers'), [('Dandy McDuck',)], 'failed operation committed')
+
+  def test_thread_transactions(self):
+    other = []
+    with self.backend.transaction():
+      self.company.customers.add('Random House')
+      thread = threading.Thread(target=lambda: other.append(self.backend.query('SELECT COUNT(*) FROM customers')[0][0]))
+      thread.start()
+      thread.join()
+    self.assertEqual(other, [1], 'uncommitted change of another thread visible')
+    self.assertEqual(self.backend.query('SELECT COUNT(*) FROM customers')[0][0], 2)
+
+  def test_shared_booking(self):
+    other = SqliteBackend(self.path, cache=False)
+    company = other.open()
+    errors = []
+    def book():
+      try:
+        company.bookings.add(self.customer.id, controller.today, controller.today, self.car.id)
+      except RentalException as e:
+        errors.append(e)
+    with self.company.transaction():
+      self.company.bookings.add(self.customer.id, controller.today, controller.today, self.car.id)
+      thread = threading.Thread(target=book) # Another process booking the same car waits for the transaction
+      thread.start()
+      thread.join(0.2)
+    thread.join()
+    other.close()
+    self.assertEqual(len(errors), 1, 'car booked twice')
+    self.assertEqual(self.backend.query('SELECT COUNT(*) FROM bookings')[0][0], 1)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import pickle
+import threading
+from patterns.observer import Subject, Observer, Change
+from patterns.dispatcher import AsyncDispatcher
+from rental.company import Company
+
+class RecordingObserver(Observer):
+  def __init__(self):
+    self.updates = []
+    self.threads = set()
+
+  def update(self, subject) -> None:
+    pass
+
+  def changed(self, subject, changes) -> None:
+    self.threads.add(threading.current_thread().name)
+    self.updates.append([c.entity for c in changes])
+
+class BlockingObserver(Observer):
+  def __init__(self):
+    self.release = threading.Event()
+    self.started = threading.Event()
+
+  def update(self, subject) -> None:
+    self.started.set()
+    self.release.wait(5)
+
+class AsyncDispatcherTests(unittest.TestCase):
+  def setUp(self):
+    self.subject = Subject()
+    self.observer = RecordingObserver()
+    self.subject.attach(self.observer)
+
+  def make_dispatcher(self, **kwargs):
+    dispatcher = AsyncDispatcher(**kwargs)
+    self.addCleanup(dispatcher.close, 5)
+    self.subject.dispatcher = dispatcher
+    return dispatcher
+
+  def stall(self, dispatcher):
+    # Occupy the worker, so that further updates stay queued
+    blocker = BlockingObserver()
+    other = Subject()
+    other.attach(blocker)
+    other.dispatcher = dispatcher
+    other.notify()
+    self.assertTrue(blocker.started.wait(5), 'worker not started')
+    return blocker
+
+  def test_invalid_policy(self):
+    with self.assertRaises(ValueError):
+      AsyncDispatcher(policy='ignore')
+
+  def test_delivers_on_worker(self):
+    dispatcher = self.make_dispatcher()
+    self.subject.notify(Change('add', 1))
+    self.subject.notify(Change('add', 2))
+    self.assertTrue(dispatcher.flush(5), 'updates not delivered')
+    self.assertEqual(self.observer.updates, [[1], [2]], 'updates not delivered in order')
+    self.assertEqual(self.observer.threads, {'observer-dispatcher'}, 'updates not delivered on worker')
+
+  def test_drop(self):
+    dispatcher = self.make_dispatcher(maxsize=1, policy='drop')
+    blocker = self.stall(dispatcher)
+    self.subject.notify(Change('add', 1))
+    self.subject.notify(Change('add', 2))
+    blocker.release.set()
+    self.assertTrue(dispatcher.flush(5), 'updates not delivered')
+    self.assertEqual(self.observer.updates, [[1]], 'update not dropped')
+    self.assertEqual(dispatcher.dropped, 1, 'dropped update not counted')
+
+  def test_coalesce(self):
+    dispatcher = self.make_dispatcher(maxsize=1, policy='coalesce')
+    blocker = self.stall(dispatcher)
+    self.subject.notify(Change('add', 1))
+    self.subject.notify(Change('add', 2))
+    self.subject.notify(Change('add', 3))
+    blocker.release.set()
+    self.assertTrue(dispatcher.flush(5), 'updates not delivered')
+    self.assertEqual(self.observer.updates, [[1, 2, 3]], 'updates not coalesced')
+    self.assertEqual(dispatcher.coalesced, 2, 'coalesced updates not counted')
+
+  def test_block(self):
+    dispatcher = self.make_dispatcher(maxsize=1, policy='block')
+    blocker = self.stall(dispatcher)
+    self.subject.notify(Change('add', 1))
+    submitter = threading.Thread(target=self.subject.notify, args=[Change('add', 2)])
+    submitter.start()
+    submitter.join(0.1)
+    self.assertTrue(submitter.is_alive(), 'full queue did not block')
+    blocker.release.set()
+    submitter.join(5)
+    self.assertTrue(dispatcher.flush(5), 'updates not delivered')
+    self.assertEqual(self.observer.updates, [[1], [2]], 'blocked update lost')
+
+  def test_close_delivers_synchronously(self):
+    dispatcher = self.make_dispatcher()
+    dispatcher.close(5)
+    self.subject.notify(Change('add', 1))
+    self.assertEqual(self.observer.updates, [[1]], 'update not delivered after close')
+    self.assertEqual(self.observer.threads, {threading.current_thread().name}, 'update not delivered synchronously')
+
+  def test_pickle_without_dispatcher(self):
+    company = Company('Šmertz')
+    company.use_dispatcher(self.make_dispatcher())
+    copy = pickle.loads(pickle.dumps(company))
+    self.assertIsNone(copy.customers.dispatcher, 'dispatcher pickled')
+    self.assertIsNotNone(company.customers.dispatcher, 'dispatcher removed from original')
+
+if __name__ == '__main__':
+  unittest.main()
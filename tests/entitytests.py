@@ -0,0 +1,44 @@
+import unittest
+import pickle
+import datetime as dt
+from rental.cars import Car
+from rental.customers import Customer
+from rental.bookings import Booking
+from rental.categories import Category
+
+class EntityTests(unittest.TestCase):
+  def test_equal_by_id(self):
+    self.assertEqual(Car(1, 'Opel Kadett', 'blue', "A"), Car(1, 'VW Jetta', 'green', "B"), 'cars with same id differ')
+    self.assertNotEqual(Car(1, 'Opel Kadett', 'blue', "A"), Car(2, 'Opel Kadett', 'blue', "A"), 'cars with different ids equal')
+
+  def test_not_equal_across_types(self):
+    self.assertNotEqual(Car(1, 'Opel Kadett', 'blue', "A"), Customer(1, 'Dandy McDuck'), 'different entity types equal')
+    self.assertNotEqual(Category(1, 'A'), 1, 'entity equal to its id')
+
+  def test_hash_by_id(self):
+    customers = {Customer(1, 'Dandy McDuck'), Customer(1, 'Dandy McDuck', 10)}
+    self.assertEqual(len(customers), 1, 'entities with same id hash differently')
+    self.assertIn(Category(3, 'A'), {Category(3, 'B'): True}, 'entity not found by id')
+
+  def test_slots(self):
+    customer = Customer(1, 'Dandy McDuck')
+    self.assertFalse(hasattr(customer, '__dict__'), 'entity has a __dict__')
+    with self.assertRaises(AttributeError):
+      customer.nickname = 'Dandy'
+    customer.points += 10
+    self.assertEqual(customer.points, 10, 'field not writable')
+
+  def test_defaults(self):
+    customer = Customer(1, 'Dandy McDuck')
+    self.assertEqual((customer.points, customer.status), (0, "Basic"), 'defaults not applied')
+
+  def test_pickle(self):
+    customer = Customer(1, 'Dandy McDuck', 10, "Newbie")
+    booking = Booking(2, customer, Car(3, 'Opel Kadett', 'blue', "A"), dt.date(2024, 3, 7), dt.date(2024, 3, 14), "A")
+    copy = pickle.loads(pickle.dumps(booking))
+    self.assertEqual(copy, booking, 'entity changed by pickling')
+    self.assertEqual(copy.period_end, dt.date(2024, 3, 14), 'field lost by pickling')
+    self.assertEqual(copy.customer.status, "Newbie", 'nested field lost by pickling')
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import tempfile
+import threading
+from pathlib import Path
+from rental.ids import IdService
+from rental.company import Company
+from rental import controller
+
+class IdServiceTests(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = str(Path(self.directory.name, 'ids'))
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_sequences(self):
+    ids = IdService()
+    self.assertEqual([ids.next('a'), ids.next('b'), ids.next('a')], [1, 2, 3])
+    self.assertEqual(ids.reserve(2, 'b'), range(4, 6))
+    self.assertEqual(ids.current, 5)
+
+  def test_blocks(self):
+    ids = IdService(block=10)
+    self.assertEqual([ids.next('a'), ids.next('b'), ids.next('a')], [1, 11, 2])
+    self.assertEqual(ids.current, 20)
+    self.assertEqual(ids.reserve(15, 'a'), range(21, 36))
+    self.assertEqual(ids.next('b'), 12)
+
+  def test_set(self):
+    ids = IdService(block=10)
+    ids.next('a')
+    ids.set(100)
+    self.assertEqual(ids.next('a'), 101, 'block held before the reset used')
+    self.assertEqual(ids.current, 110)
+
+  def test_threads(self):
+    ids = IdService(block=7)
+    allocated = [[] for _ in range(8)]
+
+    def allocate(target: list, kind: int):
+      for _ in range(500):
+        target.append(ids.next(kind))
+
+    threads = [threading.Thread(target=allocate, args=(target, i % 2)) for i, target in enumerate(allocated)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    all = [id for target in allocated for id in target]
+    self.assertEqual(len(set(all)), 4000)
+    self.assertLessEqual(max(all), ids.current)
+
+  def test_shared_file(self):
+    first, second = IdService(self.path, block=10), IdService(self.path, block=10)
+    self.assertEqual(first.next(), 1)
+    self.assertEqual(second.next(), 11)
+    self.assertEqual(first.reserve(10), range(21, 31))
+    self.assertEqual(Path(self.path).read_text().strip(), '30')
+
+  def test_restart(self):
+    IdService(self.path, block=10).next()
+    restarted = IdService(self.path, block=10)
+    restarted.set(0) # e.g. restored from an older snapshot
+    self.assertEqual(restarted.next(), 11, 'id reused after restart')
+
+class ControllerIdTests(unittest.TestCase):
+  def setUp(self):
+    self.ids = controller.ids
+
+  def tearDown(self):
+    controller.ids = self.ids
+
+  def test_use_ids(self):
+    controller.setId(41)
+    controller.useIds(IdService(block=5))
+    self.assertEqual(controller.current_id, 41)
+    company = Company('Šmertz')
+    category = company.categories.add('A')
+    customer = company.customers.add('Dandy McDuck')
+    self.assertEqual((category.id, customer.id), (42, 47))
+    self.assertEqual(controller.current_id, 51)
@@ -0,0 +1,55 @@
+import unittest
+import datetime as dt
+from rental.intervals import IntervalIndex
+
+class IntervalIndexTests(unittest.TestCase):
+  def setUp(self):
+    self.index = IntervalIndex()
+
+  def test_overlapping_empty(self):
+    self.assertEqual(self.index.overlapping(1, dt.date(2024, 3, 1), dt.date(2024, 3, 5)), [], 'unexpected overlap')
+
+  def test_overlapping_inclusive(self):
+    self.index.add(1, 10, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+    self.assertEqual(self.index.overlapping(1, dt.date(2024, 3, 5), dt.date(2024, 3, 8)), [10], 'touching end not overlapping')
+    self.assertEqual(self.index.overlapping(1, dt.date(2024, 2, 20), dt.date(2024, 3, 1)), [10], 'touching start not overlapping')
+    self.assertEqual(self.index.overlapping(1, dt.date(2024, 3, 6), dt.date(2024, 3, 8)), [], 'unexpected overlap')
+    self.assertEqual(self.index.overlapping(2, dt.date(2024, 3, 1), dt.date(2024, 3, 5)), [], 'overlap with other key')
+
+  def test_overlapping_long_interval(self):
+    self.index.add(1, 10, dt.date(2024, 1, 1), dt.date(2024, 12, 31))
+    self.index.add(1, 11, dt.date(2024, 3, 1), dt.date(2024, 3, 2))
+    self.index.add(1, 12, dt.date(2024, 6, 1), dt.date(2024, 6, 2))
+    self.assertEqual(self.index.overlapping(1, dt.date(2024, 6, 2), dt.date(2024, 6, 10)), [10, 12], 'overlaps not found')
+
+  def test_gaps(self):
+    self.index.add(1, 10, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+    self.index.add(1, 11, dt.date(2024, 3, 20), dt.date(2024, 3, 25))
+    self.assertEqual(self.index.gaps(1, dt.date(2024, 3, 8), dt.date(2024, 3, 10)), (2, 9), 'wrong gaps')
+    self.assertEqual(self.index.gaps(1, dt.date(2024, 3, 6), dt.date(2024, 3, 19)), (0, 0), 'wrong gaps')
+    self.assertEqual(self.index.gaps(1, dt.date(2024, 2, 1), dt.date(2024, 2, 2)), (None, 27), 'wrong gaps')
+    self.assertEqual(self.index.gaps(2, dt.date(2024, 2, 1), dt.date(2024, 2, 2)), (None, None), 'wrong gaps')
+
+  def test_remove(self):
+    self.index.add(1, 10, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+    self.index.remove(1, 10, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+    self.assertEqual(self.index.overlapping(1, dt.date(2024, 3, 1), dt.date(2024, 3, 5)), [], 'interval not removed')
+    self.assertNotIn(1, self.index.intervals, 'empty key kept')
+
+  def test_remove_longest(self):
+    self.index.add(1, 10, dt.date(2024, 1, 1), dt.date(2024, 12, 31))
+    self.index.add(1, 11, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+    self.index.add(1, 12, dt.date(2024, 6, 1), dt.date(2024, 6, 3))
+    self.index.remove(1, 10, dt.date(2024, 1, 1), dt.date(2024, 12, 31))
+    self.assertEqual(self.index.spans[1], 4, 'span not narrowed after removing the longest interval')
+    self.assertEqual(self.index.overlapping(1, dt.date(2024, 3, 5), dt.date(2024, 6, 1)), [11, 12], 'overlaps not found')
+    self.index.remove(1, 11, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+    self.assertEqual(self.index.spans[1], 2, 'span not narrowed after removing the longest interval')
+
+  def test_remove_missing(self):
+    self.index.add(1, 10, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+    with self.assertRaises(KeyError):
+      self.index.remove(1, 11, dt.date(2024, 3, 1), dt.date(2024, 3, 5))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Full
+from patterns.jobs import Jobs, RestartingExecutor
+
+def square(x):
+  return x * x
+
+def fail(x):
+  raise ValueError(f'cannot handle {x}')
+
+def crash(x):
+  if x < 0:
+    os._exit(1)
+  return x * x
+
+class JobsTests(unittest.TestCase):
+  def test_process_pool(self):
+    jobs = Jobs(square, ProcessPoolExecutor(2))
+    submitted = [jobs.submit(i) for i in range(5)]
+    for job in submitted:
+      self.assertTrue(job.wait(30))
+    jobs.close()
+    self.assertEqual([jobs.get(job.id).result for job in submitted], [0, 1, 4, 9, 16])
+    self.assertEqual(jobs.get(submitted[2].id).to_dict()['status'], 'done')
+
+  def test_failure(self):
+    jobs = Jobs(fail, ThreadPoolExecutor(1))
+    job = jobs.submit(3)
+    self.assertTrue(job.wait(5))
+    jobs.close()
+    self.assertEqual((job.status, job.result), ('failed', None))
+    self.assertIn('cannot handle 3', job.error)
+
+  def test_pending(self):
+    release = threading.Event()
+    jobs = Jobs(lambda: release.wait(5), ThreadPoolExecutor(1), max_pending=2)
+    first, second = jobs.submit(), jobs.submit()
+    self.assertEqual(second.status, 'pending')
+    self.assertFalse(first.wait(0.01))
+    with self.assertRaises(Full):
+      jobs.submit()
+    self.assertEqual((jobs.metrics()['unfinished'], jobs.metrics()['rejected']), (2, 1))
+    release.set()
+    jobs.close()
+    self.assertEqual((first.status, second.status), ('done', 'done'))
+    self.assertIs(jobs.get(first.id), first)
+
+  def test_broken_pool(self):
+    executor = RestartingExecutor(lambda: ProcessPoolExecutor(1))
+    jobs = Jobs(crash, executor)
+    crashed = jobs.submit(-1)
+    self.assertTrue(crashed.wait(30))
+    self.assertEqual(crashed.status, 'failed')
+    job = jobs.submit(3)
+    self.assertTrue(job.wait(30))
+    jobs.close()
+    self.assertEqual((job.result, executor.restarts), (9, 1))
+
+  def test_retention(self):
+    jobs = Jobs(square, ThreadPoolExecutor(1), retention=3)
+    submitted = [jobs.submit(i) for i in range(6)]
+    jobs.close()
+    self.assertEqual([jobs.get(job.id) for job in submitted[:3]], [None] * 3, 'finished jobs retained beyond the limit')
+    self.assertEqual([jobs.get(job.id).result for job in submitted[3:]], [9, 16, 25])
+    self.assertIsNone(jobs.get('unknown'))
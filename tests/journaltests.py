@@ -0,0 +1,213 @@
+import unittest
+import tempfile
+import shutil
+import threading
+import time
+import datetime as dt
+from pathlib import Path
+from rental.company import Company
+from rental.journal import Journal
+from rental.snapshot import Lazy, Snapshot
+from unittest import mock
+from rental.exceptions import RentalException
+from rental import controller
+
+class JournalTests(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.journal = Journal(self.directory.name, sync=False)
+    self.company = Company('Šmertz')
+    self.journal.attach(self.company)
+    self.category = self.company.categories.add('A')
+    self.car = self.company.cars.add('D12', 'blue', self.category.id)
+    self.customer = self.company.customers.add('Dandy McDuck')
+
+  def tearDown(self):
+    self.journal.close()
+    self.directory.cleanup()
+
+  def recover(self):
+    self.journal.close()
+    id = controller.current_id
+    controller.setId(0)
+    journal = Journal(self.directory.name, sync=False)
+    company = journal.recover()
+    self.assertEqual(controller.current_id, id, 'current id not recovered')
+    journal.close()
+    return company
+
+  def test_replay(self):
+    booking = self.company.bookings.add(self.customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+    self.company.rentals.add(booking.id)
+    company = self.recover()
+    self.assertEqual(company.categories.get(), [self.category])
+    self.assertEqual(company.cars.get(), [self.car])
+    recovered = company.bookings.find_by_id(booking.id)
+    self.assertEqual((recovered.period_start, recovered.period_end), (booking.period_start, booking.period_end))
+    self.assertIs(recovered.car, company.cars.find_by_id(self.car.id))
+    self.assertIs(recovered.customer, company.customers.find_by_id(self.customer.id))
+    self.assertEqual(company.rentals.find_by_booking_id(booking.id).car, self.car)
+    self.assertEqual(company.statistics['rentals'].count, 1)
+
+  def test_replay_deletes(self):
+    booking = self.company.bookings.add(self.customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+    self.company.rentals.add(booking.id)
+    self.company.categories.delete(self.category.id)
+    company = self.recover()
+    self.assertEqual(company.categories.get(), [])
+    self.assertEqual(company.cars.get(), [])
+    self.assertEqual(company.bookings.get(), [])
+    self.assertEqual(company.rentals.get(), [])
+    self.assertEqual(company.customers.get(), [self.customer])
+    self.assertEqual(company.statistics['bookings'].count, 0)
+
+  def test_replay_points(self):
+    with self.assertRaises(RentalException):
+      self.company.customers.add_points(self.customer.id, 150)
+    self.company.customers.subtract_points(self.customer.id, 20)
+    company = self.recover()
+    customer = company.customers.find_by_id(self.customer.id)
+    self.assertEqual((customer.points, customer.status), (130, 'Newbie'))
+    self.assertEqual(company.statistics['points'].points, 130)
+
+  def test_snapshot(self):
+    self.journal.snapshot_every = 3
+    self.assertTrue(self.journal.checkpoint())
+    self.assertEqual(Path(self.directory.name, Journal.JOURNAL).stat().st_size, 0)
+    self.company.customers.add('Random House')
+    self.assertFalse(self.journal.checkpoint())
+    company = self.recover()
+    self.assertEqual([c.name for c in company.customers.get()], ['Dandy McDuck', 'Random House'])
+
+  def test_recover_lazily(self):
+    booking = self.company.bookings.add(self.customer.id, controller.today, controller.today, self.car.id)
+    self.journal.snapshot()
+    self.company.customers.add('Random House')
+    company = self.recover()
+    self.assertIsInstance(company.bookings.bookings, Lazy, 'bookings loaded eagerly')
+    self.assertEqual(len(company.customers.get()), 2)
+    self.assertEqual(company.bookings.get(), [booking])
+
+  def test_recover_available_cars(self):
+    self.company.bookings.add(self.customer.id, controller.today, controller.today, self.car.id)
+    self.journal.snapshot()
+    company = self.recover()
+    self.assertEqual(company.bookings.find_available_cars(self.category.id, controller.today, controller.today), [], 'booked car available')
+
+  def test_concurrent_lazy_load(self):
+    days = [controller.today + dt.timedelta(days=2 * i) for i in range(50)]
+    self.company.bookings.add_many([(self.customer.id, day, day, self.car.id) for day in days])
+    self.journal.snapshot()
+    company = self.recover()
+    started = threading.Event()
+    rows = Snapshot.rows
+
+    def slow(snapshot, name, cls):
+      for row in rows(snapshot, name, cls):
+        started.set()
+        time.sleep(0.002)
+        yield row
+
+    with mock.patch.object(Snapshot, 'rows', slow):
+      loader = threading.Thread(target=company.bookings.get)
+      loader.start()
+      self.assertTrue(started.wait(5))
+      self.assertEqual(len(company.bookings.get()), 50, 'section seen half loaded')
+      with self.assertRaises(RentalException):
+        company.bookings.add(self.customer.id, days[-1], days[-1], self.car.id)
+      loader.join()
+
+  def test_snapshot_after_lazy_recovery(self):
+    booking = self.company.bookings.add(self.customer.id, controller.today, controller.today, self.car.id)
+    self.journal.snapshot()
+    self.journal.close()
+    journal = Journal(self.directory.name, sync=False)
+    company = journal.recover()
+    mapped = journal.loaded.map
+    journal.snapshot()
+    self.assertTrue(mapped.closed, 'replaced snapshot still mapped')
+    self.assertEqual(company.bookings.get(), [booking], 'unloaded section lost')
+    company.customers.add('Random House')
+    journal.snapshot()
+    journal.close()
+    self.assertEqual(self.recover().bookings.get(), [booking])
+
+  def test_journal_proportional_to_change(self):
+    self.journal.snapshot()
+    path = Path(self.directory.name, Journal.JOURNAL)
+    self.company.customers.add_many([f'Customer {i}' for i in range(100)])
+    size = path.stat().st_size
+    self.company.customers.add('Random House')
+    self.assertLess(path.stat().st_size - size, 100)
+
+  def test_stale_records_skipped(self):
+    path = Path(self.directory.name, Journal.JOURNAL)
+    self.company.customers.add('Random House')
+    records = path.read_bytes()
+    self.journal.snapshot()
+    path.write_bytes(records) # Crash before the journal was emptied
+    company = self.recover()
+    self.assertEqual(len(company.customers.get()), 2)
+
+  def test_torn_record(self):
+    self.company.customers.add('Random House')
+    self.journal.close()
+    path = Path(self.directory.name, Journal.JOURNAL)
+    with open(path, 'a') as file:
+      file.write('[99,1,"customers","add",[99,"Torn')
+    company = self.recover()
+    self.assertEqual(len(company.customers.get()), 2)
+    self.assertTrue(path.read_bytes().endswith(b'\n'))
+
+  def test_set_id(self):
+    self.journal.set_id(controller.current_id + 100)
+    self.recover()
+
+  def test_columnar(self):
+    company = Company('Šmertz', columnar_bookings=True)
+    self.journal.attach(company)
+    car = company.cars.add('D12', 'blue', 'A')
+    customer = company.customers.add('Random House')
+    company.bookings.add(customer.id, controller.today, controller.today, car.id)
+    recovered = self.recover()
+    self.assertEqual(len(recovered.bookings.get()), 1)
+    self.assertEqual(recovered.bookings.get()[0].car, car)
+
+  def test_group_commit(self):
+    self.journal.detach()
+    self.journal.close()
+    self.journal = Journal(self.directory.name, sync=False, window=0.01)
+    self.journal.attach(self.company)
+    for i in range(10):
+      self.company.customers.add(f'Customer {i}')
+    self.assertTrue(self.journal.wait_durable(timeout=5))
+    self.assertLess(self.journal.writer.commits, 10, 'records not committed in groups')
+    self.journal.snapshot_every = 5
+    self.assertTrue(self.journal.checkpoint())
+    self.company.customers.add('Random House')
+    company = self.recover()
+    self.assertEqual(len(company.customers.get()), 12)
+
+  def test_migrate_baseline_pickle(self):
+    self.journal.close()
+    with tempfile.TemporaryDirectory() as directory: # Written by the web app before the journal existed
+      shutil.copy(Path(__file__).parent / 'data' / 'baseline_state.data', Path(directory, Journal.LEGACY_SNAPSHOT))
+      journal = Journal(directory, sync=False)
+      company = journal.recover()
+      journal.close()
+    self.assertEqual(company.name, 'Šmertz')
+    self.assertEqual(controller.current_id, 8)
+    self.assertEqual([(c.name, c.points, c.status) for c in company.customers.get()], [('Dandy McDuck', 2, 'Basic'), ('Random House', 0, 'Basic')])
+    self.assertEqual([c.model for c in company.cars.get()], ['D12', 'E34'])
+    booking = company.bookings.find_by_id(6)
+    self.assertIs(booking.car, company.cars.find_by_id(2))
+    self.assertIs(company.rentals.find_by_booking_id(6).booking, booking)
+    self.assertEqual(company.bookings.find_available_cars(1, booking.period_start, booking.period_start), [], 'booked cars available')
+    self.assertEqual((company.statistics['bookings'].count, company.statistics['points'].points), (2, 2))
+
+  def test_not_persisted(self):
+    with tempfile.TemporaryDirectory() as directory:
+      self.assertIsNone(Journal(directory).recover())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from patterns.observer import Subject, Observer, Recorder, Change
+
+class RecordingObserver(Observer):
+  def __init__(self):
+    self.updates = []
+
+  def update(self, subject) -> None:
+    self.updates.append(None)
+
+  def changed(self, subject, changes) -> None:
+    self.updates.append(changes)
+
+class PlainObserver(Observer):
+  def __init__(self):
+    self.updates = 0
+
+  def update(self, subject) -> None:
+    self.updates += 1
+
+class ListRecorder(Recorder):
+  def __init__(self):
+    self.records = []
+
+  def record(self, subject, changes) -> None:
+    self.records.extend(changes)
+
+class SubjectTests(unittest.TestCase):
+  def setUp(self):
+    self.subject = Subject()
+    self.observer = RecordingObserver()
+    self.subject.attach(self.observer)
+
+  def test_notify(self):
+    change = Change('add', 'entity')
+    self.subject.notify(change)
+    self.assertEqual(self.observer.updates, [[change]], 'change not passed on')
+
+  def test_notify_without_changes(self):
+    self.subject.notify()
+    self.assertEqual(self.observer.updates, [[]], 'observer not notified')
+
+  def test_update_by_default(self):
+    observer = PlainObserver()
+    self.subject.attach(observer)
+    self.subject.notify_points()
+    self.assertEqual(observer.updates, 1, 'update not called')
+
+  def test_detach(self):
+    self.subject.detach(self.observer)
+    self.subject.notify()
+    self.assertEqual(self.observer.updates, [], 'detached observer notified')
+
+  def test_batch_coalesces(self):
+    with self.subject.batch():
+      self.subject.notify(Change('add', 1))
+      with self.subject.batch():
+        self.subject.notify(Change('add', 2))
+        self.subject.notify_points(Change('points', 1, 5))
+      self.assertEqual(self.observer.updates, [], 'observer notified inside batch')
+    self.assertEqual(self.observer.updates, [[Change('add', 1), Change('add', 2), Change('points', 1, 5)]], 'changes not coalesced')
+
+  def test_batch_without_changes(self):
+    with self.subject.batch():
+      pass
+    self.assertEqual(self.observer.updates, [], 'observer notified without changes')
+
+  def test_batch_dispatches_on_exception(self):
+    with self.assertRaises(ValueError):
+      with self.subject.batch():
+        self.subject.notify(Change('add', 1))
+        raise ValueError()
+    self.assertEqual(self.observer.updates, [[Change('add', 1)]], 'changes lost on exception')
+    self.subject.notify()
+    self.assertEqual(len(self.observer.updates), 2, 'batch not closed on exception')
+
+  def test_recorder_not_batched(self):
+    recorder = ListRecorder()
+    self.subject.recorders.append(recorder)
+    change = Change('add', 'entity')
+    with self.subject.batch():
+      self.subject.notify(change)
+      self.subject.notify()
+      self.assertEqual(recorder.records, [change], 'change not recorded immediately')
+    self.assertEqual(self.observer.updates, [[change]])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from rental.registry import Registry
+from rental.cars import Car
+
+class RegistryTests(unittest.TestCase):
+  def setUp(self):
+    self.registry = Registry()
+    self.car1 = Car(1, 'Opel Kadett', 'blue', "A")
+    self.car2 = Car(2, 'VW Jetta', 'green', "B")
+    self.car3 = Car(3, 'Bon Voyage', 'red', "A")
+
+  def test_empty(self):
+    self.assertEqual(len(self.registry), 0, 'registry not empty')
+    self.assertEqual(self.registry.values(), [], 'registry not empty')
+
+  def test_add_lookup(self):
+    self.registry.add(self.car1)
+    self.assertIs(self.registry.lookup(1), self.car1, 'entity not found by id')
+    self.assertIsNone(self.registry.lookup(2), 'unexpected entity found')
+
+  def test_lookup_unhashable(self):
+    self.assertIsNone(self.registry.lookup([1]), 'unexpected entity found')
+
+  def test_add_duplicate(self):
+    self.registry.add(self.car1)
+    with self.assertRaises(KeyError):
+      self.registry.add(Car(1, 'Opel Kadett', 'blue', "A"))
+
+  def test_remove(self):
+    self.registry.add(self.car1)
+    self.registry.add(self.car2)
+    self.assertIs(self.registry.remove(1), self.car1, 'wrong entity removed')
+    self.assertNotIn(self.car1, self.registry, 'entity not removed')
+    self.assertIn(self.car2, self.registry, 'wrong entity removed')
+
+  def test_remove_missing(self):
+    with self.assertRaises(KeyError):
+      self.registry.remove(1)
+
+  def test_insertion_order(self):
+    for car in [self.car3, self.car1, self.car2]:
+      self.registry.add(car)
+    self.registry.remove(1)
+    self.registry.add(self.car1)
+    self.assertEqual(self.registry.values(), [self.car3, self.car2, self.car1], 'insertion order not kept')
+
+  def test_find_index(self):
+    registry = Registry(category='category')
+    for car in [self.car1, self.car2, self.car3]:
+      registry.add(car)
+    self.assertEqual(registry.find('category', "A"), [self.car1, self.car3], 'entities not found by index')
+    self.assertEqual(registry.find('category', "C"), [], 'unexpected entities found by index')
+
+  def test_find_index_after_remove(self):
+    registry = Registry(category='category')
+    for car in [self.car1, self.car2, self.car3]:
+      registry.add(car)
+    registry.remove(self.car1.id)
+    registry.remove(self.car2.id)
+    self.assertEqual(registry.find('category', "A"), [self.car3], 'index not updated on remove')
+    self.assertNotIn("B", registry.indexes['category'], 'empty index bucket kept')
+
+  def test_add_unhashable_key(self):
+    registry = Registry(category='category')
+    with self.assertRaises(TypeError):
+      registry.add(Car(4, 'Opel Kadett', 'blue', ["A"]))
+    self.assertIsNone(registry.lookup(4), 'entity stored despite failing index')
+
+  def test_values_read_only(self):
+    self.registry.add(self.car1)
+    cars = self.registry.values()
+    with self.assertRaises((AttributeError, TypeError)):
+      cars.append(self.car2)
+    with self.assertRaises(TypeError):
+      cars[0] = self.car2
+    self.assertEqual(len(self.registry), 1, 'registry modified through view')
+
+  def test_values_versioned(self):
+    self.registry.add(self.car1)
+    cars = self.registry.values()
+    self.assertIs(self.registry.values(), cars, 'unchanged registry copied again')
+    self.registry.add(self.car2)
+    self.assertEqual(cars, [self.car1], 'view changed with the registry')
+    self.assertEqual(self.registry.values(), [self.car1, self.car2])
+    self.assertGreater(self.registry.values().version, cars.version)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import datetime as dt
 from rental.rentals import Rental, Rentals
+from rental.bookings import Booking
 from rental.exceptions import RentalException
 from rental.company import Company
 from rental.categories import Categories
@@ -55,15 +56,25 @@ class RentalsTests(unittest.TestCase):
 
   def test_add_exception_already_rented(self):
     # Raise RentalException if a booking is for a specific car and that car is already rented.
+    # Overlapping bookings are rejected when booking, so the second one is stored bypassing the check.
     customer1 = self.company.customers.add('Random House')
     customer2 = self.company.customers.add('Mega Corp')
     car = self.company.cars.add('VW Jetta', 'green', "B")
     booking1 = self.company.bookings.add(customer1.id, controller.today, controller.today + dt.timedelta(days=10), car.id)
-    booking2 = self.company.bookings.add(customer2.id, controller.today, controller.today + dt.timedelta(days=10), car.id)
+    booking2 = Booking(controller.nextId(), customer2, car, controller.today, controller.today + dt.timedelta(days=10), "B")
+    self.company.bookings.bookings.add(booking2)
     self.rentals.add(booking1.id)
     with self.assertRaises(RentalException):
       self.rentals.add(booking2.id)
 
+  def test_add_exception_already_booked(self):
+    customer1 = self.company.customers.add('Random House')
+    customer2 = self.company.customers.add('Mega Corp')
+    car = self.company.cars.add('VW Jetta', 'green', "B")
+    self.company.bookings.add(customer1.id, controller.today, controller.today + dt.timedelta(days=10), car.id)
+    with self.assertRaises(RentalException):
+      self.company.bookings.add(customer2.id, controller.today + dt.timedelta(days=5), controller.today + dt.timedelta(days=12), car.id)
+
   def test_get_empty(self):
     self.assertEqual(self.rentals.get(), [], "rentals not retrieved")
 
@@ -101,6 +112,13 @@ class RentalsTests(unittest.TestCase):
       self.assertEqual(self.rentals.find_by_customer_id(rental1.booking.customer.id), [rental1], "rental not found by customer id")
       self.assertEqual(self.rentals.find_by_customer_id(rental2.booking.customer.id), [rental2], "rental not found by customer id")
 
+  def test_find_by_car_id(self):
+    with suppress(RentalException):
+      rental1, rental2 = self.fill_rentals()
+      self.assertEqual(self.rentals.find_by_car_id(rental1.car.id), [rental1], "rental not found by car id")
+      self.rentals.delete(rental1.id)
+      self.assertEqual(self.rentals.find_by_car_id(rental1.car.id), [], "deleted rental found by car id")
+
   def test_calculate_points(self):
     customer1 = self.company.customers.add('Random House')
     car = self.company.cars.add('VW Jetta', 'green', "B")
@@ -0,0 +1,113 @@
+import unittest
+import threading
+import pickle
+import datetime as dt
+from patterns.rwlock import ReadWriteLock
+from rental.company import Company
+from rental.exceptions import RentalException
+from rental import controller
+
+class ReadWriteLockTests(unittest.TestCase):
+  def setUp(self):
+    self.lock = ReadWriteLock()
+
+  def test_concurrent_readers(self):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def read():
+      with self.lock.read():
+        barrier.wait() # Only passes if all readers hold the lock at once
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+      thread.start()
+    barrier.wait()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(self.lock.readers, 0)
+
+  def test_writer_excludes(self):
+    entered = threading.Event()
+
+    def read():
+      with self.lock.read():
+        entered.set()
+
+    with self.lock.write():
+      thread = threading.Thread(target=read)
+      thread.start()
+      self.assertFalse(entered.wait(0.05), 'reader entered while writing')
+    self.assertTrue(entered.wait(5))
+    thread.join()
+
+  def test_writer_preferred(self):
+    written, read = threading.Event(), threading.Event()
+
+    def write():
+      with self.lock.write():
+        written.set()
+
+    def read_late():
+      with self.lock.read():
+        read.set()
+
+    with self.lock.read():
+      writer = threading.Thread(target=write)
+      writer.start()
+      while self.lock.waiting == 0:
+        pass
+      reader = threading.Thread(target=read_late)
+      reader.start()
+      self.assertFalse(read.wait(0.05), 'reader overtook a waiting writer')
+      with self.lock.read(): # Reentrant reads pass a waiting writer
+        pass
+    writer.join()
+    reader.join()
+    self.assertTrue(written.is_set() and read.is_set())
+
+  def test_reentrant(self):
+    with self.lock.write():
+      with self.lock.write():
+        with self.lock.read():
+          pass
+      self.assertEqual(self.lock.writer, threading.get_ident())
+    self.assertIsNone(self.lock.writer)
+    with self.lock.read():
+      with self.assertRaises(RuntimeError):
+        self.lock.acquire_write()
+
+class CompanyLockTests(unittest.TestCase):
+  def setUp(self):
+    self.company = Company('Šmertz')
+    category = self.company.categories.add('A')
+    self.car = self.company.cars.add('D12', 'blue', category.id)
+    self.customers = self.company.customers.add_many([f'Customer {i}' for i in range(8)])
+
+  def test_concurrent_bookings(self):
+    barrier = threading.Barrier(len(self.customers), timeout=5)
+    failures = []
+
+    def book(customer):
+      barrier.wait()
+      try:
+        self.company.bookings.add(customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+      except RentalException:
+        failures.append(customer)
+
+    threads = [threading.Thread(target=book, args=(customer,)) for customer in self.customers]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(self.company.bookings.get()), 1, 'car booked twice for the same period')
+    self.assertEqual(len(failures), len(self.customers) - 1)
+
+  def test_batch_writes(self):
+    with self.company.batch():
+      self.assertEqual(self.company.lock.writer, threading.get_ident())
+    self.assertIsNone(self.company.lock.writer)
+
+  def test_pickle(self):
+    copy = pickle.loads(pickle.dumps(self.company))
+    self.assertIsNot(copy.lock, self.company.lock)
+    self.assertEqual(copy.customers.get(), self.customers)
@@ -0,0 +1,115 @@
+import unittest
+import tempfile
+import os
+import datetime as dt
+from rental.company import Company
+from rental.snapshot import Snapshot, Lazy, write_snapshot, HEADER, ENTRY, MAGIC
+from rental import controller
+
+class SnapshotTests(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'state.snap')
+    self.company = Company('Šmertz')
+    self.category = self.company.categories.add('A')
+    self.car = self.company.cars.add('D12', 'blue', self.category.id)
+    self.customer = self.company.customers.add('Dandy McDuck')
+    self.booking = self.company.bookings.add(self.customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+    self.rental = self.company.rentals.add(self.booking.id)
+    self.snapshots = []
+
+  def tearDown(self):
+    for snapshot in self.snapshots:
+      snapshot.close()
+    self.directory.cleanup()
+
+  def write(self, company, path=None):
+    with open(path or self.path, 'wb') as file:
+      write_snapshot(file, company, {'current_id': controller.current_id})
+
+  def read(self, path=None):
+    snapshot = Snapshot(path or self.path)
+    self.snapshots.append(snapshot)
+    return snapshot
+
+  def test_header(self):
+    self.write(self.company)
+    snapshot = self.read()
+    self.assertEqual(snapshot.version, 1)
+    self.assertEqual(list(snapshot.sections), ['company', 'categories', 'customers', 'cars', 'bookings', 'rentals'])
+    self.assertEqual(snapshot.count('bookings'), 1)
+    self.assertEqual(snapshot.metadata['name'], 'Šmertz')
+    self.assertEqual(snapshot.metadata['current_id'], controller.current_id)
+
+  def test_lazy(self):
+    self.write(self.company)
+    company = self.read().load()
+    self.assertEqual(company.cars.get(), [self.car])
+    self.assertIsInstance(company.bookings.bookings, Lazy)
+    self.assertEqual(company.statistics['bookings'].count, 1, 'count not known before loading')
+    self.assertEqual(company.statistics['cars'].count, 1)
+    self.assertFalse(company.bookings.bookings.section.loaded)
+    rental = company.rentals.find_by_booking_id(self.booking.id)
+    self.assertFalse(isinstance(company.bookings.bookings, Lazy), 'bookings not loaded for rentals')
+    self.assertIs(rental.booking, company.bookings.find_by_id(self.booking.id))
+    self.assertIs(rental.booking.customer, company.customers.find_by_id(self.customer.id))
+    self.assertEqual(company.statistics['bookings'].count, 1, 'bookings counted twice')
+
+  def test_lazy_periods(self):
+    self.write(self.company)
+    company = self.read().load()
+    with self.assertRaises(Exception):
+      company.bookings.add(self.customer.id, controller.today, controller.today, self.car.id)
+    self.assertEqual(len(company.bookings.get()), 1)
+
+  def test_unloaded_sections_copied(self):
+    self.write(self.company)
+    company = self.read().load()
+    company.customers.add('Random House')
+    copy = os.path.join(self.directory.name, 'copy.snap')
+    self.write(company, copy)
+    self.assertTrue(company.bookings.bookings.section.loaded == False)
+    company = self.read(copy).load()
+    self.assertEqual(len(company.customers.get()), 2)
+    self.assertEqual(company.bookings.find_by_id(self.booking.id).car, self.car)
+
+  def test_schema_drift(self):
+    # Customers written without status, but with a field which no longer exists
+    sections = [('company', b'{"name": "Old", "current_id": 7}\n', 0),
+                ('customers', b'["id","email","name","points"]\n[7,"dandy@duck.com","Dandy McDuck",12]\n', 1)]
+    offset = HEADER.size + ENTRY.size * len(sections)
+    with open(self.path, 'wb') as file:
+      file.write(HEADER.pack(MAGIC, 1, len(sections)))
+      for name, data, count in sections:
+        file.write(ENTRY.pack(name.encode(), offset, len(data), count))
+        offset += len(data)
+      for _, data, _ in sections:
+        file.write(data)
+    company = self.read().load()
+    self.assertEqual(company.name, 'Old')
+    customer = company.customers.find_by_id(7)
+    self.assertEqual((customer.name, customer.points, customer.status), ('Dandy McDuck', 12, 'Basic'))
+    self.assertEqual(company.bookings.get(), [])
+
+  def test_columnar(self):
+    company = Company('Šmertz', columnar_bookings=True)
+    car = company.cars.add('D12', 'blue', 'A')
+    customer = company.customers.add('Random House')
+    booking = company.bookings.add(customer.id, controller.today, controller.today, car.id)
+    self.write(company)
+    company = self.read().load()
+    self.assertEqual(company.bookings.get(), [booking])
+    self.assertTrue(company.columnar_bookings)
+
+  def test_not_a_snapshot(self):
+    with open(self.path, 'wb') as file:
+      file.write(HEADER.pack(b'NOTSNAPS', 1, 0))
+    with self.assertRaises(ValueError):
+      Snapshot(self.path)
+    with open(self.path, 'wb') as file:
+      file.write(HEADER.pack(MAGIC, 99, 0))
+    with self.assertRaises(ValueError):
+      Snapshot(self.path)
+
+if __name__ == '__main__':
+  unittest.main()
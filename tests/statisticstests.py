@@ -0,0 +1,86 @@
+import unittest
+import threading
+import datetime as dt
+from rental.company import Company
+from rental.exceptions import RentalException
+from rental import controller
+from patterns.observer import Observer
+from patterns.dispatcher import AsyncDispatcher
+from contextlib import suppress
+
+class StatisticsTests(unittest.TestCase):
+  def setUp(self):
+    self.company = Company('Šmertz')
+    self.stats = self.company.statistics
+
+  def test_empty(self):
+    self.assertEqual(self.stats['customers'].count, 0)
+    self.assertEqual(self.stats['points'].average(), 0)
+
+  def test_counts(self):
+    customer = self.company.customers.add('Random House')
+    car1 = self.company.cars.add('D12', 'blue', 1)
+    car2 = self.company.cars.add('VW Jetta', 'green', 2)
+    booking = self.company.bookings.add(customer.id, controller.today, controller.today + dt.timedelta(days=2), car1.id)
+    self.company.rentals.add(booking.id)
+    self.assertEqual(self.stats['customers'].count, 1)
+    self.assertEqual(self.stats['cars'].count, 2)
+    self.assertEqual(self.stats['bookings'].count, 1)
+    self.assertEqual(self.stats['rentals'].count, 1)
+    self.company.cars.delete(car1.id)
+    self.assertEqual(self.stats['cars'].count, 1)
+    self.assertEqual(self.stats['cars'].categories, {2: 1})
+    self.assertEqual(self.stats['bookings'].count, 0)
+    self.assertEqual(self.stats['rentals'].count, 0)
+
+  def test_add_many(self):
+    self.company.cars.add_many([('D12', 'blue', 1), ('D13', 'blue', 1), ('VW Jetta', 'green', 2)])
+    self.assertEqual(self.stats['cars'].count, 3)
+    self.assertEqual(self.stats['cars'].categories, {1: 2, 2: 1})
+
+  def test_points(self):
+    c1 = self.company.customers.add('Random House')
+    c2 = self.company.customers.add('Mega Corp')
+    self.company.customers.add_points(c1.id, 30)
+    with suppress(RentalException):
+      self.company.customers.add_points(c2.id, 150)
+    self.assertEqual(self.stats['points'].points, 180)
+    self.assertEqual(self.stats['points'].average(), 90)
+    self.assertEqual(self.stats['points'].tiers, {'Basic': 1, 'Newbie': 1})
+    self.company.customers.delete(c2.id)
+    self.assertEqual(self.stats['points'].points, 30)
+    self.assertEqual(self.stats['points'].tiers, {'Basic': 1})
+
+  def test_points_coalesced(self):
+    with self.company.batch():
+      customer = self.company.customers.add('Random House')
+      with suppress(RentalException):
+        self.company.customers.add_points(customer.id, 150)
+      with suppress(RentalException):
+        self.company.customers.add_points(customer.id, 150)
+      other = self.company.customers.add('Mega Corp')
+      self.company.customers.delete(other.id)
+    self.assertEqual(self.stats['points'].count, 1)
+    self.assertEqual(self.stats['points'].points, 300)
+    self.assertEqual(self.stats['points'].tiers, {'Expert': 1})
+
+  def test_dropped_updates(self):
+    release = threading.Event()
+
+    class Slow(Observer):
+      def update(self, subject):
+        release.wait(5)
+
+    dispatcher = AsyncDispatcher(maxsize=1, policy='drop')
+    self.company.cars.attach(Slow())
+    self.company.use_dispatcher(dispatcher)
+    cars = [self.company.cars.add('D12', 'blue', i % 2) for i in range(5)]
+    self.company.cars.delete(cars[0].id)
+    self.assertGreater(dispatcher.dropped, 0)
+    release.set()
+    dispatcher.close()
+    self.assertEqual(self.stats['cars'].count, 4)
+    self.assertEqual(self.stats['cars'].categories, {0: 2, 1: 2})
+
+if __name__ == '__main__':
+  unittest.main()
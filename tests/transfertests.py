@@ -0,0 +1,113 @@
+import io
+import json
+import unittest
+import tempfile
+import datetime as dt
+from contextlib import redirect_stderr
+from pathlib import Path
+from unittest import mock
+from rental.company import Company
+from rental.journal import Journal
+from rental.database import SqliteBackend, SqlRegistry
+from rental.transfer import export_company, import_company, chunks, main
+from rental.exceptions import RentalException
+from rental import controller
+
+class TransferTests(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.company = Company('Šmertz')
+    self.category = self.company.categories.add('A')
+    self.car = self.company.cars.add('D12', 'blue', self.category.id)
+    self.customer = self.company.customers.add('Dandy, "the" McDuck')
+    self.booking = self.company.bookings.add(self.customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+    self.rental = self.company.rentals.add(self.booking.id)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def transfer(self, format: str, chunk_size: int = 10000) -> Company:
+    with redirect_stderr(io.StringIO()):
+      exported = export_company(self.company, self.directory.name, format)
+      id = controller.current_id
+      controller.setId(0)
+      company = Company('Copy')
+      imported = import_company(company, self.directory.name, format, chunk_size)
+    self.assertEqual(exported, imported)
+    self.assertEqual(controller.current_id, id, 'current id not continued')
+    return company
+
+  def assertCopied(self, company: Company):
+    self.assertEqual(company.categories.get(), [self.category])
+    self.assertEqual(company.cars.get()[0].category, self.category.id)
+    customer = company.customers.get()[0]
+    self.assertEqual((customer.name, customer.points, customer.status), (self.customer.name, self.customer.points, self.customer.status))
+    booking = company.bookings.get()[0]
+    self.assertEqual((booking.customer, booking.car, booking.period_start, booking.period_end), (self.customer, self.car, self.booking.period_start, self.booking.period_end))
+    self.assertEqual(company.rentals.get(), [self.rental])
+    self.assertEqual(company.cars.find_by_category_id(self.category.id), [self.car])
+    self.assertEqual(company.statistics['rentals'].count, 1)
+
+  def test_jsonl(self):
+    self.assertCopied(self.transfer('jsonl'))
+
+  def test_csv(self):
+    self.assertCopied(self.transfer('csv'))
+
+  def test_chunks(self):
+    self.assertEqual(list(chunks(range(5), 2)), [[0, 1], [2, 3], [4]])
+    customers = [self.company.customers.add(f'Customer {i}') for i in range(5)]
+    company = self.transfer('jsonl', chunk_size=2)
+    self.assertEqual(company.customers.get(), [self.customer] + customers)
+
+  def test_unknown_reference(self):
+    with redirect_stderr(io.StringIO()):
+      export_company(self.company, self.directory.name)
+      Path(self.directory.name, 'cars.jsonl').unlink()
+      with self.assertRaises(RentalException):
+        import_company(Company('Copy'), self.directory.name)
+
+  def test_duplicate(self):
+    with redirect_stderr(io.StringIO()):
+      export_company(self.company, self.directory.name)
+      with self.assertRaises(RentalException):
+        import_company(self.company, self.directory.name)
+
+  def test_database_streamed(self):
+    backend = SqliteBackend(str(Path(self.directory.name, 'rental.db')), cache=False)
+    files = Path(self.directory.name, 'files')
+    with redirect_stderr(io.StringIO()):
+      export_company(self.company, files)
+      import_company(backend.open('Copy'), files)
+      with mock.patch.object(SqlRegistry, 'values', side_effect=AssertionError('all rows loaded')):
+        company = backend.open()
+        counts = export_company(company, Path(self.directory.name, 'copy'))
+    backend.close()
+    self.assertEqual(counts, {'categories': 1, 'customers': 1, 'cars': 1, 'bookings': 1, 'rentals': 1})
+    self.assertEqual(Path(self.directory.name, 'copy', 'bookings.jsonl').read_text(), (files / 'bookings.jsonl').read_text())
+
+  def test_journal_id(self):
+    journal = Journal(str(Path(self.directory.name, 'persistence')), sync=False)
+    company = Company('Copy')
+    journal.attach(company)
+    with redirect_stderr(io.StringIO()):
+      export_company(self.company, self.directory.name)
+      id = controller.current_id
+      controller.setId(0)
+      import_company(company, self.directory.name, journal=journal)
+    journal.close()
+    records = [json.loads(line) for line in journal.journal_path.read_text().splitlines()]
+    self.assertIn([None, 'id'], [record[2:4] for record in records], 'raised current id not journaled')
+    self.assertEqual(controller.current_id, id)
+
+  def test_command_line(self):
+    persistence = Path(self.directory.name, 'persistence')
+    files = str(Path(self.directory.name, 'files'))
+    with redirect_stderr(io.StringIO()):
+      export_company(self.company, files, 'csv')
+      self.assertEqual(main(['import', files, '--format', 'csv', '--persistence', str(persistence)]), 0)
+    controller.setId(0)
+    journal = Journal(str(persistence), sync=False)
+    company = journal.recover()
+    journal.close()
+    self.assertCopied(company)
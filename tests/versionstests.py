@@ -0,0 +1,85 @@
+import unittest
+import datetime as dt
+from unittest.mock import patch
+from rental.company import Company
+from rental.exceptions import RentalException, ConflictException
+from rental.versions import retry
+from rental import controller
+
+class VersionsTests(unittest.TestCase):
+  def setUp(self):
+    self.company = Company('Šmertz')
+    self.versions = self.company.versions
+    self.category = self.company.categories.add('A')
+    self.car = self.company.cars.add('D12', 'blue', self.category.id)
+    self.customer = self.company.customers.add('Dandy McDuck')
+
+  def book(self):
+    return self.company.bookings.add(self.customer.id, controller.today, controller.today + dt.timedelta(days=2), self.car.id)
+
+  def stale(self, *keys):
+    # Versions noted as if the entities had changed after they were read
+    return {key: self.versions.of(key) - 1 for key in keys}
+
+  def test_record(self):
+    observed = self.versions.read(self.car, self.customer, self.company.bookings)
+    booking = self.book()
+    self.assertEqual(self.versions.of(booking), 1)
+    for key, version in observed.items():
+      self.assertEqual(self.versions.of(key), version + 1, f'{key} not versioned')
+
+  def test_check(self):
+    observed = self.versions.read(self.car)
+    self.versions.check(observed)
+    self.company.cars.add('VW Jetta', 'green', self.category.id)
+    self.versions.check(observed)
+    self.book()
+    with self.assertRaises(ConflictException):
+      self.versions.check(observed)
+
+  def test_deleted_pruned(self):
+    self.company.bookings.delete(self.book().id)
+    before = len(self.versions.counters)
+    for _ in range(20):
+      self.company.bookings.delete(self.book().id)
+    self.assertEqual(len(self.versions.counters), before, 'versions of deleted entities kept')
+
+  def test_check_deleted(self):
+    booking = self.book()
+    observed = self.versions.read(booking)
+    self.company.bookings.delete(booking.id)
+    with self.assertRaises(ConflictException):
+      self.versions.check(observed)
+
+  def test_conflicting_booking(self):
+    with patch.object(self.versions, 'read', side_effect=self.stale):
+      with self.assertRaises(ConflictException):
+        self.book()
+    self.assertEqual(self.company.bookings.get(), [], 'conflicting booking added')
+    self.assertIsInstance(ConflictException(), RentalException)
+
+  def test_conflicting_rental(self):
+    booking = self.book()
+    with patch.object(self.versions, 'read', side_effect=self.stale):
+      with self.assertRaises(ConflictException):
+        self.company.rentals.add(booking.id)
+    self.assertEqual(self.company.rentals.get(), [], 'conflicting rental added')
+    self.assertEqual(self.customer.points, 0, 'points added for a conflicting rental')
+
+  def test_conflicting_upgrade(self):
+    booking = self.book()
+    with patch.object(self.versions, 'read', side_effect=self.stale):
+      with self.assertRaises(ConflictException):
+        self.company.rentals.add_with_upgrades(booking.id)
+    self.assertEqual(self.company.bookings.get(), [booking], 'bookings changed by a conflicting upgrade')
+    self.assertEqual(len(self.company.cars.get()), 1, 'car added by a conflicting upgrade')
+
+  def test_retry(self):
+    reads = [self.stale, self.versions.read]
+    original = self.versions.read
+    with patch.object(self.versions, 'read', side_effect=lambda *keys: (reads.pop(0) if reads else original)(*keys)):
+      booking = retry(self.company.bookings.add, self.customer.id, controller.today, controller.today, self.car.id)
+    self.assertEqual(self.company.bookings.get(), [booking])
+    with patch.object(self.versions, 'read', side_effect=self.stale):
+      with self.assertRaises(ConflictException):
+        retry(self.company.bookings.add, self.customer.id, controller.today + dt.timedelta(days=5), controller.today + dt.timedelta(days=6), self.car.id, attempts=2)
@@ -0,0 +1,99 @@
+import unittest
+import tempfile
+import errno
+import os
+import threading
+import time
+from rental.writer import GroupCommitWriter
+
+class GroupCommitWriterTests(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, 'journal.log')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def read(self):
+    with open(self.path) as file:
+      return file.read()
+
+  def test_group_commit(self):
+    writer = GroupCommitWriter(self.path, window=0.2, sync=False)
+    for seq in range(1, 51):
+      writer.write(f'{seq}\n', seq)
+    self.assertLess(writer.durable, 50, 'written before the window passed')
+    self.assertTrue(writer.wait(50, timeout=5))
+    self.assertEqual(self.read(), ''.join(f'{seq}\n' for seq in range(1, 51)))
+    self.assertLessEqual(writer.commits, 2, 'writes not grouped')
+    writer.close()
+
+  def test_concurrent_writers(self):
+    writer = GroupCommitWriter(self.path, window=0.05, sync=False)
+    lock = threading.Lock()
+    counter = [0]
+
+    def work():
+      for _ in range(20):
+        with lock: # Sequence numbers must be queued in order
+          counter[0] += 1
+          writer.write('x\n', counter[0])
+          seq = counter[0]
+        self.assertTrue(writer.wait(seq, timeout=5))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    writer.close()
+    self.assertEqual(self.read(), 'x\n' * 80)
+    self.assertLess(writer.commits, 80, 'writes not grouped')
+
+  def test_wait_timeout(self):
+    writer = GroupCommitWriter(self.path, window=10, sync=False)
+    writer.write('a\n', 1)
+    self.assertFalse(writer.wait(timeout=0.01))
+    writer.close()
+    self.assertEqual(writer.durable, 1, 'queued write lost on close')
+    self.assertEqual(self.read(), 'a\n')
+    with self.assertRaises(ValueError):
+      writer.write('b\n', 2)
+
+  def test_truncate(self):
+    writer = GroupCommitWriter(self.path, window=10, sync=False)
+    writer.write('a\n', 1)
+    writer.truncate(1)
+    self.assertTrue(writer.wait(1, timeout=0))
+    writer.write('b\n', 2)
+    writer.close()
+    self.assertEqual(self.read(), 'b\n')
+
+  def test_failed_commit(self):
+    class Full:
+      def write(self, data):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+      def close(self):
+        pass
+
+    writer = GroupCommitWriter(self.path, window=0, sync=False)
+    writer.RETRY = 0.05
+    writer.file.close()
+    writer.file = Full()
+    writer.write('a\n', 1)
+    with self.assertRaises(OSError):
+      writer.wait(1, timeout=5)
+    self.assertEqual(writer.durable, 0, 'failed commit reported durable')
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline: # The retry writes to the reopened file
+      try:
+        if writer.wait(1, timeout=5):
+          break
+      except OSError:
+        time.sleep(0.01)
+    self.assertEqual((writer.durable, writer.error), (1, None))
+    writer.close()
+    self.assertEqual(self.read(), 'a\n')
+
+if __name__ == '__main__':
+  unittest.main()
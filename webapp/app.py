@@ -1,13 +1,23 @@
-from flask import Flask, render_template, request, flash, session, redirect, url_for, send_from_directory
+from flask import Flask, render_template, request, flash, session, redirect, url_for, send_from_directory, jsonify, Response
 from rental import controller
 from rental.company import Company
 from rental.exceptions import RentalException
+from rental.journal import Journal
+from rental.database import SqliteBackend
+from rental.ids import IdService
+from rental.versions import retry
+from patterns.dispatcher import AsyncDispatcher
+from patterns.jobs import Jobs, RestartingExecutor
+from patterns.batcher import MicroBatcher
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from contextlib import nullcontext
+import atexit
 import traceback
-import pickle
+import json
 import os
-from os.path import exists
+from queue import Full
 from datetime import date
-from pathlib import Path
 import logging
 from werkzeug.utils import secure_filename
 from model.carClasses import car_classes_list
@@ -23,6 +33,30 @@ app.secret_key = "super secret key"
 company: Company = None
 request_number = 1
 
+# Every change is appended to the journal, see rental.journal. Records are committed to disk in
+# groups in the background, at most JOURNAL_WINDOW seconds (default 0.05) after the change.
+journal = Journal('./persistence', window=float(os.environ.get('JOURNAL_WINDOW', 0.05)))
+atexit.register(journal.close)
+
+# Customer actions which only complete once their changes are on disk
+DURABLE_ACTIONS = {"add_rental", "add_rental_with_upgrade", "delete_rental"}
+
+# Set RENTAL_DATABASE to the path of a SQLite file to store the company there instead.
+# Each operation checks and writes within a transaction of its thread's connection, and entities
+# are not cached, so that several worker processes can share the database.
+database = None
+if os.environ.get('RENTAL_DATABASE'):
+  database = SqliteBackend(os.environ['RENTAL_DATABASE'], cache=False)
+  atexit.register(database.close)
+  # The worker processes allocate IDs in blocks of RENTAL_ID_BLOCK (default 100) from a shared file
+  controller.useIds(IdService(os.environ['RENTAL_DATABASE'] + '.ids', block=int(os.environ.get('RENTAL_ID_BLOCK', 100))))
+
+# Set OBSERVER_DISPATCH to 'block', 'drop' or 'coalesce' to run observers on a background thread
+dispatcher = None
+if os.environ.get('OBSERVER_DISPATCH'):
+  dispatcher = AsyncDispatcher(policy=os.environ['OBSERVER_DISPATCH'])
+  atexit.register(dispatcher.close)
+
 
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.WARN)
@@ -31,34 +65,72 @@ log.setLevel(logging.WARN)
 def inject_data():
     return dict(company = company, today = controller.today)
 
+def render(template: str, **context):
+  # Templates read the company throughout, so they hold its lock to see no operation half done.
+  # Renders run concurrently, operations changing the company wait for them (see Company.lock).
+  if company == None:
+    return render_template(template, **context)
+  with company.lock.read():
+    return render_template(template, **context)
+
 def persist_company():
-  Path('./persistence').mkdir(parents=True, exist_ok=True)
-  file = open('./persistence/state.data','wb')
-  pickle.dump([company, controller.current_id] , file)
-  file.close()
+  # Changes are journaled or committed to the database as they are made
+  if database == None and company != None:
+    journal.checkpoint()
 
 def load_persisted_company():
   global company
-  if not exists('./persistence/state.data'):
+  if database != None:
+    company = database.open()
+    company.use_dispatcher(dispatcher)
+    print('Company data opened from database.')
+    return True
+  try:
+    recovered = journal.recover()
+  except Exception:
+    print('Schema missmatch. Persistent company data will not be loaded.')
+    return False
+  if recovered == None:
     print('No persisted company data.')
     return False
-  file = open('./persistence/state.data','rb')
-  try:
-    company, id = pickle.load(file)
-    controller.setId(id)
-    print('Persistent company data loaded successfully.')
-    return True
-  except:
-    pass
-  finally:
-    file.close()
-  print('Schema missmatch. Persistent company data will not be loaded.')
-  return False
+  company = recovered
+  company.use_dispatcher(dispatcher)
+  print('Persistent company data loaded successfully.')
+  return True
   
 # Hacky - should be wrapped in proper Startup, can only be done after we put everything in modules.
 # https://flask.palletsprojects.com/en/3.0.x/tutorial/factory/
 load_persisted_company()
 
+# Uploaded images are classified as jobs, whose results are kept for the last IDENTIFY_RETENTION
+# (default 200). Images submitted concurrently are classified in batches, see IDENTIFY_BATCH_SIZE in
+# model.supportModel. The batches are handed to IDENTIFY_WORKERS (default 2) worker processes, each
+# using IDENTIFY_THREADS (default 1) threads for PyTorch, so that inference does not hold up requests.
+# With no workers, batches are classified within this process.
+identify_workers = int(os.environ.get('IDENTIFY_WORKERS', 2))
+identify_retention = int(os.environ.get('IDENTIFY_RETENTION', 200))
+identify_pool = None
+
+if identify_workers > 0:
+  # Spawned rather than forked, PyTorch's thread pools do not survive a fork. A crashed worker
+  # breaks the pool, which is then replaced on the next submission.
+  identify_pool = RestartingExecutor(lambda: ProcessPoolExecutor(identify_workers, mp_context=multiprocessing.get_context('spawn'),
+                                                                 initializer=init_worker, initargs=(int(os.environ.get('IDENTIFY_THREADS', 1)),)))
+  # Each batch is one call in a worker, several batches are classified at once
+  identify_batcher = MicroBatcher(lambda paths: identify_pool.submit(classify_batch, paths),
+                                  BATCH_SIZE, MAX_WAIT, QUEUE_DEPTH, name='identify-batcher')
+  identify_jobs = Jobs(identify_batcher, ThreadPoolExecutor(QUEUE_DEPTH), identify_retention, QUEUE_DEPTH)
+  atexit.register(identify_pool.shutdown, False)
+else:
+  identify_batcher = get_batcher()
+  identify_jobs = Jobs(ValuePredictor, ThreadPoolExecutor(QUEUE_DEPTH), identify_retention, QUEUE_DEPTH)
+  # Load the classifier and run it once, so that the first request only pays for its own inference
+  try:
+    get_manager().warm_up()
+  except Exception as e:
+    print(f'Classifier not loaded: {e}')
+atexit.register(identify_jobs.close, False)
+
 # HACK: Such a message is reported by flask upon startup and handy since clickable in VS Code, but 
 # we currently suppress the output by setting log granularity to WARN. Moreover, host and port are
 # hardcoded here. I tried to find a better way, but failed (in reasonable time).
@@ -88,7 +160,7 @@ def update_request_number():
 def index():
   if company == None:
     return redirect(url_for('admin'))
-  return render_template('index.html')
+  return render('index.html')
 
 @app.route('/customer')
 def customer():
@@ -100,24 +172,33 @@ def customer():
       id = request.args.get('id')
       if (customer_id):
         action = request.args.get('action')
-        if action == "add_category_booking":
-          period_start = date.fromisoformat(request.args.get('period_start'))
-          period_end = date.fromisoformat(request.args.get('period_end'))
-          company.bookings.add_by_category_id(int(customer_id),period_start, period_end, category_id=int(id))
-        if action == "add_car_booking":
-          period_start = date.fromisoformat(request.args.get('period_start'))
-          period_end = date.fromisoformat(request.args.get('period_end'))
-          company.bookings.add(int(customer_id),period_start, period_end, int(id))
-        if action == "delete_booking":
-          company.bookings.delete(int(id))
-        if action == "add_rental":
-          company.rentals.add(int(id))
-        if action == "add_rental_with_upgrade":
-          company.rentals.add_with_upgrades(int(id))
-          raise RentalException(f'You have been upgrade!!')
-        if action == "delete_rental":
-          rental = company.rentals.find_by_booking_id(int(id))
-          company.rentals.delete(rental.id)
+        # Each action validates concurrently with other requests and is retried if it conflicts
+        # with one of them (see rental.versions), rather than locking the company throughout.
+        def act():
+          if action == "add_category_booking":
+            period_start = date.fromisoformat(request.args.get('period_start'))
+            period_end = date.fromisoformat(request.args.get('period_end'))
+            company.bookings.add_by_category_id(int(customer_id),period_start, period_end, category_id=int(id))
+          if action == "add_car_booking":
+            period_start = date.fromisoformat(request.args.get('period_start'))
+            period_end = date.fromisoformat(request.args.get('period_end'))
+            company.bookings.add(int(customer_id),period_start, period_end, int(id))
+          if action == "delete_booking":
+            company.bookings.delete(int(id))
+          if action == "add_rental":
+            company.rentals.add(int(id))
+          if action == "add_rental_with_upgrade":
+            company.rentals.add_with_upgrades(int(id))
+            raise RentalException(f'You have been upgrade!!')
+          if action == "delete_rental":
+            with company.batch():
+              rental = company.rentals.find_by_booking_id(int(id))
+              company.rentals.delete(rental.id)
+        try:
+          retry(act)
+        finally:
+          if action in DURABLE_ACTIONS and database == None:
+            journal.wait_durable()
         persist_company()
     except RentalException as re:
       flash(re, 'warning')
@@ -125,21 +206,21 @@ def customer():
       flash(traceback.format_exc(), 'danger')
   update_request_number()
   if session.get('customer_id'):
-    return render_template('customer.html')
+    return render('customer.html')
   else:
     return redirect(url_for('login'))
 
 @app.route('/book')
 def book():
-  return render_template('book.html')
+  return render('book.html')
 
 @app.route('/rent')
 def rent():
-  return render_template('rent.html')
+  return render('rent.html')
 
 @app.route('/points')
 def points():
- return render_template('points.html')
+ return render('points.html')
 
 @app.route('/identify', methods=['GET', 'POST'])
 def identify():
@@ -148,9 +229,55 @@ def identify():
    filename = secure_filename(uploaded_file.filename)
    image_path = os.path.join(app.config['UPLOAD'], filename)
    uploaded_file.save(image_path)
-   result = ValuePredictor(image_path)
-   return render_template('result.html', prediction = car_classes_list[result], predicted_img = filename)
- return render_template('identify.html')
+   try:
+     job = identify_jobs.submit(image_path)
+   except Full:
+     flash('Too many images are being identified right now, please try again.', 'warning')
+     return render('identify.html')
+   return redirect(url_for('identify_job', id=job.id))
+ return render('identify.html')
+
+@app.route('/identify/<id>')
+def identify_job(id):
+ job = identify_jobs.get(id)
+ if job == None:
+   flash('This identification is unknown or has expired, please upload the image again.', 'warning')
+   return render('identify.html')
+ if job.status == 'failed':
+   flash(f'The car could not be identified: {job.error}', 'danger')
+   return render('identify.html')
+ predicted_img = os.path.basename(job.args[0])
+ if job.status != 'done':
+   return render('result.html', job = job, predicted_img = predicted_img)
+ return render('result.html', prediction = car_classes_list[job.result], predicted_img = predicted_img)
+
+@app.route('/identify/<id>/status')
+def identify_status(id):
+ job = identify_jobs.get(id)
+ if job == None:
+   return jsonify(error='Unknown job'), 404
+ return jsonify(job.to_dict())
+
+@app.route('/identify/<id>/events')
+def identify_events(id):
+ # Server-sent events: comments keep the connection alive until the job has finished
+ job = identify_jobs.get(id)
+ if job == None:
+   return jsonify(error='Unknown job'), 404
+ def events():
+   while not job.wait(15):
+     yield ': waiting\n\n'
+   yield f'data: {json.dumps(job.to_dict())}\n\n'
+ return Response(events(), mimetype='text/event-stream')
+
+@app.route('/identify/metrics')
+def identify_metrics():
+ # Job metrics (see patterns.jobs.Jobs.metrics) and the queue and batch metrics of the classifier
+ # (see patterns.batcher.MicroBatcher.metrics)
+ metrics = {'workers': identify_workers, 'jobs': identify_jobs.metrics(), 'batcher': identify_batcher.metrics()}
+ if identify_pool != None:
+   metrics['restarts'] = identify_pool.restarts
+ return jsonify(metrics)
 
 @app.route('/logout')
 def logout():
@@ -168,7 +295,7 @@ def login():
   update_request_number()
   if session.get('customer_id'):
     return redirect(url_for('customer'))
-  return render_template('login.html')
+  return render('login.html')
 
 @app.route('/set_date')
 def setDate():
@@ -188,8 +315,13 @@ def reset():
       company_name = request.args.get('company_name')
       if company_name:
         session.pop('customer_id', None)
-        company = Company(company_name)
-        persist_company()
+        if database != None:
+          database.clear()
+          company = database.open(company_name)
+        else:
+          company = Company(company_name)
+          journal.attach(company)
+        company.use_dispatcher(dispatcher)
     except Exception:
       flash(traceback.format_exc(), 'danger')
   update_request_number()
@@ -205,25 +337,27 @@ def admin():
       id = request.args.get('id')
       name = request.args.get('name')
       color = request.args.get('color')
-      if action == "add_customer":
-        if not company.customers.contains(name):
-          company.customers.add(name)
-        else:
-          flash(f'A customer with name "{name}" exists already', 'warning')
-      if action == "delete_customer":
-        company.customers.delete(int(id))
-      if action == "add_category":
-        if not company.categories.contains(name):
-          company.categories.add(name)
-        else:
-          flash(f'A category with name "{name}" exists already', 'warning')
-      if action == "delete_category":
-        company.categories.delete(int(id))
-      if action == "add_car":
-        category_id = int(request.args.get('category_id'))
-        company.cars.add(name, color, category_id)
-      if action == "delete_car":
-        company.cars.delete(int(id))
+      # Without a company, actions fail as they reach it; the batch needs one
+      with company.batch() if company != None else nullcontext():
+        if action == "add_customer":
+          if not company.customers.contains(name):
+            company.customers.add(name)
+          else:
+            flash(f'A customer with name "{name}" exists already', 'warning')
+        if action == "delete_customer":
+          company.customers.delete(int(id))
+        if action == "add_category":
+          if not company.categories.contains(name):
+            company.categories.add(name)
+          else:
+            flash(f'A category with name "{name}" exists already', 'warning')
+        if action == "delete_category":
+          company.categories.delete(int(id))
+        if action == "add_car":
+          category_id = int(request.args.get('category_id'))
+          company.cars.add(name, color, category_id)
+        if action == "delete_car":
+          company.cars.delete(int(id))
       persist_company()
       
     except RentalException as re:
@@ -231,4 +365,4 @@ def admin():
     except Exception:
       flash(traceback.format_exc(), 'danger')
   update_request_number()
-  return render_template('admin.html')
+  return render('admin.html')